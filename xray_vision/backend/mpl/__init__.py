@@ -35,6 +35,7 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
+import numpy as np
 from matplotlib import cm
 from .. import QtCore, QtGui
 
@@ -100,4 +101,42 @@ class AbstractMPLDataView(object):
         self._norm = norm
 
     def draw(self):
-        self._fig.canvas.draw()
\ No newline at end of file
+        self._fig.canvas.draw()
+
+
+def _reserve_rows(rows, num_rows, num_cols, num_kept, init_capacity):
+    """
+    Make sure that a buffer of rows can hold at least `num_rows` rows,
+    doubling its capacity when it has to grow so that appending rows one
+    at a time is amortized O(1) reallocations
+
+    Parameters
+    ----------
+    rows : np.ndarray or None
+        The (capacity, columns) buffer, None if there is none yet
+    num_rows : int
+        The number of rows that need to fit
+    num_cols : int
+        The number of columns the rows need.  A buffer with a different
+        number starts over at `init_capacity`
+    num_kept : int
+        The number of rows at the start of `rows` to keep
+    init_capacity : int
+        The capacity of a new buffer
+
+    Returns
+    -------
+    rows : np.ndarray
+        `rows` itself if it is big enough, otherwise a new buffer
+    """
+    if rows is not None and rows.shape[1] == num_cols:
+        if len(rows) >= num_rows:
+            return rows
+        capacity = max(num_rows, 2 * len(rows))
+    else:
+        capacity = max(num_rows, init_capacity)
+        num_kept = 0
+    new_rows = np.empty((capacity, num_cols))
+    if num_kept:
+        new_rows[:num_kept] = rows[:num_kept]
+    return new_rows
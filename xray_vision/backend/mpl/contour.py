@@ -34,89 +34,261 @@
 ########################################################################
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
-import six
 import numpy as np
 
 from .. import QtCore, QtGui
-from . import AbstractMPLDataView
-from .. import AbstractDataView2D
+from . import AbstractMPLDataView, _reserve_rows
+from .. import AbstractDataView1D
 
 import logging
 logger = logging.getLogger(__name__)
 
 
-class ContourView(AbstractDataView2D, AbstractMPLDataView):
+class ContourView(AbstractDataView1D, AbstractMPLDataView):
     """
     The ContourView provides a UI widget for viewing a number of 1-D
     data sets as a contour plot, starting from dataset 0 at y = 0
+
+    All data sets are resampled onto the x grid of the first data set and
+    stored as the rows of a preallocated 2-D buffer.  New data sets fill the
+    next free rows, and the contours are only recomputed when rows change.
+    For live data, `set_fast_mode` swaps the filled contours for a much
+    cheaper image of the same buffer.
     """
 
-    def __init__(self, fig, data_list=None, cmap=None, norm=None, *args,
-                 **kwargs):
+    # let matplotlib autoscale the color limits to the data
+    _default_norm = None
+    _default_fast_mode = False
+    # initial number of rows to allocate for the data buffer
+    _init_capacity = 64
+
+    def __init__(self, fig, data_list, key_list, cmap=None, norm=None,
+                 *args, **kwargs):
         """
         __init__ docstring
 
         Parameters
         ----------
         fig : figure to draw the artists on
-        x_data : list
-            list of vectors of x-coordinates
-        y_data : list
-            list of vectors of y-coordinates
-        lbls : list
+        data_list : list
+            list of (x, y) tuples
+        key_list : list
             list of the names of each data set
         cmap : colormap that matplotlib understands
         norm : mpl.colors.Normalize
         """
-        # set some defaults
-        # no defaults yet
-
         # call the parent constructors
-        super(ContourView, self).__init__(data_list=data_list, fig=fig,
+        super(ContourView, self).__init__(data_list=data_list,
+                                          key_list=key_list, fig=fig,
                                           cmap=cmap, norm=norm, *args,
                                           **kwargs)
 
+        # set some defaults
+        self._fast_mode = self._default_fast_mode
+
         # create the matplotlib axes
         self._ax = self._fig.add_subplot(1, 1, 1)
-        self._ax.set_aspect('equal')
+        self._ax.set_aspect('auto')
+
+        # the x grid of the first data set, the row buffer, the keys in row
+        # order and the keys whose rows need to be recomputed
+        self._grid = None
+        self._data_arr = None
+        self._row_keys = []
+        self._row_of = dict()
+        self._dirty_keys = set()
+        # the artist currently showing the buffer: a ContourSet or AxesImage
+        self._artist = None
+        self._needs_redraw = True
 
         # plot the data
         self.replot()
 
+    def add_data(self, lbl_list, x_list, y_list, position=None):
+        """
+        @Override
+        Also flag the rows of the new data sets
+        """
+        lbl_list = list(lbl_list)
+        super(ContourView, self).add_data(lbl_list=lbl_list, x_list=x_list,
+                                          y_list=y_list, position=position)
+        self._dirty_keys.update(lbl_list)
+
+    def append_data(self, lbl_list, x_list, y_list):
+        """
+        @Override
+        Also flag the rows of the data sets that were appended to
+        """
+        lbl_list = [str(lbl) for lbl in lbl_list]
+        super(ContourView, self).append_data(lbl_list=lbl_list, x_list=x_list,
+                                             y_list=y_list)
+        self._dirty_keys.update(lbl_list)
+
+    def remove_data(self, lbl_list):
+        """
+        @Override
+        Also flag the removed data sets
+        """
+        super(ContourView, self).remove_data(lbl_list)
+        self._dirty_keys.difference_update(lbl_list)
+
+    def clear_data(self):
+        """
+        @Override
+        Also drop the row buffer and the artist
+        """
+        super(ContourView, self).clear_data()
+        self._grid = None
+        self._row_keys = []
+        self._row_of.clear()
+        self._dirty_keys.clear()
+        if self._artist is not None:
+            self._artist.remove()
+            self._artist = None
+
+    def update_cmap(self, cmap):
+        """
+        @Override
+        Flag the plot for redrawing
+        """
+        super(ContourView, self).update_cmap(cmap)
+        self._needs_redraw = True
+
+    def update_norm(self, norm):
+        """
+        @Override
+        Flag the plot for redrawing
+        """
+        super(ContourView, self).update_norm(norm)
+        self._needs_redraw = True
+
+    def set_fast_mode(self, is_fast):
+        """
+        Draw the data as an image instead of filled contours
+
+        Parameters
+        ----------
+        is_fast : bool
+            Show the data with imshow (true), which is cheap enough to redraw
+            on every new data set, or with contourf (false)
+        """
+        if is_fast != self._fast_mode:
+            self._fast_mode = is_fast
+            self._needs_redraw = True
+
     def replot(self):
         """
-        Override
-        Replot the data after modifying a display parameter (e.g.,
-        offset or autoscaling) or adding new data
+        @Override
+        Copy new or changed data sets into the row buffer and redraw the plot
+        only if any rows changed
         """
-        # TODO: This class was originally written to convert a 1-D stack into a
-        # 2-D contour.  Rewrite this replot method
+        self._update_rows()
+        if not self._needs_redraw:
+            return
+        if self._artist is not None:
+            self._artist.remove()
+            self._artist = None
+        self._needs_redraw = False
 
-        # get the keys from the dict
-        keys = list(six.iterkeys(self._data))
-        # number of datasets in the data dict
-        num_keys = len(keys)
-        # cannot plot data if there are no keys
-        if num_keys < 1:
+        num_rows = len(self._row_keys)
+        if num_rows == 0:
             return
-        # set the local counter
-        counter = num_keys - 1
-        # @tacaswell Should it be required that all datasets are the same
-        # length?
-        num_coords = len(self._data[keys[0]][0])
-        # declare the array
-        self._data_arr = np.zeros((num_keys, num_coords))
-        # add the data to the main axes
-        for key in self._data.keys():
-            # get the (x,y) data from the dictionary
-            (x, y) = self._data[key]
-            # add the data to the array
-
-            self._data_arr[counter] = y
-            # decrement the counter
-            counter -= 1
-        # get the first dataset to get the x axis and number of y datasets
-        x, y = self._data[keys[0]]
-        y = np.arange(len(keys))
-        # TODO: Colormap initialization is not working properly.
-        self._ax.contourf(x, y, self._data_arr)  # , cmap=colors.Colormap(self._cmap))
+        data = self._data_arr[:num_rows]
+        y = np.arange(num_rows)
+        if self._fast_mode or num_rows < 2 or len(self._grid) < 2:
+            # contourf needs at least a 2x2 grid
+            self._artist = self._ax.imshow(
+                data, cmap=self._cmap, norm=self._norm, aspect='auto',
+                interpolation='nearest', origin='lower',
+                extent=_centers_to_extent(self._grid, y))
+        else:
+            self._artist = self._ax.contourf(self._grid, y, data,
+                                             cmap=self._cmap, norm=self._norm)
+
+    def _update_rows(self):
+        """
+        Bring the row buffer in sync with the key list, flagging the plot for
+        redrawing if anything changed
+        """
+        if len(self._key_list) == 0:
+            if self._row_keys:
+                self._row_keys = []
+                self._row_of.clear()
+                self._needs_redraw = True
+            self._grid = None
+            return
+
+        num_rows = len(self._row_keys)
+        first_key = self._key_list[0]
+        if (self._grid is None or first_key in self._dirty_keys or
+                self._row_keys != self._key_list[:num_rows]):
+            # the grid changed or data sets were reordered or removed
+            self._grid = np.asarray(self._data_dict[first_key][0])
+            self._row_keys = []
+            self._row_of.clear()
+            num_rows = 0
+            self._needs_redraw = True
+
+        # recompute rows whose data changed in place
+        for key in self._dirty_keys:
+            row = self._row_of.get(key)
+            if row is not None:
+                self._data_arr[row] = self._resample(key)
+                self._needs_redraw = True
+        self._dirty_keys.clear()
+
+        # fill the next free rows with the new data sets
+        new_keys = self._key_list[num_rows:]
+        if new_keys:
+            self._data_arr = _reserve_rows(
+                self._data_arr, num_rows + len(new_keys), len(self._grid),
+                num_rows, self._init_capacity)
+            for row, key in enumerate(new_keys, num_rows):
+                self._data_arr[row] = self._resample(key)
+                self._row_of[key] = row
+            self._row_keys.extend(new_keys)
+            self._needs_redraw = True
+
+    def _resample(self, key):
+        """
+        Put the data set `key` on the shared x grid
+
+        Parameters
+        ----------
+        key : str
+            Name of the data set
+
+        Returns
+        -------
+        y : np.ndarray
+            The y values at the grid points
+        """
+        (x, y) = self._data_dict[key]
+        x = np.asarray(x)
+        if x.shape == self._grid.shape and np.array_equal(x, self._grid):
+            return y
+        order = np.argsort(x)
+        return np.interp(self._grid, x[order], np.asarray(y)[order])
+
+
+def _centers_to_extent(x, y):
+    """
+    Compute the imshow extent of an image whose pixel centers are at the
+    (evenly spaced) x and y values
+
+    Parameters
+    ----------
+    x, y : np.ndarray
+        The pixel centers
+
+    Returns
+    -------
+    extent : tuple
+        (left, right, bottom, top)
+    """
+    def edges(c):
+        if len(c) < 2:
+            return c[0] - 0.5, c[0] + 0.5
+        half = (c[-1] - c[0]) / (len(c) - 1) / 2
+        return c[0] - half, c[-1] + half
+    return edges(x) + edges(y)
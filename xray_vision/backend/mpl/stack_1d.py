@@ -34,13 +34,16 @@
 ########################################################################
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
+import copy
 
 from matplotlib import cm
+from matplotlib import transforms as mtransforms
+from matplotlib.image import NonUniformImage
 import numpy as np
 
 from .. import QtCore, QtGui
 
-from . import AbstractMPLDataView
+from . import AbstractMPLDataView, _reserve_rows
 from .. import AbstractDataView1D
 
 import logging
@@ -52,11 +55,21 @@ class Stack1DView(AbstractDataView1D, AbstractMPLDataView):
     The OneDimStackViewer provides a UI widget for viewing a number of 1-D
     data sets with cumulative offsets in the x- and y- directions.  The
     first data set always has an offset of (0, 0).
+
+    When every data set shares the same, monotonically increasing x grid the
+    stack can instead be drawn as a single image with one row per data set
+    (see `set_image_mode`).
     """
 
     _default_horz_offset = 0
     _default_vert_offset = 0
     _default_autoscale = False
+    _default_image_mode = 'auto'
+    # in 'auto' image mode, the minimum number of data sets on a shared grid
+    # before switching from lines to an image
+    _image_min_datasets = 50
+    # initial number of rows to allocate for the image buffer
+    _image_init_capacity = 64
 
     def __init__(self, fig, data_list, key_list, cmap=None, norm=None,
                  *args, **kwargs):
@@ -80,6 +93,7 @@ class Stack1DView(AbstractDataView1D, AbstractMPLDataView):
         self._horz_offset = self._default_horz_offset
         self._vert_offset = self._default_vert_offset
         self._autoscale = self._default_autoscale
+        self._image_mode = self._default_image_mode
 
         # create the matplotlib axes
         self._ax = self._fig.add_subplot(1, 1, 1)
@@ -87,19 +101,110 @@ class Stack1DView(AbstractDataView1D, AbstractMPLDataView):
         # create an ordered dict of lines that has identical keys as the
         # data_dict
         self._lines_dict = self.default_dict_type()
+        # running (min_x, max_x, min_y, max_y) of the raw data for each key so
+        # that autoscaling never has to look at the data itself
+        self._extents = self.default_dict_type()
+        for key, (x, y) in self._data_dict.items():
+            self._extents[key] = _data_extent(x, y)
+
+        # per-line translations that implement the waterfall offsets so that
+        # the data never has to be copied to move a line
+        self._offset_transforms = self.default_dict_type()
+        # keys whose data changed since the last replot
+        self._dirty_keys = set()
+        # position in the key list that each line was last drawn at
+        self._line_positions = self.default_dict_type()
+        # the offsets that the lines were last drawn with
+        self._drawn_offsets = (self._horz_offset, self._vert_offset)
+        # the colors depend on cmap, norm and the number of data sets, so
+        # force them to be computed on the first replot
+        self._style_dirty = True
+        self._drawn_num_datasets = None
+
+        # the x grid shared by the data sets and the keys that are not on it
+        self._grid = None
+        self._off_grid_keys = set()
+        for key, (x, y) in self._data_dict.items():
+            self._check_grid(key, x, y)
+        # image mode state: a row buffer that is only reallocated when it
+        # runs out of capacity, the keys in row order and the image artist
+        self._image = None
+        self._image_rows = None
+        self._image_keys = []
+        self._image_row_of = dict()
+        self._showing_image = False
 
-        # create a local counter
-        counter = 0
         # add the data to the main axes
-        for key in self._data_dict.keys():
-            # get the (x,y) data from the dictionary
-            (x, y) = self._data_dict[key]
-            # plot the (x,y) data with default offsets
-            self._lines_dict[key] = self._ax.plot(
-                x + counter * self._horz_offset,
-                y + counter * self._vert_offset)[0]
-            # increment the counter
-            counter += 1
+        self.replot()
+
+    def add_data(self, lbl_list, x_list, y_list, position=None):
+        """
+        @Override
+        Also record the extent of each new data set
+        """
+        lbl_list, x_list, y_list = (list(lbl_list), list(x_list),
+                                    list(y_list))
+        super(Stack1DView, self).add_data(lbl_list=lbl_list, x_list=x_list,
+                                          y_list=y_list, position=position)
+        for (lbl, x, y) in zip(lbl_list, x_list, y_list):
+            self._extents[lbl] = _data_extent(x, y)
+            self._check_grid(lbl, x, y)
+            self._dirty_keys.add(lbl)
+
+    def append_data(self, lbl_list, x_list, y_list):
+        """
+        @Override
+        Grow the extent of existing data sets by the extent of the appended
+        chunk only.  New data sets are handled by `add_data`
+        """
+        lbl_list, x_list, y_list = (list(lbl_list), list(x_list),
+                                    list(y_list))
+        for (lbl, x, y) in zip(lbl_list, x_list, y_list):
+            lbl = str(lbl)
+            if lbl in self._extents:
+                self._extents[lbl] = _union_extent(self._extents[lbl],
+                                                   _data_extent(x, y))
+                # a data set that grew is no longer on the shared grid
+                if len(x):
+                    self._off_grid_keys.add(lbl)
+                self._dirty_keys.add(lbl)
+        super(Stack1DView, self).append_data(lbl_list=lbl_list, x_list=x_list,
+                                             y_list=y_list)
+
+    def remove_data(self, lbl_list):
+        """
+        @Override
+        Also forget the extent of the removed data sets
+        """
+        super(Stack1DView, self).remove_data(lbl_list)
+        for lbl in lbl_list:
+            self._extents.pop(lbl, None)
+            self._dirty_keys.discard(lbl)
+            self._off_grid_keys.discard(lbl)
+        if len(self._key_list) == 0 or self._off_grid_keys:
+            # the remaining data may have a shared grid that is different
+            # from the current one, so start over
+            self._grid = None
+            self._off_grid_keys.clear()
+            for key in self._key_list:
+                (x, y) = self._data_dict[key]
+                self._check_grid(key, x, y)
+
+    def update_cmap(self, cmap):
+        """
+        @Override
+        Flag the line colors for recomputation on the next replot
+        """
+        super(Stack1DView, self).update_cmap(cmap)
+        self._style_dirty = True
+
+    def update_norm(self, norm):
+        """
+        @Override
+        Flag the line colors for recomputation on the next replot
+        """
+        super(Stack1DView, self).update_norm(norm)
+        self._style_dirty = True
 
     def set_vert_offset(self, vert_offset):
         """
@@ -124,57 +229,281 @@ class Stack1DView(AbstractDataView1D, AbstractMPLDataView):
         """
         self._horz_offset = horz_offset
 
+    def set_image_mode(self, image_mode):
+        """
+        Choose between drawing the stack as lines or as an image
+
+        Parameters
+        ----------
+        image_mode : {'auto', 'image', 'lines'}
+            'lines' always draws one line per data set.  'image' draws the
+            stack as one image with a row per data set whenever all data
+            sets share the same x grid.  'auto' does the same, but only once
+            there are at least `_image_min_datasets` data sets
+
+        Notes
+        -----
+        The image is colored with the cmap and the type of the norm of the
+        view (e.g. a LogNorm), but the color limits always span the y range
+        of the data, since for the lines the norm maps the position in the
+        stack rather than the data values.
+        """
+        if image_mode not in ('auto', 'image', 'lines'):
+            raise ValueError(("image_mode must be one of 'auto', 'image' or "
+                              "'lines', not {0}").format(image_mode))
+        self._image_mode = image_mode
+
+    def _use_image(self):
+        """
+        Returns
+        -------
+        bool
+            True if the stack should currently be drawn as an image
+        """
+        if (self._image_mode == 'lines' or self._grid is None or
+                self._off_grid_keys or len(self._key_list) == 0):
+            return False
+        if self._image_mode == 'auto':
+            return len(self._key_list) >= self._image_min_datasets
+        return True
+
+    def _check_grid(self, key, x, y):
+        """
+        Record whether the data set `key` is on the shared x grid.  The first
+        suitable data set defines the grid
+
+        Parameters
+        ----------
+        key : str
+            Name of the data set
+        x, y : np.ndarray
+            The data
+        """
+        x = np.asarray(x)
+        if self._grid is None:
+            if (x.ndim == 1 and len(x) > 0 and np.shape(y) == x.shape and
+                    np.all(np.diff(x) > 0)):
+                self._grid = x
+                self._off_grid_keys.discard(key)
+            else:
+                self._off_grid_keys.add(key)
+        elif np.shape(y) == self._grid.shape and np.array_equal(x,
+                                                                 self._grid):
+            self._off_grid_keys.discard(key)
+        else:
+            self._off_grid_keys.add(key)
+
     def replot(self):
         """
         @Override
         Replot the data after modifying a display parameter (e.g.,
         offset or autoscaling) or adding new data
+
+        Only the lines whose data, position in the key list or color changed
+        since the last replot are touched.
         """
-        rgba = cm.ScalarMappable(self._norm, self._cmap)
-        # define a local counter
-        counter = 0
+        if self._use_image():
+            self._replot_image()
+        else:
+            self._replot_lines()
+
+        # check to see if the axes need to be automatically adjusted to show
+        # all the data
+        if self._autoscale:
+            min_x, max_x, min_y, max_y = self.find_range()
+            self._ax.set_xlim(min_x, max_x)
+            self._ax.set_ylim(min_y, max_y)
+
+    def _replot_lines(self):
+        """
+        Draw the stack as one line per data set
+        """
+        if self._showing_image:
+            # switch back from the image to lines
+            self._image.remove()
+            self._image = None
+            self._image_keys = []
+            self._image_row_of.clear()
+            self._showing_image = False
+            self._ax.set_aspect('equal')
+
+        # remove all lines whose data is no longer in the _data_dict
+        for key in list(self._lines_dict.keys()):
+            if key not in self._data_dict:
+                self._lines_dict.pop(key).remove()
+                self._line_positions.pop(key, None)
+                self._offset_transforms.pop(key, None)
+
         # determine the number of data sets in the data_dict to compute the
         # color for the line
-        num_datasets = len(self._data_dict.keys())
-
-        # remove all keys from _lines_dict that are not in the _data_dict
-        for key in self._lines_dict.keys():
-            if not key in self._data_dict:
-                self._lines_dict[key].remove()
-                continue
+        num_datasets = len(self._key_list)
+        offsets = (self._horz_offset, self._vert_offset)
+        offsets_changed = offsets != self._drawn_offsets
+        recolor_all = (self._style_dirty or
+                       num_datasets != self._drawn_num_datasets)
+        colors = None
+        if recolor_all:
+            colors = self._compute_colors(num_datasets)
 
         # loop over the keys according to the key_list
-        for key in self._key_list:
-            # get the (x,y) data from the dictionary
-            (x, y) = self._data_dict[key]
-            # compute the new horizontal and vertical offsets
-            new_x = x+counter * self._horz_offset
-            new_y = y+counter * self._vert_offset
-
-            # compute the color for the line
-            color = rgba.to_rgba(x=(counter / num_datasets))
-            try:
-                # set the data in the corresponding line
-                self._lines_dict[key].set_xdata(x + counter * self._horz_offset)
-                self._lines_dict[key].set_ydata(y + counter * self._vert_offset)
-                # set the color
-                self._lines_dict[key].set_color(color)
-            except KeyError:
-                # create a new line if the key does not exist
-                self._lines_dict[key] = self._ax.plot(new_x,
-                                                      new_y,
-                                                      color=color)[0]
-
-            # increment the counter
-            counter += 1
+        for counter, key in enumerate(self._key_list):
+            line = self._lines_dict.get(key)
+            moved = self._line_positions.get(key) != counter
+            if line is None or key in self._dirty_keys:
+                # get the (x,y) data from the dictionary
+                (x, y) = self._data_dict[key]
+                if line is None:
+                    # create a new line if the key does not exist
+                    line = self._add_line(key, x, y)
+                else:
+                    # set the data in the corresponding line
+                    line.set_data(x, y)
+            if moved or offsets_changed:
+                # the offsets only live in the transform of the line
+                self._set_line_offset(key, counter)
+            if recolor_all or moved:
+                if colors is None:
+                    colors = self._compute_colors(num_datasets)
+                line.set_color(colors[counter])
 
-        # check to see if the axes need to be automatically adjusted to show
-        # all the data
-        if self._autoscale:
+        self._dirty_keys.clear()
+        self._drawn_offsets = offsets
+        self._drawn_num_datasets = num_datasets
+        self._style_dirty = False
+
+    def _replot_image(self):
+        """
+        Draw the stack as a single image with one row per data set
+
+        New data sets at the end of the key list are copied into the next
+        free rows of a preallocated buffer.  The buffer is only rebuilt when
+        data sets are reordered or removed, or when it runs out of capacity
+        """
+        grid = self._grid
+        entering = not self._showing_image
+        if entering:
+            # switch from lines to the image
+            self._clear_lines()
+            self._ax.set_aspect('auto')
+            self._showing_image = True
+
+        if (self._image_rows is None or
+                self._image_rows.shape[1] != len(grid) or
+                self._image_keys != self._key_list[:len(self._image_keys)]):
+            self._image_keys = []
+            self._image_row_of.clear()
+        # overwritten data sets that are already in the buffer
+        for key in self._dirty_keys:
+            row = self._image_row_of.get(key)
+            if row is not None:
+                self._image_rows[row] = self._data_dict[key][1]
+
+        num_datasets = len(self._key_list)
+        num_rows = len(self._image_keys)
+        if num_datasets > num_rows:
+            self._image_rows = _reserve_rows(
+                self._image_rows, num_datasets, len(grid), num_rows,
+                self._image_init_capacity)
+            for row, key in enumerate(self._key_list[num_rows:], num_rows):
+                self._image_rows[row] = self._data_dict[key][1]
+                self._image_row_of[key] = row
+            self._image_keys.extend(self._key_list[num_rows:])
+
+        if self._image is not None and self._style_dirty:
+            # a NonUniformImage can not change its cmap once it has data
+            self._image.remove()
+            self._image = None
+        if self._image is None:
+            # copy the norm so that setting the color limits below leaves
+            # the one that colors the lines alone
+            self._image = NonUniformImage(self._ax, cmap=self._cmap,
+                                          norm=copy.copy(self._norm),
+                                          interpolation='nearest')
+            self._ax.add_image(self._image)
+        self._image.set_data(grid, np.arange(num_datasets),
+                             self._image_rows[:num_datasets])
+        # the color limits come straight from the cached extents
+        extents = np.array([self._extents[key] for key in self._key_list],
+                           dtype=float)
+        self._image.set_clim(np.min(extents[:, 2]), np.max(extents[:, 3]))
+
+        if entering and not self._autoscale:
             min_x, max_x, min_y, max_y = self.find_range()
             self._ax.set_xlim(min_x, max_x)
             self._ax.set_ylim(min_y, max_y)
 
+        self._dirty_keys.clear()
+        self._style_dirty = False
+
+    def _clear_lines(self):
+        """
+        Remove all line artists
+        """
+        for line in self._lines_dict.values():
+            line.remove()
+        self._lines_dict.clear()
+        self._line_positions.clear()
+        self._offset_transforms.clear()
+        # force the colors to be recomputed when lines are drawn again
+        self._drawn_num_datasets = None
+
+    def _add_line(self, key, x, y):
+        """
+        Plot the raw (x, y) data of `key` with its own offset transform
+
+        Parameters
+        ----------
+        key : str
+            Name of the data set
+        x, y : np.ndarray
+            The un-offset data
+
+        Returns
+        -------
+        line : matplotlib.lines.Line2D
+        """
+        offset = mtransforms.Affine2D()
+        line = self._ax.plot(x, y, transform=offset + self._ax.transData)[0]
+        self._offset_transforms[key] = offset
+        self._lines_dict[key] = line
+        return line
+
+    def _set_line_offset(self, key, counter):
+        """
+        Move the line of `key` to position `counter` in the waterfall by
+        updating its translation in place
+
+        Parameters
+        ----------
+        key : str
+            Name of the data set
+        counter : int
+            Position of the data set in the key list
+        """
+        self._offset_transforms[key].clear().translate(
+            counter * self._horz_offset, counter * self._vert_offset)
+        # invalidating the transform does not mark the artist as stale
+        self._lines_dict[key].stale = True
+        self._line_positions[key] = counter
+
+    def _compute_colors(self, num_datasets):
+        """
+        Compute the colors of all lines in one vectorized call
+
+        Parameters
+        ----------
+        num_datasets : int
+            The number of data sets in the stack
+
+        Returns
+        -------
+        colors : array
+            (num_datasets, 4) array of rgba values, one row per position in
+            the key list
+        """
+        rgba = cm.ScalarMappable(self._norm, self._cmap)
+        return rgba.to_rgba(np.arange(num_datasets) / max(num_datasets, 1))
+
     def set_auto_scale(self, is_autoscaling):
         """
         Enable/disable autoscaling of the axes to show all data
@@ -190,31 +519,37 @@ class Stack1DView(AbstractDataView1D, AbstractMPLDataView):
 
     def find_range(self):
         """
-        Find the min/max in x and y
+        Find the min/max in x and y of the offset data
 
-        @tacaswell: I'm sure that this is functionality that matplotlib
-            provides but i'm not at all sure how to do it...
+        This only combines the cached extent of each data set with its
+        offset, so it scales with the number of data sets and not with the
+        number of points.
 
         Returns
         -------
         (min_x, max_x, min_y, max_y)
         """
-        if len(self._ax.lines) == 0:
+        if len(self._key_list) == 0:
             return 0, 1, 0, 1
 
-        # find min/max in x and y
-        min_x = np.zeros(len(self._ax.lines))
-        max_x = np.zeros(len(self._ax.lines))
-        min_y = np.zeros(len(self._ax.lines))
-        max_y = np.zeros(len(self._ax.lines))
+        if self._showing_image:
+            # one row per data set, centered on the data set index
+            return (self._grid[0], self._grid[-1],
+                    -0.5, len(self._key_list) - 0.5)
 
-        for idx in range(len(self._ax.lines)):
-            min_x[idx] = np.min(self._ax.lines[idx].get_xdata())
-            max_x[idx] = np.max(self._ax.lines[idx].get_xdata())
-            min_y[idx] = np.min(self._ax.lines[idx].get_ydata())
-            max_y[idx] = np.max(self._ax.lines[idx].get_ydata())
+        # (num_datasets, 4) array of the raw extents in plotting order
+        extents = np.array([self._extents[key] for key in self._key_list],
+                           dtype=float).reshape(-1, 4)
+        counter = np.arange(len(extents))
+        extents[:, :2] += (counter * self._horz_offset)[:, np.newaxis]
+        extents[:, 2:] += (counter * self._vert_offset)[:, np.newaxis]
+        # empty data sets have an extent of (inf, -inf, inf, -inf)
+        extents = extents[np.isfinite(extents).all(axis=1)]
+        if len(extents) == 0:
+            return 0, 1, 0, 1
 
-        return np.min(min_x), np.max(max_x), np.min(min_y), np.max(max_y)
+        return (np.min(extents[:, 0]), np.max(extents[:, 1]),
+                np.min(extents[:, 2]), np.max(extents[:, 3]))
 
     def clear_data(self):
         """
@@ -225,6 +560,17 @@ class Stack1DView(AbstractDataView1D, AbstractMPLDataView):
         self._data_dict.clear()
         # clear all lines from the lines_dict
         self._lines_dict.clear()
+        # clear the cached extents and change tracking
+        self._extents.clear()
+        self._line_positions.clear()
+        self._offset_transforms.clear()
+        self._dirty_keys.clear()
+        self._grid = None
+        self._off_grid_keys.clear()
+        self._image = None
+        self._image_keys = []
+        self._image_row_of.clear()
+        self._showing_image = False
         # clear the artists
         self._ax.cla()
         # clear the list of keys
@@ -233,3 +579,33 @@ class Stack1DView(AbstractDataView1D, AbstractMPLDataView):
         self.replot()
         # redraw the canvas
         self._fig.canvas.draw()
+
+
+def _data_extent(x, y):
+    """
+    Compute the extent of a single (x, y) data set
+
+    Parameters
+    ----------
+    x, y : array
+        The data
+
+    Returns
+    -------
+    extent : tuple
+        (min_x, max_x, min_y, max_y).  Empty data gives
+        (inf, -inf, inf, -inf) so that it is the identity of `_union_extent`
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if x.size == 0 or y.size == 0:
+        return (np.inf, -np.inf, np.inf, -np.inf)
+    return (np.min(x), np.max(x), np.min(y), np.max(y))
+
+
+def _union_extent(a, b):
+    """
+    Combine two (min_x, max_x, min_y, max_y) extents
+    """
+    return (min(a[0], b[0]), max(a[1], b[1]),
+            min(a[2], b[2]), max(a[3], b[3]))
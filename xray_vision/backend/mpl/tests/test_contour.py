@@ -0,0 +1,41 @@
+import matplotlib
+matplotlib.use('Agg')
+from xray_vision.backend.mpl.contour import ContourView
+import matplotlib.pyplot as plt
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+
+
+def test_contour_view():
+    fig = plt.figure()
+    x = np.linspace(0, 1, 20)
+    y = [np.sin(x * j) for j in range(3)]
+    view = ContourView(fig, [(x, _y) for _y in y], ['a', 'b', 'c'])
+    fig.canvas.draw()
+    assert_array_almost_equal(view._data_arr[:3], np.vstack(y))
+
+    # nothing changed, so the contours are not recomputed
+    artist = view._artist
+    view.replot()
+    assert view._artist is artist
+
+    # new data sets fill the next rows, resampled onto the first grid
+    buffer = view._data_arr
+    view.append_data(['d'], [x[::-1]], [x[::-1]])
+    view.replot()
+    assert view._data_arr is buffer
+    assert_array_almost_equal(view._data_arr[3], x)
+    assert view._artist is not artist
+
+    view.set_fast_mode(True)
+    view.replot()
+    assert view._artist.get_array().shape == (4, len(x))
+
+    view.remove_data(['a'])
+    view.replot()
+    assert_array_almost_equal(view._artist.get_array(),
+                              np.vstack(y[1:] + [x]))
+
+    view.clear_data()
+    view.replot()
+    fig.canvas.draw()
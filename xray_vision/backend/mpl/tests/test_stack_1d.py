@@ -0,0 +1,152 @@
+import matplotlib
+matplotlib.use('Agg')
+from xray_vision.backend.mpl.stack_1d import Stack1DView
+import matplotlib.pyplot as plt
+from matplotlib.colors import LogNorm
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+
+
+def _make_view(num_datasets=3, num_points=10):
+    fig = plt.figure()
+    x = [np.arange(num_points, dtype=float) for _ in range(num_datasets)]
+    y = [np.random.random(num_points) for _ in range(num_datasets)]
+    keys = ['data {}'.format(j) for j in range(num_datasets)]
+    return Stack1DView(fig, list(zip(x, y)), keys), x, y
+
+
+def _brute_range(view):
+    min_x, max_x, min_y, max_y = [], [], [], []
+    for counter, key in enumerate(view._key_list):
+        x, y = view._data_dict[key]
+        x = x + counter * view._horz_offset
+        y = y + counter * view._vert_offset
+        min_x.append(np.min(x))
+        max_x.append(np.max(x))
+        min_y.append(np.min(y))
+        max_y.append(np.max(y))
+    return min(min_x), max(max_x), min(min_y), max(max_y)
+
+
+def test_find_range():
+    view, x, y = _make_view()
+    assert_array_almost_equal(view.find_range(), _brute_range(view))
+
+    view.set_horz_offset(2.5)
+    view.set_vert_offset(-1)
+    assert_array_almost_equal(view.find_range(), _brute_range(view))
+
+    view.append_data(['data 1'], [np.array([20., 21.])],
+                     [np.array([5., -5.])])
+    assert_array_almost_equal(view.find_range(), _brute_range(view))
+
+    view.add_data(['new'], [np.array([-3., 1.])], [np.array([0., 1.])],
+                  position=0)
+    assert_array_almost_equal(view.find_range(), _brute_range(view))
+
+    view.remove_data(['data 1'])
+    assert_array_almost_equal(view.find_range(), _brute_range(view))
+
+
+def test_find_range_empty():
+    view, x, y = _make_view(num_datasets=0)
+    assert view.find_range() == (0, 1, 0, 1)
+    view.add_data(['empty'], [np.array([])], [np.array([])])
+    assert view.find_range() == (0, 1, 0, 1)
+
+
+def test_replot_only_touches_changed_lines():
+    view, x, y = _make_view()
+    view.replot()
+    lines = [view._lines_dict[key] for key in view._key_list]
+    for line in lines:
+        line.stale = False
+
+    view.append_data(['data 1'], [np.array([10.])], [np.array([0.5])])
+    view.replot()
+    assert [line.stale for line in lines] == [False, True, False]
+    assert len(lines[1].get_xdata()) == len(x[1]) + 1
+
+    for line in lines:
+        line.stale = False
+    view.set_vert_offset(1)
+    view.replot()
+    assert all(line.stale for line in lines)
+    # the offset is applied through the transform, not to the data
+    assert_array_almost_equal(lines[2].get_ydata(), y[2])
+    offset = view._offset_transforms['data 2'].transform([[0, 0]])
+    assert_array_almost_equal(offset, [[0, 2]])
+
+
+def test_replot_removed_data():
+    view, x, y = _make_view()
+    view.replot()
+    view.remove_data(['data 0'])
+    view.replot()
+    view.replot()
+    assert len(view._ax.lines) == 2
+    # the remaining lines slide down one position
+    view.set_horz_offset(1)
+    view.replot()
+    offset = view._offset_transforms['data 1'].transform([[0, 0]])
+    assert_array_almost_equal(offset, [[0, 0]])
+
+
+def test_image_mode():
+    view, x, y = _make_view(num_datasets=3)
+    view.set_image_mode('image')
+    view.replot()
+    assert len(view._ax.lines) == 0
+    assert len(view._ax.images) == 1
+    assert_array_almost_equal(view._image.get_array(), np.vstack(y))
+
+    # appending whole data sets fills the buffer without reallocating it
+    buffer = view._image_rows
+    new_y = np.random.random(len(x[0]))
+    view.append_data(['data 3'], [x[0]], [new_y])
+    view.replot()
+    assert view._image_rows is buffer
+    assert_array_almost_equal(view._image.get_array()[-1], new_y)
+    assert view.find_range() == (x[0][0], x[0][-1], -0.5, 3.5)
+
+    # growing one data set takes it off the shared grid
+    view.append_data(['data 0'], [np.array([100.])], [np.array([1.])])
+    view.replot()
+    assert len(view._ax.images) == 0
+    assert len(view._ax.lines) == 4
+
+    view.remove_data(['data 0'])
+    view.replot()
+    assert len(view._ax.images) == 1
+    assert_array_almost_equal(view._image.get_array(),
+                              np.vstack(y[1:] + [new_y]))
+
+
+def test_image_mode_auto():
+    num_datasets = Stack1DView._image_min_datasets
+    view, x, y = _make_view(num_datasets=num_datasets)
+    assert len(view._ax.images) == 1
+    view._fig.canvas.draw()
+    view.set_image_mode('lines')
+    view.replot()
+    assert len(view._ax.images) == 0
+    assert len(view._ax.lines) == num_datasets
+
+
+def test_image_mode_style():
+    view, x, y = _make_view(num_datasets=60)
+    assert len(view._ax.images) == 1
+    view.update_cmap('viridis')
+    view.replot()
+    assert len(view._ax.images) == 1
+    assert view._image.get_cmap().name == 'viridis'
+
+    view.update_norm(LogNorm())
+    view.replot()
+    assert len(view._ax.images) == 1
+    assert isinstance(view._image.norm, LogNorm)
+    # the limits follow the data, the norm of the view is left alone
+    y_all = np.vstack(y)
+    assert view._image.get_clim() == (np.min(y_all), np.max(y_all))
+    assert view._norm.vmin is None
+    view._fig.canvas.draw()
@@ -0,0 +1,189 @@
+# ######################################################################
+# Copyright (c) 2014, Brookhaven Science Associates, Brookhaven        #
+# National Laboratory. All rights reserved.                            #
+#                                                                      #
+# Redistribution and use in source and binary forms, with or without   #
+# modification, are permitted provided that the following conditions   #
+# are met:                                                             #
+#                                                                      #
+# * Redistributions of source code must retain the above copyright     #
+#   notice, this list of conditions and the following disclaimer.      #
+#                                                                      #
+# * Redistributions in binary form must reproduce the above copyright  #
+#   notice this list of conditions and the following disclaimer in     #
+#   the documentation and/or other materials provided with the         #
+#   distribution.                                                      #
+#                                                                      #
+# * Neither the name of the Brookhaven Science Associates, Brookhaven  #
+#   National Laboratory nor the names of its contributors may be used  #
+#   to endorse or promote products derived from this software without  #
+#   specific prior written permission.                                 #
+#                                                                      #
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS  #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT    #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS    #
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE       #
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,           #
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES   #
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR   #
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)   #
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,  #
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OTHERWISE) ARISING   #
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE   #
+# POSSIBILITY OF SUCH DAMAGE.                                          #
+########################################################################
+"""Connected component labelling of a mask that is kept up to date one
+edited rectangle at a time"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import heapq
+import logging
+import numpy as np
+from scipy import ndimage
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalLabeler(object):
+    """
+    Cache the label array of a boolean mask and, after an edit, relabel only
+    the components that touch the edited rectangle.
+
+    Labels of components that are not touched by an edit never change.  A
+    component that is edited keeps its label (when it splits, the biggest
+    piece keeps it) and new components reuse the smallest label that is not
+    in use, so the labels are stable but not necessarily consecutive.  Use
+    ``np.unique(labels)`` rather than ``labels.max()`` to find the labels in
+    use.
+
+    Connectivity is the same as the default of `scipy.ndimage.label`.
+    """
+
+    def __init__(self):
+        self._labels = None
+        # bounding box of every label, as a tuple of slices
+        self._slices = dict()
+        # union (r0, r1, c0, c1) of the edits since the last update
+        self._dirty = None
+        self._max_label = 0
+        # heap of the labels below _max_label that are not in use
+        self._free = []
+
+    def invalidate(self, region=None, shape=None):
+        """
+        Flag part of the mask as edited
+
+        Parameters
+        ----------
+        region : tuple of slices, optional
+            The edited part of the mask.  If not given, everything is
+            relabelled on the next call to `labels`
+        shape : tuple, optional
+            The shape of the mask, required to resolve open ended slices
+        """
+        if self._labels is None:
+            return
+        if region is None:
+            self._labels = None
+            return
+        if shape is None:
+            shape = self._labels.shape
+        r0, r1 = region[0].indices(shape[0])[:2]
+        c0, c1 = region[1].indices(shape[1])[:2]
+        if self._dirty is not None:
+            r0 = min(r0, self._dirty[0])
+            r1 = max(r1, self._dirty[1])
+            c0 = min(c0, self._dirty[2])
+            c1 = max(c1, self._dirty[3])
+        self._dirty = (r0, r1, c0, c1)
+
+    def labels(self, mask):
+        """
+        The label array of `mask`
+
+        Parameters
+        ----------
+        mask : array
+            The boolean mask, which must only have changed in the regions
+            passed to `invalidate` since the last call
+
+        Returns
+        -------
+        labels : array
+            Read-only integer array, 0 is background
+        """
+        if self._labels is None or self._labels.shape != mask.shape:
+            self._labels, self._max_label = ndimage.label(mask)
+            self._slices = dict(
+                (lbl, sl) for lbl, sl in
+                enumerate(ndimage.find_objects(self._labels), 1)
+                if sl is not None)
+            self._dirty = None
+            self._free = []
+        elif self._dirty is not None:
+            self._update(mask)
+            self._dirty = None
+        labels = self._labels.view()
+        labels.flags.writeable = False
+        return labels
+
+    def _update(self, mask):
+        """
+        Relabel the components that touch the edited rectangle
+        """
+        r0, r1, c0, c1 = self._dirty
+        shape = mask.shape
+        old = self._labels
+        # every component within one pixel of the edit may have changed
+        near = old[max(r0 - 1, 0):min(r1 + 1, shape[0]),
+                   max(c0 - 1, 0):min(c1 + 1, shape[1])]
+        affected = np.unique(near)
+        affected = affected[affected > 0]
+
+        # the part of the mask that holds the edit and all of those
+        # components
+        R0, R1, C0, C1 = r0, r1, c0, c1
+        for lbl in affected:
+            rows, cols = self._slices.pop(lbl)
+            R0 = min(R0, rows.start)
+            R1 = max(R1, rows.stop)
+            C0 = min(C0, cols.start)
+            C1 = max(C1, cols.stop)
+        region = (slice(R0, R1), slice(C0, C1))
+        old_sub = old[region]
+        touched = np.isin(old_sub, affected)
+        touched[r0 - R0:r1 - R0, c0 - C0:c1 - C0] = True
+        new_sub, num = ndimage.label(mask[region] & touched)
+
+        # give each new component the old label it overlaps most
+        label_map = np.zeros(num + 1, dtype=old.dtype)
+        both = (new_sub > 0) & (old_sub > 0)
+        pairs = (new_sub[both].astype(np.int64) * (self._max_label + 1) +
+                 old_sub[both])
+        keys, counts = np.unique(pairs, return_counts=True)
+        new_ids = keys // (self._max_label + 1)
+        old_ids = keys % (self._max_label + 1)
+        taken = set()
+        for idx in np.lexsort((old_ids, -counts)):
+            n, o = new_ids[idx], old_ids[idx]
+            if label_map[n] == 0 and o not in taken:
+                label_map[n] = o
+                taken.add(o)
+        # the remaining components get the smallest unused labels
+        for lbl in affected:
+            if lbl not in taken:
+                heapq.heappush(self._free, lbl)
+        for n in np.flatnonzero(label_map[1:] == 0) + 1:
+            if self._free:
+                label_map[n] = heapq.heappop(self._free)
+            else:
+                self._max_label += 1
+                label_map[n] = self._max_label
+
+        old[region] = np.where(touched, label_map[new_sub], old_sub)
+        for n, (rows, cols) in enumerate(ndimage.find_objects(new_sub), 1):
+            self._slices[label_map[n]] = (
+                slice(rows.start + R0, rows.stop + R0),
+                slice(cols.start + C0, cols.stop + C0))
@@ -0,0 +1,215 @@
+# ######################################################################
+# Copyright (c) 2014, Brookhaven Science Associates, Brookhaven        #
+# National Laboratory. All rights reserved.                            #
+#                                                                      #
+# Redistribution and use in source and binary forms, with or without   #
+# modification, are permitted provided that the following conditions   #
+# are met:                                                             #
+#                                                                      #
+# * Redistributions of source code must retain the above copyright     #
+#   notice, this list of conditions and the following disclaimer.      #
+#                                                                      #
+# * Redistributions in binary form must reproduce the above copyright  #
+#   notice this list of conditions and the following disclaimer in     #
+#   the documentation and/or other materials provided with the         #
+#   distribution.                                                      #
+#                                                                      #
+# * Neither the name of the Brookhaven Science Associates, Brookhaven  #
+#   National Laboratory nor the names of its contributors may be used  #
+#   to endorse or promote products derived from this software without  #
+#   specific prior written permission.                                 #
+#                                                                      #
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS  #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT    #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS    #
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE       #
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,           #
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES   #
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR   #
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)   #
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,  #
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OTHERWISE) ARISING   #
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE   #
+# POSSIBILITY OF SUCH DAMAGE.                                          #
+########################################################################
+"""Automatic masking of hot, dead and noisy detector pixels from a stack of
+frames.  The result can be touched up by hand with
+``ManualMask(ax, image, mask=auto_mask(frames))``"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import logging
+import numpy as np
+from ..utils.frame_stack import iter_chunks
+
+logger = logging.getLogger(__name__)
+
+
+class PixelStatistics(object):
+    """
+    Running per-pixel mean and variance of a stream of frames.
+
+    Chunks of frames are reduced with numpy and merged into the running
+    totals with the parallel form of Welford's algorithm, so memory use only
+    depends on the frame and chunk sizes, never on the number of frames.
+    """
+
+    def __init__(self, shape):
+        """
+        Parameters
+        ----------
+        shape : tuple
+            The shape of a single frame
+        """
+        self.shape = tuple(shape)
+        self.count = 0
+        self.mean = np.zeros(self.shape)
+        # sum of squared differences from the mean
+        self._m2 = np.zeros(self.shape)
+
+    def update(self, frames):
+        """
+        Add frames to the statistics
+
+        Parameters
+        ----------
+        frames : array
+            A single frame or a (N, ...) chunk of frames
+        """
+        frames = np.asarray(frames, dtype=float)
+        if frames.shape == self.shape:
+            frames = frames[np.newaxis]
+        if frames.shape[1:] != self.shape:
+            raise ValueError(("frames of shape {0} do not match the shape "
+                              "{1}").format(frames.shape[1:], self.shape))
+        n = len(frames)
+        if n == 0:
+            return
+        chunk_mean = frames.mean(axis=0)
+        chunk_m2 = ((frames - chunk_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean += delta * (n / total)
+        self._m2 += chunk_m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+
+    @property
+    def variance(self):
+        if self.count < 2:
+            return np.zeros(self.shape)
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+
+def pixel_statistics(frames, chunk_size=100):
+    """
+    Compute the per-pixel statistics of a stack of frames, chunk by chunk
+
+    Parameters
+    ----------
+    frames : array or sequence or iterable
+        The frames, see `xray_vision.utils.frame_stack.iter_chunks`
+    chunk_size : int, optional
+        The number of frames to reduce at once
+
+    Returns
+    -------
+    stats : PixelStatistics
+    """
+    stats = None
+    for _, chunk in iter_chunks(frames, chunk_size):
+        chunk = np.asarray(chunk)
+        if stats is None:
+            stats = PixelStatistics(np.shape(chunk)[1:])
+        stats.update(chunk)
+    if stats is None:
+        raise ValueError("Can not compute statistics of an empty stack")
+    return stats
+
+
+def classify_pixels(stats, dead_value=0, hot_threshold=10,
+                    noisy_threshold=10):
+    """
+    Flag bad pixels from their statistics
+
+    Hot and noisy pixels are outliers of the mean and standard deviation
+    compared to all pixels, measured in units of the median absolute
+    deviation so that the bad pixels themselves do not skew the threshold.
+
+    Parameters
+    ----------
+    stats : PixelStatistics
+    dead_value : float, optional
+        Pixels whose mean never rises above this value are dead.
+        Defaults to 0.
+    hot_threshold : float, optional
+        Pixels whose mean is more than this many median absolute deviations
+        above the median mean are hot.  Defaults to 10.
+    noisy_threshold : float, optional
+        Pixels whose standard deviation is more than this many median
+        absolute deviations above the median standard deviation are noisy.
+        Defaults to 10.
+
+    Returns
+    -------
+    hot, dead, noisy : array
+        Boolean arrays, True for the flagged pixels
+    """
+    mean = stats.mean
+    std = stats.std
+    dead = mean <= dead_value
+    live = ~dead
+    hot = live & _outliers(mean, live, hot_threshold)
+    noisy = live & _outliers(std, live, noisy_threshold)
+    return hot, dead, noisy
+
+
+def auto_mask(frames, chunk_size=100, dead_value=0, hot_threshold=10,
+              noisy_threshold=10):
+    """
+    Mask the hot, dead and noisy pixels of a stack of frames
+
+    Parameters
+    ----------
+    frames : array or iterable
+        A (N, ...) array or any iterable of frames, see `pixel_statistics`
+    chunk_size : int, optional
+        The number of frames to reduce at once
+    dead_value, hot_threshold, noisy_threshold : float, optional
+        See `classify_pixels`
+
+    Returns
+    -------
+    mask : array
+        Boolean array, True for bad pixels
+
+    Example
+    -------
+    >>> bad = auto_mask(np.load('dark_frames.npy', mmap_mode='r'))
+    >>> m = ManualMask(ax, image, mask=bad)
+    """
+    stats = pixel_statistics(frames, chunk_size=chunk_size)
+    hot, dead, noisy = classify_pixels(stats, dead_value=dead_value,
+                                       hot_threshold=hot_threshold,
+                                       noisy_threshold=noisy_threshold)
+    return hot | dead | noisy
+
+
+def _outliers(values, valid, threshold):
+    """
+    Find the values more than `threshold` median absolute deviations above
+    the median of the `valid` values
+    """
+    if not valid.any():
+        return np.zeros(values.shape, dtype=bool)
+    median = np.median(values[valid])
+    mad = np.median(np.abs(values[valid] - median))
+    if mad == 0:
+        # more than half of the pixels agree exactly, so use the spread of
+        # the rest
+        mad = np.mean(np.abs(values[valid] - median))
+    return values > median + threshold * mad
@@ -45,22 +45,30 @@ import six
 import logging
 from collections import deque
 import numpy as np
-from scipy import ndimage
-from matplotlib.widgets import Lasso
-from matplotlib.colors import ListedColormap, BoundaryNorm
+import matplotlib
+from matplotlib.widgets import Lasso, Slider
+from matplotlib.colors import to_rgba
 from matplotlib import path
+from matplotlib.transforms import Bbox
 from ..utils.mpl_helpers import ensure_ax_meth
+from .packed_mask import PackedMask
+from .stack_mask import StackMask
+from ._labels import IncrementalLabeler
 
 logger = logging.getLogger(__name__)
 
 class ManualMask(object):
+    # with downsample='auto', images with fewer pixels are shown in full
+    _auto_downsample_min_pixels = 2 ** 23
+
     @ensure_ax_meth
     def __init__(self, ax, image, cmap='gray',
                  norm=None, aspect=None, interpolation='nearest',
                  alpha=None, vmin=None, vmax=None,
                  origin=None, extent=None, filternorm=1,
                  filterrad=4.0, resample=None, url=None,
-                 undo_history_depth=20, mask=None, **kwargs):
+                 undo_history_depth=20, mask=None, brush_radius=5,
+                 downsample='auto', **kwargs):
         """
         Use a GUI to specify region(s) of interest.
 
@@ -73,8 +81,12 @@ class ManualMask(object):
         i - enable lasso, free hand drawing to select points
           alt - while lasso in active, invert selection to remove points
         t - pixel flipping, toggle individual pixels
+        b - brush, click and drag to paint a circular brush
+          alt - while the brush is active, erase instead of paint
+          +/- - grow/shrink the brush radius by one pixel
         r - clear, remove all masks
-        z - undo, undo the last edit up to `max_memory` steps back
+        z - undo, undo the last edit up to `undo_history_depth` steps back
+        y - redo, redo the last undone edit
 
         Parameters
         ----------
@@ -83,14 +95,32 @@ class ManualMask(object):
             backdrop shown under drawing
             This is used for visual purposes and to set the shape of the
             drawing canvas. Its content does not affect the output.
+            A (N, rows, columns) stack of frames (including memmaps and
+            other lazily loaded arrays) adds a slider to pick the frame,
+            and each frame gets its own mask.
         cmap : str, optional
             'gray' by default
         undo_history_depth : int, optional
-            The maximum number of frames to keep in the undo history
-            Defaults to 20.
-        mask : array, optional
+            The maximum number of edits to keep in the undo history.  Only
+            the pixels that changed are kept for each edit, so deep
+            histories are cheap.  Defaults to 20.
+        mask : array or PackedMask or StackMask, optional
             get an existing mask, boolean array
-            shape image shape
+            shape image shape.  For a stack of frames, a 2D mask is used
+            for every frame.
+        brush_radius : int, optional
+            The initial radius of the brush, in pixels.  Defaults to 5.
+        downsample : int or 'auto', optional
+            When the whole image is in view, show only every
+            `downsample`-th pixel of the image, and the mask reduced over
+            `downsample` square blocks, so that large images stay
+            responsive.  Zooming in shows only the part of the image in
+            view, with a factor that shrinks in proportion down to 1
+            (every pixel).  All edits are made at full resolution.
+            'auto' (the default) shows every pixel of images with fewer
+            than `_auto_downsample_min_pixels` pixels and otherwise picks
+            the smallest factor that fits the image in the current size of
+            the axes.  1 always shows every pixel.
 
         Other Parameters
         ----------------
@@ -100,38 +130,70 @@ class ManualMask(object):
         Attributes
         ----------
         mask : boolean array
-            all "postive" regions are True, negative False
+            all "postive" regions are True, negative False.  This is the
+            array that is edited, not a copy.  After changing it in place
+            assign it back (``m.mask = m.mask``) so that the overlay and
+            `label_array` are updated
 
         label_array : integer array
-            each contiguous region is labeled with an integer
+            each contiguous region is labeled with an integer.  The labels
+            are cached and only the regions touched by an edit are
+            relabeled, so labels stay the same across edits where possible
+            but are not necessarily consecutive.  Every access returns a
+            new copy that later edits do not change
+
+        frame : int
+            The frame shown and edited, for a stack of frames
+
+        stack_mask : StackMask
+            The masks of all frames, for a stack of frames
+
+        active_tool : str
+            The name of the tool in use, '' if none
 
         Methods
         -------
         undo()
             Undo the last-drawn region.
 
+        redo()
+            Redo the last undone region.
+
         reset()
             Clear all regions
 
+        save_mask(fname)
+            Save the mask in the compact `PackedMask` file format
+
         enable_lasso()
             Enables the lasso to select free hand regions.
 
         enable_pixel_flip()
             Enables toggling individual pixels on/off
 
+        enable_brush()
+            Enables painting with a circular brush
+
+        set_brush_radius(radius)
+            Sets the radius of the brush in pixels
+
         disable_tools()
             Turns off all mouse driven input
 
+        set_frame(frame)
+            Show and edit another frame of a stack.  The undo history is
+            per frame and is cleared.
+
+        apply_to_all_frames()
+            Use the mask of the current frame as the base mask of the stack
+
         Example
         -------
         >>> m = ManualMask(my_img)
         >>> boolean_array = m.mask  # inside ROI(s) is True, outside False
         >>> label_array = m.label_array  # a unique number for each ROI
         """
-        mask_cmap = ListedColormap([(1, 1, 1, 0), 'b'])
-        mask_norm = BoundaryNorm([0, 0.5, 1], mask_cmap.N, clip=True)
-
-        self._cid = None
+        self._cids = []
 
         self.ax = ax
         self._base_format_fuc = ax.format_coord
@@ -142,15 +204,56 @@ class ManualMask(object):
         self.ax.format_coord = wrapped_format_coord
 
         self.canvas = ax.figure.canvas
+        if len(image.shape) == 3:
+            # a stack of frames, each with its own mask
+            self._stack = image
+            self._frame = 0
+            if not isinstance(mask, StackMask):
+                if mask is None:
+                    mask = np.zeros(image.shape[1:], dtype=bool)
+                mask = StackMask(mask, len(image))
+            self._stack_mask = mask
+            image = np.asarray(image[0])
+            mask = mask.frame_mask(0)
+        else:
+            self._stack = None
+            self._stack_mask = None
         self.img_shape = image.shape
         self.data = image
 
         if mask is None:
             self._mask = np.zeros(self.img_shape, dtype=bool)
         else:
-            self._mask = mask  # if there is an existing mask
+            # if there is an existing mask, copy it since it is edited in
+            # place
+            self._mask = np.array(mask, dtype=bool)
+
+        if downsample == 'auto':
+            downsample = 1
+            if np.prod(self.img_shape) >= self._auto_downsample_min_pixels:
+                downsample = max(
+                    int(np.ceil(self.img_shape[1] / max(ax.bbox.width, 1))),
+                    int(np.ceil(self.img_shape[0] / max(ax.bbox.height,
+                                                        1))))
+        # the factor with the whole image in view, the one in use and the
+        # (rows, columns) pixels shown, which are whole blocks that may
+        # hang off of the image
+        self._max_downsample = max(int(downsample), 1)
+        self._downsample = self._max_downsample
+        self._view = tuple(
+            slice(0, -(-n // self._downsample) * self._downsample)
+            for n in self.img_shape)
+        if origin is None:
+            origin = matplotlib.rcParams['image.origin']
+        self._origin = origin
+        self._full_extent = _pixel_extent(self.img_shape, origin, extent)
+        if self._max_downsample > 1:
+            extent = self._view_extent(self._view)
+        display_shape = tuple(-(-n // self._downsample)
+                              for n in self.img_shape)
 
-        self.base_image = ax.imshow(self.data, zorder=1, cmap=cmap,
+        self.base_image = ax.imshow(self._view_data(),
+                                    zorder=1, cmap=cmap,
                                     norm=norm, aspect=aspect,
                                     interpolation=interpolation, alpha=alpha,
                                     vmin=vmin, vmax=vmax,
@@ -159,23 +262,53 @@ class ManualMask(object):
                                     filterrad=4.0, resample=resample, url=url,
                                     **kwargs)
 
-        self.overlay_image = ax.imshow(self.mask,
-                                       zorder=2,
-                                       alpha=.66,
-                                       cmap=mask_cmap,
-                                       norm=mask_norm,
-                                       interpolation='nearest',
-                                       origin=origin, extent=extent)
-        ax.set_title("'i': lasso, 't': pixel flip, alt inverts lasso, \n "
-                     "'r': reset mask, 'q': no tools, 'z': undo last-drawn")
-
-        y, x = np.mgrid[:image.shape[0], :image.shape[1]]
-        self.points = np.transpose((x.ravel(), y.ravel()))
+        # the overlay is kept as an RGBA image that is updated in place, one
+        # changed rectangle at a time
+        self._mask_color = np.multiply(to_rgba('b'), 255).astype(np.uint8)
+        self.overlay_image = ax.imshow(
+            np.zeros(display_shape + (4,), dtype=np.uint8),
+            zorder=2,
+            alpha=.66,
+            interpolation='nearest',
+            origin=origin, extent=extent)
+        self._overlay_rgba = np.ma.getdata(self.overlay_image.get_array())
+        if self._max_downsample > 1:
+            ax.set_xlim(self._full_extent[:2])
+            ax.set_ylim(self._full_extent[2:])
+            # show the part in view at a finer factor when zoomed in
+            ax.callbacks.connect('xlim_changed', self._on_lims_changed)
+            ax.callbacks.connect('ylim_changed', self._on_lims_changed)
+        self._update_overlay_rgba((slice(None), slice(None)))
+        # the overlay is drawn by `_on_draw` on top of a cached background so
+        # that edits can be blitted
+        self.overlay_image.set_animated(True)
+        self._background = None
+        ax.set_title("'i': lasso, 't': pixel flip, 'b': brush, alt inverts "
+                     "lasso/brush, \n '+'/'-': brush size, 'r': reset mask, "
+                     "'q': no tools, 'z': undo, 'y': redo")
+
         self.canvas.mpl_connect('key_press_event', self._key_press_callback)
+        self.canvas.mpl_connect('draw_event', self._on_draw)
         self._active = ''
         self._lasso = None
         self._remove = False
-        self._mask_stack = deque([], undo_history_depth)
+        self._labeler = IncrementalLabeler()
+        self._undo_stack = deque([], undo_history_depth)
+        self._redo_stack = deque([], undo_history_depth)
+        self.set_brush_radius(brush_radius)
+        # the last brush position and the edits of the current stroke
+        self._brush_xy = None
+        self._stroke = None
+
+        self.frame_slider = None
+        if self._stack is not None:
+            pos = ax.get_position()
+            slider_ax = ax.figure.add_axes([pos.x0, max(pos.y0 - .1, 0),
+                                            pos.width, .03])
+            self.frame_slider = Slider(slider_ax, 'frame', 0,
+                                       len(self._stack) - 1, valinit=0,
+                                       valstep=1, valfmt='%d')
+            self.frame_slider.on_changed(self.set_frame)
 
     def _lasso_on_press(self, event):
         if self.canvas.widgetlock.locked():
@@ -202,13 +335,13 @@ class ManualMask(object):
 
     def _lasso_call_back(self, verts):
         self.canvas.widgetlock.release(self._lasso)
-        p = path.Path(verts)
-
-        new_mask = p.contains_points(self.points).reshape(*self.img_shape)
-        if self._remove:
-            self.mask = self.mask & ~new_mask
-        else:
-            self.mask = self.mask | new_mask
+        # only the pixels in the bounding box of the lasso can be selected
+        region, selected = _rasterize_polygon(verts, self.img_shape)
+        if region is not None:
+            if self._remove:
+                self._edit(region, self._mask[region] & ~selected)
+            else:
+                self._edit(region, self._mask[region] | selected)
 
         self._lasso = None
 
@@ -216,10 +349,83 @@ class ManualMask(object):
         if event.inaxes is not self.ax:
             return
         x, y = int(event.xdata + .5), int(event.ydata + .5)
-        tmp_mask = self.mask
-        if 0 <= x < self.img_shape[1] and 0 <= y <= self.img_shape[0]:
-            tmp_mask[y, x] = ~tmp_mask[y, x]
-            self.mask = tmp_mask
+        if 0 <= x < self.img_shape[1] and 0 <= y < self.img_shape[0]:
+            region = (slice(y, y + 1), slice(x, x + 1))
+            self._edit(region, ~self._mask[region])
+
+    def _brush_on_press(self, event):
+        if self.canvas.widgetlock.locked() or event.inaxes is not self.ax:
+            return
+        self._remove = event.key == 'alt'
+        # collect the edits of the whole stroke into a single undo step
+        self._stroke = []
+        self._brush_xy = (event.xdata, event.ydata)
+        self._paint_segment(self._brush_xy, self._brush_xy)
+
+    def _brush_on_motion(self, event):
+        if self._stroke is None or event.inaxes is not self.ax:
+            return
+        xy = (event.xdata, event.ydata)
+        self._paint_segment(self._brush_xy, xy)
+        self._brush_xy = xy
+
+    def _brush_on_release(self, event):
+        if self._stroke is None:
+            return
+        delta = _MaskDelta.combine(self._stroke)
+        if delta is not None:
+            self._undo_stack.append(delta)
+            self._redo_stack.clear()
+        self._stroke = None
+        self._brush_xy = None
+
+    def _paint_segment(self, start, end):
+        """
+        Paint (or erase) with the brush along the line from `start` to `end`
+
+        Parameters
+        ----------
+        start, end : tuple
+            (x, y) positions in pixel coordinates
+        """
+        r = self._brush_radius
+        (x0, y0), (x1, y1) = start, end
+        # place the brush often enough that consecutive stamps overlap
+        num = int(np.ceil(np.hypot(x1 - x0, y1 - y0) / max(r / 2, .5))) + 1
+        xs = np.rint(np.linspace(x0, x1, num)).astype(int)
+        ys = np.rint(np.linspace(y0, y1, num)).astype(int)
+        # stamp the stencil into the bounding box of the whole segment
+        top, left = ys.min() - r, xs.min() - r
+        size = 2 * r + 1
+        stamped = np.zeros((ys.max() - ys.min() + size,
+                            xs.max() - xs.min() + size), dtype=bool)
+        for x, y in zip(xs - xs.min(), ys - ys.min()):
+            stamped[y:y + size, x:x + size] |= self._stencil
+        # and keep the part of it that is on the image
+        rows = slice(max(top, 0), min(top + len(stamped), self.img_shape[0]))
+        cols = slice(max(left, 0), min(left + stamped.shape[1],
+                                       self.img_shape[1]))
+        if rows.start >= rows.stop or cols.start >= cols.stop:
+            return
+        painted = stamped[rows.start - top:rows.stop - top,
+                          cols.start - left:cols.stop - left]
+        region = (rows, cols)
+        if self._remove:
+            self._edit(region, self._mask[region] & ~painted)
+        else:
+            self._edit(region, self._mask[region] | painted)
+
+    def set_brush_radius(self, radius):
+        """
+        Set the radius of the brush
+
+        Parameters
+        ----------
+        radius : int
+            The radius in pixels.  0 paints single pixels
+        """
+        self._brush_radius = max(int(radius), 0)
+        self._stencil = _disk_stencil(self._brush_radius)
 
     @property
     def mask(self):
@@ -227,24 +433,329 @@ class ManualMask(object):
 
     @mask.setter
     def mask(self, v):
-        self._mask_stack.append(self._mask)
-        self._mask = v
-        self.overlay_image.set_data(v)
-        self.canvas.draw_idle()
+        if v is self._mask:
+            # edited in place, there is nothing to diff against
+            self._mask_changed()
+            return
+        self._edit((slice(None), slice(None)), np.asarray(v, dtype=bool))
+
+    @property
+    def frame(self):
+        if self._stack is None:
+            return None
+        return self._frame
+
+    @property
+    def stack_mask(self):
+        if self._stack_mask is not None:
+            # store the edits of the current frame
+            self._stack_mask.set_frame_mask(self._frame, self._mask)
+        return self._stack_mask
+
+    def set_frame(self, frame):
+        """
+        Show and edit another frame of the stack
+
+        Parameters
+        ----------
+        frame : int
+        """
+        if self._stack is None:
+            raise ValueError("ManualMask was not given a stack of frames")
+        frame = int(frame)
+        if frame == self._frame:
+            return
+        self._brush_on_release(None)
+        self._stack_mask.set_frame_mask(self._frame, self._mask)
+        self._frame = frame
+        self.data = np.asarray(self._stack[frame])
+        self.base_image.set_data(self._view_data())
+        # edit in place, the array returned by `mask` stays valid
+        self._mask[...] = self._stack_mask.frame_mask(frame)
+        self._undo_stack.clear()
+        self._redo_stack.clear()
+        if self.frame_slider is not None and self.frame_slider.val != frame:
+            self.frame_slider.set_val(frame)
+        self._mask_changed()
+
+    def apply_to_all_frames(self):
+        """
+        Make the mask of the current frame the base mask of the stack.
+        Other frames keep the pixels they add to or remove from the base.
+        """
+        if self._stack is None:
+            raise ValueError("ManualMask was not given a stack of frames")
+        self._stack_mask.base = self._mask
+        self._stack_mask.clear_frame(self._frame)
+
+    @property
+    def packed_mask(self):
+        return PackedMask.from_array(self._mask)
+
+    def save_mask(self, fname):
+        """
+        Save the mask in the `PackedMask` file format.  Load it back with
+        ``ManualMask(ax, image, mask=PackedMask.load(fname))``
+
+        Parameters
+        ----------
+        fname : str or file
+        """
+        self.packed_mask.save(fname)
+
+    def _edit(self, region, new_values):
+        """
+        Replace part of the mask, recording the pixels that flipped in the
+        undo history
+
+        Parameters
+        ----------
+        region : tuple of slices
+            The part of the mask to replace
+        new_values : array
+            Boolean array with the new values for `region`
+        """
+        delta = _MaskDelta.from_edit(self._mask, region, new_values)
+        if delta is None:
+            return
+        delta.apply(self._mask)
+        if self._stroke is not None:
+            # part of a brush stroke, which is recorded when it ends
+            self._stroke.append(delta)
+        else:
+            self._undo_stack.append(delta)
+            self._redo_stack.clear()
+        self._mask_changed(delta.region)
+
+    def _mask_changed(self, region=None):
+        """
+        Show the current mask and flag the label array for updating
+
+        Parameters
+        ----------
+        region : tuple of slices, optional
+            The only part of the mask that changed.  If given, only that
+            part of the overlay is recolored and, if the canvas supports it,
+            only that part of the canvas is redrawn
+        """
+        self._labeler.invalidate(region, self.img_shape)
+        if region is None:
+            self._update_overlay_rgba((slice(None), slice(None)))
+            self.canvas.draw_idle()
+            return
+        self._update_overlay_rgba(region)
+        if self._background is None:
+            self.canvas.draw_idle()
+            return
+        self._blit_region(region)
+
+    def _update_overlay_rgba(self, region):
+        """
+        Recolor part of the cached overlay from the mask, in place.  When
+        downsampling, a block of the overlay is colored if any of its
+        pixels are in the mask.
+
+        Parameters
+        ----------
+        region : tuple of slices
+            Part of the mask in pixel coordinates, which is rounded out to
+            whole blocks
+        """
+        f = self._downsample
+        rows, cols = [_block_slice(sl, n, f, view) for sl, n, view in
+                      zip(region, self.img_shape, self._view)]
+        row0, col0 = self._view[0].start, self._view[1].start
+        shown = self._mask[row0 + rows.start * f:row0 + rows.stop * f,
+                           col0 + cols.start * f:col0 + cols.stop * f]
+        if f > 1:
+            shown = _block_any(shown, f)
+        np.multiply(shown[..., np.newaxis], self._mask_color,
+                    out=self._overlay_rgba[rows, cols], casting='unsafe')
+        # drop any cached resampling of the overlay
+        self.overlay_image.changed()
+
+    def _on_draw(self, event):
+        """
+        Grab the background without the (animated) overlay for blitting and
+        then draw the overlay on top of it
+        """
+        if event.canvas.is_saving():
+            # animated artists are drawn when saving
+            return
+        if event.canvas is self.canvas and self.canvas.supports_blit:
+            self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.overlay_image.draw(event.renderer)
+
+    def _blit_region(self, region):
+        """
+        Redraw the overlay in the part of the canvas covering `region`
+
+        Parameters
+        ----------
+        region : tuple of slices
+            Part of the mask in pixel coordinates
+        """
+        bbox = self._region_to_display(region)
+        if bbox is None:
+            return
+        f = self._downsample
+        x, y = self._pixel_edges_to_data([0, f], [0, f])
+        block = np.abs(np.diff(self.ax.transData.transform(
+            np.transpose([x, y])), axis=0))
+        if (block > 1).any():
+            # a magnified overlay is resampled differently when it is
+            # clipped, but then the images are small enough to redraw
+            self.canvas.draw_idle()
+            return
+        # restore the background without the overlay, in the top-left
+        # origin pixel coordinates the Agg buffers use
+        height = self.canvas.get_renderer().height
+        origin = self._background.get_extents()[:2]
+        self.canvas.restore_region(
+            self._background,
+            bbox=(bbox.x0, height - bbox.y1, bbox.x1, height - bbox.y0),
+            xy=origin)
+        # draw only the changed part of the overlay
+        clip_box = self.overlay_image.get_clip_box()
+        self.overlay_image.set_clip_box(bbox)
+        self.ax.draw_artist(self.overlay_image)
+        self.overlay_image.set_clip_box(clip_box)
+        self.canvas.blit(bbox)
+
+    def _region_to_display(self, region):
+        """
+        Find the display (pixel) bounding box of part of the mask, rounded
+        out to whole pixels and clipped to the axes
+
+        Parameters
+        ----------
+        region : tuple of slices
+
+        Returns
+        -------
+        bbox : Bbox or None
+            None if the region is not visible
+        """
+        f = self._downsample
+        rows, cols = [_block_slice(sl, n, f, view) for sl, n, view in
+                      zip(region, self.img_shape, self._view)]
+        if rows.start == rows.stop or cols.start == cols.stop:
+            return None
+        # the edges of the blocks in data coordinates
+        row0, col0 = self._view[0].start, self._view[1].start
+        x, y = self._pixel_edges_to_data(
+            col0 + np.array([cols.start, cols.stop]) * f,
+            row0 + np.array([rows.start, rows.stop]) * f)
+        corners = self.ax.transData.transform(np.transpose([x, y]))
+        bbox = Bbox.intersection(Bbox.from_extents(
+            np.floor(corners.min(axis=0) - 1),
+            np.ceil(corners.max(axis=0) + 1)).frozen(), self.ax.bbox)
+        return bbox
+
+    def _pixel_edges_to_data(self, cols, rows):
+        """
+        The data coordinates of pixel edges
+
+        Parameters
+        ----------
+        cols, rows : array
+            Column and row edges, 0 is the first edge of the image
+
+        Returns
+        -------
+        x, y : array
+        """
+        left, right, bottom, top = self._full_extent
+        num_rows, num_cols = self.img_shape
+        x = left + np.asarray(cols) * (right - left) / num_cols
+        if self._origin == 'upper':
+            y = top + np.asarray(rows) * (bottom - top) / num_rows
+        else:
+            y = bottom + np.asarray(rows) * (top - bottom) / num_rows
+        return x, y
+
+    def _view_extent(self, view):
+        """
+        The imshow extent of the (rows, columns) pixels `view`
+        """
+        rows, cols = view
+        (left, right), (first, last) = self._pixel_edges_to_data(
+            [cols.start, cols.stop], [rows.start, rows.stop])
+        if self._origin == 'upper':
+            return (left, right, last, first)
+        return (left, right, first, last)
+
+    def _view_data(self):
+        """
+        The pixels of the image that are shown
+        """
+        rows, cols = self._view
+        f = self._downsample
+        return self.data[rows.start:rows.stop:f, cols.start:cols.stop:f]
+
+    def _on_lims_changed(self, ax):
+        """
+        Show the part of the image in view, with the largest factor up to
+        `_max_downsample` that keeps it as fine as the full view
+        """
+        x = np.array(ax.get_xlim())
+        y = np.array(ax.get_ylim())
+        left, right, bottom, top = self._full_extent
+        num_rows, num_cols = self.img_shape
+        cols = (x - left) / (right - left) * num_cols
+        if self._origin == 'upper':
+            rows = (y - top) / (bottom - top) * num_rows
+        else:
+            rows = (y - bottom) / (top - bottom) * num_rows
+        bounds = []
+        for edges, n in ((rows, num_rows), (cols, num_cols)):
+            start = int(np.clip(np.floor(edges.min()), 0, n - 1))
+            stop = int(np.clip(np.ceil(edges.max()), start + 1, n))
+            bounds.append((start, stop))
+        fraction = max((stop - start) / n for (start, stop), n in
+                       zip(bounds, self.img_shape))
+        f = max(int(np.ceil(self._max_downsample * fraction)), 1)
+        view = tuple(slice(start // f * f, -(-stop // f) * f)
+                     for start, stop in bounds)
+        if f == self._downsample and view == self._view:
+            return
+        self._downsample = f
+        self._view = view
+        # the cached background is of the old view, wait for a redraw
+        self._background = None
+        extent = self._view_extent(view)
+        self.base_image.set_data(self._view_data())
+        self.base_image.set_extent(extent)
+        self.overlay_image.set_data(np.zeros(
+            tuple((sl.stop - sl.start) // f for sl in view) + (4,),
+            dtype=np.uint8))
+        self.overlay_image.set_extent(extent)
+        self._overlay_rgba = np.ma.getdata(self.overlay_image.get_array())
+        self._update_overlay_rgba((slice(None), slice(None)))
 
     def undo(self):
         try:
-            # pop off the previous mask
-            new_old_mask = self._mask_stack.pop()
-            # assign the previous mask to be the current one
-            self.mask = new_old_mask
-            # pop off and discard (for now) the previous current mask
-            self._mask_stack.pop()
+            # pop off the last edit
+            delta = self._undo_stack.pop()
+        except IndexError:
+            return
+        # flip its pixels back and keep it around to redo
+        delta.apply(self._mask)
+        self._redo_stack.append(delta)
+        self._mask_changed(delta.region)
+
+    def redo(self):
+        try:
+            # pop off the last undone edit
+            delta = self._redo_stack.pop()
         except IndexError:
-            pass
+            return
+        delta.apply(self._mask)
+        self._undo_stack.append(delta)
+        self._mask_changed(delta.region)
 
     def reset(self):
-        self.mask = self.mask * False
+        self.mask = np.zeros(self.img_shape, dtype=bool)
 
     def _key_press_callback(self, event):
         'whenever a key is pressed'
@@ -260,36 +771,296 @@ class ManualMask(object):
             self.disable_tools()
         elif event.key == 'z':
             self.undo()
+        elif event.key == 'y':
+            self.redo()
+        elif event.key == 'b':
+            self.enable_brush()
+        elif event.key == '+':
+            self.set_brush_radius(self._brush_radius + 1)
+        elif event.key == '-':
+            self.set_brush_radius(self._brush_radius - 1)
 
     def enable_lasso(self):
         # turn off anything else
         self.disable_tools()
 
-        self._cid = self.canvas.mpl_connect('button_press_event',
-                                            self._lasso_on_press)
+        self._cids.append(self.canvas.mpl_connect('button_press_event',
+                                                  self._lasso_on_press))
         self._active = 'lasso'
 
     def enable_pixel_flip(self):
         # turn off anything else
         self.disable_tools()
 
-        self._cid = self.canvas.mpl_connect('button_press_event',
-                                            self._pixel_flip_on_press)
+        self._cids.append(self.canvas.mpl_connect('button_press_event',
+                                                  self._pixel_flip_on_press))
         self._active = 'pixel flip'
 
+    def enable_brush(self):
+        # turn off anything else
+        self.disable_tools()
+
+        for name, func in (('button_press_event', self._brush_on_press),
+                           ('motion_notify_event', self._brush_on_motion),
+                           ('button_release_event', self._brush_on_release)):
+            self._cids.append(self.canvas.mpl_connect(name, func))
+        self._active = 'brush'
+
+    @property
+    def active_tool(self):
+        """
+        The name of the tool in use, '' if none
+        """
+        return self._active
+
     def disable_tools(self):
-        if self._cid is not None:
-            self.canvas.mpl_disconnect(self._cid)
-            self._cid = None
+        if self._cids:
+            for cid in self._cids:
+                self.canvas.mpl_disconnect(cid)
+            self._cids = []
             # see discussion of dead-locked canvas states above
             if self._lasso and self.canvas.widgetlock.isowner(self._lasso):
                 self.canvas.widgetlock.release(self._lasso)
                 self._lasso = None
+            # finish any brush stroke in progress
+            self._brush_on_release(None)
 
         self._active = ''
-        self.canvas.toolbar.set_message('')
+        if self.canvas.toolbar is not None:
+            self.canvas.toolbar.set_message('')
 
     @property
     def label_array(self):
-        arr, num = ndimage.measurements.label(self.mask)
-        return arr
+        # the labeler hands out a view of its cache, which the next edit
+        # changes
+        return self._labeler.labels(self._mask).copy()
+
+
+class _MaskDelta(object):
+    """
+    The pixels that flipped in a single edit of a mask.
+
+    Only the bounding box of the flipped pixels is kept, as a `PackedMask`.
+    Since the delta is an exclusive or, applying it a second time undoes it.
+    """
+
+    def __init__(self, region, changed):
+        """
+        Parameters
+        ----------
+        region : tuple of slices
+            The bounding box of the flipped pixels
+        changed : PackedMask
+            The flipped pixels in `region`
+        """
+        self.region = region
+        self.changed = changed
+
+    @classmethod
+    def from_edit(cls, mask, region, new_values):
+        """
+        Compute the delta that turns `mask[region]` into `new_values`
+
+        Parameters
+        ----------
+        mask : array
+            The boolean mask before the edit
+        region : tuple of slices
+            The part of the mask that is edited
+        new_values : array
+            The new values of `region`
+
+        Returns
+        -------
+        delta : _MaskDelta or None
+            None if no pixels changed
+        """
+        row_start = region[0].indices(mask.shape[0])[0]
+        col_start = region[1].indices(mask.shape[1])[0]
+        return cls._from_changed(mask[region] ^ new_values, row_start,
+                                 col_start)
+
+    @classmethod
+    def combine(cls, deltas):
+        """
+        Merge consecutive deltas into one
+
+        Parameters
+        ----------
+        deltas : list
+            The _MaskDelta objects, in the order they were applied
+
+        Returns
+        -------
+        delta : _MaskDelta or None
+            None if the deltas cancel out
+        """
+        if len(deltas) == 0:
+            return None
+        r0 = min(d.region[0].start for d in deltas)
+        r1 = max(d.region[0].stop for d in deltas)
+        c0 = min(d.region[1].start for d in deltas)
+        c1 = max(d.region[1].stop for d in deltas)
+        changed = np.zeros((r1 - r0, c1 - c0), dtype=bool)
+        for d in deltas:
+            rows, cols = d.region
+            changed[rows.start - r0:rows.stop - r0,
+                    cols.start - c0:cols.stop - c0] ^= d.changed.to_array()
+        return cls._from_changed(changed, r0, c0)
+
+    @classmethod
+    def _from_changed(cls, changed, row_start, col_start):
+        """
+        Build a delta from a boolean array of flipped pixels
+
+        Parameters
+        ----------
+        changed : array
+            True where a pixel flipped
+        row_start, col_start : int
+            The position of `changed` in the full mask
+
+        Returns
+        -------
+        delta : _MaskDelta or None
+            None if no pixels flipped
+        """
+        rows = np.flatnonzero(changed.any(axis=1))
+        if len(rows) == 0:
+            return None
+        cols = np.flatnonzero(changed.any(axis=0))
+        r0, r1 = rows[0], rows[-1] + 1
+        c0, c1 = cols[0], cols[-1] + 1
+        # translate the bounding box into the coordinates of the full mask
+        region = (slice(row_start + r0, row_start + r1),
+                  slice(col_start + c0, col_start + c1))
+        return cls(region, PackedMask.from_array(changed[r0:r1, c0:c1]))
+
+    @property
+    def nbytes(self):
+        return self.changed.nbytes
+
+    def apply(self, mask):
+        """
+        Flip the pixels of this delta in `mask`, in place
+
+        Parameters
+        ----------
+        mask : array
+            The boolean mask to edit
+        """
+        mask[self.region] ^= self.changed.to_array()
+
+
+def _rasterize_polygon(verts, shape):
+    """
+    Find the pixels whose centers are inside of a polygon, only testing the
+    pixels inside of its bounding box
+
+    Parameters
+    ----------
+    verts : array
+        (N, 2) array of the (x, y) polygon vertices in pixel coordinates
+    shape : tuple
+        The (rows, columns) shape of the image
+
+    Returns
+    -------
+    region : tuple of slices or None
+        The part of the image covered by the bounding box of the polygon, or
+        None if the polygon misses the image
+    selected : array or None
+        Boolean array, the shape of `region`, that is True for the pixels
+        inside of the polygon
+    """
+    verts = np.asarray(verts, dtype=float)
+    c0 = max(int(np.ceil(verts[:, 0].min())), 0)
+    c1 = min(int(np.floor(verts[:, 0].max())) + 1, shape[1])
+    r0 = max(int(np.ceil(verts[:, 1].min())), 0)
+    r1 = min(int(np.floor(verts[:, 1].max())) + 1, shape[0])
+    if c0 >= c1 or r0 >= r1:
+        return None, None
+    y, x = np.mgrid[r0:r1, c0:c1]
+    points = np.transpose((x.ravel(), y.ravel()))
+    selected = path.Path(verts).contains_points(points)
+    return ((slice(r0, r1), slice(c0, c1)),
+            selected.reshape(r1 - r0, c1 - c0))
+
+
+def _block_slice(sl, size, factor, view=None):
+    """
+    The blocks of `factor` pixels that a slice of pixels touches
+
+    Parameters
+    ----------
+    sl : slice
+    size : int
+        The length of the sliced axis
+    factor : int
+        The size of the blocks
+    view : slice, optional
+        The pixels that are shown, starting at a block edge.  Blocks are
+        counted from its start and only blocks in it are returned
+
+    Returns
+    -------
+    blocks : slice
+    """
+    start, stop = sl.indices(size)[:2]
+    if view is not None:
+        start = max(start, view.start) - view.start
+        stop = max(min(stop, view.stop) - view.start, start)
+    return slice(start // factor, -(-stop // factor))
+
+
+def _block_any(mask, factor):
+    """
+    Reduce a boolean array over square blocks, True if any pixel of the
+    block is.  The last row and column of blocks may be partial.
+    """
+    rows, cols = [-(-n // factor) for n in mask.shape]
+    padded = np.zeros((rows * factor, cols * factor), dtype=bool)
+    padded[:mask.shape[0], :mask.shape[1]] = mask
+    return padded.reshape(rows, factor, cols, factor).any(axis=(1, 3))
+
+
+def _pixel_extent(shape, origin, extent=None):
+    """
+    The imshow extent of an image
+
+    Parameters
+    ----------
+    shape : tuple
+        The (rows, columns) shape of the image
+    origin : {'upper', 'lower'}
+    extent : tuple, optional
+        The extent to use, defaults to the one that puts the pixel centers
+        at integer positions
+
+    Returns
+    -------
+    extent : tuple
+        (left, right, bottom, top)
+    """
+    if extent is not None:
+        return tuple(extent)
+    if origin == 'upper':
+        return (-.5, shape[1] - .5, shape[0] - .5, -.5)
+    return (-.5, shape[1] - .5, -.5, shape[0] - .5)
+
+
+def _disk_stencil(radius):
+    """
+    The pixels covered by a circular brush
+
+    Parameters
+    ----------
+    radius : int
+
+    Returns
+    -------
+    stencil : array
+        (2 * radius + 1) square boolean array, True inside the disk
+    """
+    y, x = np.ogrid[-radius:radius + 1, -radius:radius + 1]
+    return x * x + y * y <= radius * radius
@@ -0,0 +1,202 @@
+# ######################################################################
+# Copyright (c) 2014, Brookhaven Science Associates, Brookhaven        #
+# National Laboratory. All rights reserved.                            #
+#                                                                      #
+# Redistribution and use in source and binary forms, with or without   #
+# modification, are permitted provided that the following conditions   #
+# are met:                                                             #
+#                                                                      #
+# * Redistributions of source code must retain the above copyright     #
+#   notice, this list of conditions and the following disclaimer.      #
+#                                                                      #
+# * Redistributions in binary form must reproduce the above copyright  #
+#   notice this list of conditions and the following disclaimer in     #
+#   the documentation and/or other materials provided with the         #
+#   distribution.                                                      #
+#                                                                      #
+# * Neither the name of the Brookhaven Science Associates, Brookhaven  #
+#   National Laboratory nor the names of its contributors may be used  #
+#   to endorse or promote products derived from this software without  #
+#   specific prior written permission.                                 #
+#                                                                      #
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS  #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT    #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS    #
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE       #
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,           #
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES   #
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR   #
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)   #
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,  #
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OTHERWISE) ARISING   #
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE   #
+# POSSIBILITY OF SUCH DAMAGE.                                          #
+########################################################################
+"""Compact, bit-packed storage for boolean masks and a fast file format"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import logging
+import os
+import six
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class PackedMask(object):
+    """
+    A boolean mask stored 8 pixels to a byte with `np.packbits`.
+
+    A 16 MP detector mask takes 2 MB this way instead of 16 MB.  The mask
+    can be saved to and loaded from disk with `save` and `load`, which run
+    length encode the packed bytes when that makes the file smaller.
+    Masks of mostly-unmasked detectors then take a few kB on disk and load
+    in milliseconds.
+
+    Passing a PackedMask to anything that calls `np.asarray` on it (for
+    example the `mask` argument of `ManualMask`) unpacks it.
+
+    Example
+    -------
+    >>> packed = PackedMask.from_array(m.mask)
+    >>> packed.save('detector_mask.npz')
+    >>> mask = PackedMask.load('detector_mask.npz').to_array()
+    """
+
+    def __init__(self, bits, shape, dtype=bool):
+        """
+        Parameters
+        ----------
+        bits : array
+            The mask as returned by `np.packbits` of the flattened mask
+        shape : tuple
+            The shape of the unpacked mask
+        dtype : np.dtype, optional
+            The dtype to unpack to, defaults to bool
+        """
+        self.bits = np.asarray(bits, dtype=np.uint8)
+        self.shape = tuple(int(n) for n in shape)
+        self.dtype = np.dtype(dtype)
+        if len(self.bits) != (self.size + 7) // 8:
+            raise ValueError(("{0} packed bytes can not hold a mask of shape "
+                              "{1}").format(len(self.bits), self.shape))
+
+    @classmethod
+    def from_array(cls, mask):
+        """
+        Pack a mask
+
+        Parameters
+        ----------
+        mask : array
+            Anything non-zero is masked
+
+        Returns
+        -------
+        PackedMask
+        """
+        mask = np.asarray(mask)
+        return cls(np.packbits(mask.astype(bool, copy=False).ravel()),
+                   mask.shape, mask.dtype)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def to_array(self):
+        """
+        Unpack the mask
+
+        Returns
+        -------
+        mask : array
+            The mask with the original shape and dtype
+        """
+        mask = np.unpackbits(self.bits, count=self.size).view(bool)
+        return mask.reshape(self.shape).astype(self.dtype, copy=False)
+
+    def __array__(self, dtype=None, copy=None):
+        mask = self.to_array()
+        if dtype is not None:
+            mask = mask.astype(dtype, copy=False)
+        return mask
+
+    def save(self, fname):
+        """
+        Save the mask to an uncompressed .npz file
+
+        The file holds the shape and dtype of the mask and either the packed
+        bytes or, if it is smaller, their run length encoding.
+
+        Parameters
+        ----------
+        fname : str or file
+            The file is written under exactly this name, no '.npz' is
+            added
+        """
+        if isinstance(fname, (six.string_types, os.PathLike)):
+            # np.savez would add '.npz' to the name
+            with open(fname, 'wb') as f:
+                self.save(f)
+            return
+        values, lengths = _rle_encode(self.bits)
+        meta = dict(shape=np.asarray(self.shape, dtype=np.int64),
+                    dtype=np.asarray(self.dtype.str))
+        if values.nbytes + lengths.nbytes < self.bits.nbytes:
+            np.savez(fname, encoding=np.asarray('rle'), values=values,
+                     lengths=lengths, **meta)
+        else:
+            np.savez(fname, encoding=np.asarray('packbits'), bits=self.bits,
+                     **meta)
+
+    @classmethod
+    def load(cls, fname):
+        """
+        Load a mask written by `save`
+
+        Parameters
+        ----------
+        fname : str or file
+
+        Returns
+        -------
+        PackedMask
+        """
+        with np.load(fname, allow_pickle=False) as f:
+            encoding = str(f['encoding'])
+            if encoding == 'rle':
+                bits = np.repeat(f['values'], f['lengths'])
+            elif encoding == 'packbits':
+                bits = f['bits']
+            else:
+                raise ValueError("Unknown mask encoding {0}".format(encoding))
+            return cls(bits, f['shape'], np.dtype(str(f['dtype'])))
+
+
+def _rle_encode(arr):
+    """
+    Run length encode a 1-D array
+
+    Parameters
+    ----------
+    arr : array
+
+    Returns
+    -------
+    values : array
+        The value of each run
+    lengths : array
+        uint32 length of each run, ``np.repeat(values, lengths)`` gives back
+        `arr`
+    """
+    if len(arr) == 0:
+        return arr[:0], np.zeros(0, dtype=np.uint32)
+    starts = np.r_[0, np.flatnonzero(arr[1:] != arr[:-1]) + 1]
+    lengths = np.diff(np.r_[starts, len(arr)]).astype(np.uint32)
+    return arr[starts], lengths
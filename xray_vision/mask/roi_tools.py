@@ -0,0 +1,672 @@
+# ######################################################################
+# Copyright (c) 2014, Brookhaven Science Associates, Brookhaven        #
+# National Laboratory. All rights reserved.                            #
+#                                                                      #
+# Redistribution and use in source and binary forms, with or without   #
+# modification, are permitted provided that the following conditions   #
+# are met:                                                             #
+#                                                                      #
+# * Redistributions of source code must retain the above copyright     #
+#   notice, this list of conditions and the following disclaimer.      #
+#                                                                      #
+# * Redistributions in binary form must reproduce the above copyright  #
+#   notice this list of conditions and the following disclaimer in     #
+#   the documentation and/or other materials provided with the         #
+#   distribution.                                                      #
+#                                                                      #
+# * Neither the name of the Brookhaven Science Associates, Brookhaven  #
+#   National Laboratory nor the names of its contributors may be used  #
+#   to endorse or promote products derived from this software without  #
+#   specific prior written permission.                                 #
+#                                                                      #
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS  #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT    #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS    #
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE       #
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,           #
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES   #
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR   #
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)   #
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,  #
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OTHERWISE) ARISING   #
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE   #
+# POSSIBILITY OF SUCH DAMAGE.                                          #
+########################################################################
+"""Editable geometric regions of interest (rectangles, ellipses, annuli and
+polygons) that are rasterized analytically and combined into a label
+array"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import six
+import logging
+from collections import OrderedDict
+import numpy as np
+from matplotlib import path
+from ..utils.mpl_helpers import ensure_ax_meth
+
+logger = logging.getLogger(__name__)
+
+
+class ROIShape(object):
+    """
+    Base class of the geometric ROIs.
+
+    Shapes are defined in pixel coordinates (the center of pixel ``[r, c]``
+    is at ``x=c, y=r``) and select the pixels whose centers are inside of
+    them.  The rasterized shape is cached until the shape changes.
+
+    Concrete classes must implement `handles`, `move_handle`, `translate`,
+    `bounds`, `outline` and `_inside`, and call `_changed` whenever the
+    geometry changes.
+    """
+
+    def __init__(self):
+        self._cache = None
+
+    @property
+    def handles(self):
+        """
+        The (N, 2) array of the (x, y) positions of the drag handles
+        """
+        raise NotImplementedError("Concrete classes must override this "
+                                  "method")
+
+    def move_handle(self, index, x, y):
+        """
+        Move one of the handles
+
+        Parameters
+        ----------
+        index : int
+            The index of the handle in `handles`
+        x, y : float
+            The new position of the handle
+        """
+        raise NotImplementedError("Concrete classes must override this "
+                                  "method")
+
+    def translate(self, dx, dy):
+        """
+        Move the whole shape by (dx, dy)
+        """
+        raise NotImplementedError("Concrete classes must override this "
+                                  "method")
+
+    def bounds(self):
+        """
+        The (xmin, xmax, ymin, ymax) bounding box of the shape
+        """
+        raise NotImplementedError("Concrete classes must override this "
+                                  "method")
+
+    def outline(self):
+        """
+        The (N, 2) array of the (x, y) vertices to draw, rows of NaN
+        separate disjoint parts
+        """
+        raise NotImplementedError("Concrete classes must override this "
+                                  "method")
+
+    def _inside(self, x, y):
+        """
+        Test if the points (x, y), which are broadcast against each other,
+        are inside of the shape
+        """
+        raise NotImplementedError("Concrete classes must override this "
+                                  "method")
+
+    def _changed(self):
+        self._cache = None
+
+    def contains(self, x, y):
+        """
+        Test if the point (x, y) is inside of the shape
+        """
+        return bool(self._inside(np.array([[x]], dtype=float),
+                                 np.array([[y]], dtype=float))[0, 0])
+
+    def rasterize(self, shape):
+        """
+        Find the pixels inside of the shape, only testing the pixels inside
+        of its bounding box
+
+        Parameters
+        ----------
+        shape : tuple
+            The (rows, columns) shape of the image
+
+        Returns
+        -------
+        region : tuple of slices or None
+            The part of the image covered by the bounding box of the shape,
+            or None if the shape misses the image
+        selected : array or None
+            Boolean array, the shape of `region`, that is True for the pixels
+            inside of the shape
+        """
+        shape = tuple(shape)
+        if self._cache is None or self._cache[0] != shape:
+            region = _center_bbox(self.bounds(), shape)
+            if region is None:
+                selected = None
+            else:
+                y, x = np.ogrid[region]
+                selected = np.broadcast_to(
+                    self._inside(x.astype(float), y.astype(float)),
+                    (len(y), x.shape[1]))
+            self._cache = (shape, region, selected)
+        return self._cache[1:]
+
+
+class RectangleROI(ROIShape):
+    """
+    An axis aligned rectangle with a handle at each corner
+    """
+
+    def __init__(self, x0, y0, x1, y1):
+        """
+        Parameters
+        ----------
+        x0, y0, x1, y1 : float
+            Two opposite corners
+        """
+        super(RectangleROI, self).__init__()
+        self.x0, self.y0, self.x1, self.y1 = (float(x0), float(y0),
+                                              float(x1), float(y1))
+
+    @property
+    def handles(self):
+        return np.array([(self.x0, self.y0), (self.x1, self.y0),
+                         (self.x1, self.y1), (self.x0, self.y1)])
+
+    def move_handle(self, index, x, y):
+        # each corner shares its x with one neighbour and its y with the
+        # other
+        if index in (0, 3):
+            self.x0 = x
+        else:
+            self.x1 = x
+        if index in (0, 1):
+            self.y0 = y
+        else:
+            self.y1 = y
+        self._changed()
+
+    def translate(self, dx, dy):
+        self.x0 += dx
+        self.x1 += dx
+        self.y0 += dy
+        self.y1 += dy
+        self._changed()
+
+    def bounds(self):
+        return (min(self.x0, self.x1), max(self.x0, self.x1),
+                min(self.y0, self.y1), max(self.y0, self.y1))
+
+    def outline(self):
+        return np.vstack([self.handles, self.handles[:1]])
+
+    def _inside(self, x, y):
+        xmin, xmax, ymin, ymax = self.bounds()
+        return (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)
+
+
+class EllipseROI(ROIShape):
+    """
+    An axis aligned ellipse with handles at the center and at the end of
+    each semi-axis
+    """
+
+    def __init__(self, xc, yc, rx, ry):
+        """
+        Parameters
+        ----------
+        xc, yc : float
+            The center
+        rx, ry : float
+            The semi-axes along x and y
+        """
+        super(EllipseROI, self).__init__()
+        self.xc, self.yc = float(xc), float(yc)
+        self.rx, self.ry = abs(float(rx)), abs(float(ry))
+
+    @property
+    def handles(self):
+        return np.array([(self.xc, self.yc), (self.xc + self.rx, self.yc),
+                         (self.xc, self.yc + self.ry)])
+
+    def move_handle(self, index, x, y):
+        if index == 0:
+            self.translate(x - self.xc, y - self.yc)
+            return
+        if index == 1:
+            self.rx = abs(x - self.xc)
+        else:
+            self.ry = abs(y - self.yc)
+        self._changed()
+
+    def translate(self, dx, dy):
+        self.xc += dx
+        self.yc += dy
+        self._changed()
+
+    def bounds(self):
+        return (self.xc - self.rx, self.xc + self.rx,
+                self.yc - self.ry, self.yc + self.ry)
+
+    def outline(self):
+        t = np.linspace(0, 2 * np.pi, 65)
+        return np.transpose([self.xc + self.rx * np.cos(t),
+                             self.yc + self.ry * np.sin(t)])
+
+    def _inside(self, x, y):
+        # multiplied out so that degenerate ellipses still work
+        dx2 = (x - self.xc) ** 2
+        dy2 = (y - self.yc) ** 2
+        rx2, ry2 = self.rx ** 2, self.ry ** 2
+        return dx2 * ry2 + dy2 * rx2 <= rx2 * ry2
+
+
+class AnnulusROI(ROIShape):
+    """
+    A circular ring with handles at the center, on the inner radius (along
+    +x) and on the outer radius (along +y)
+    """
+
+    def __init__(self, xc, yc, r_inner, r_outer):
+        """
+        Parameters
+        ----------
+        xc, yc : float
+            The center
+        r_inner, r_outer : float
+            The inner and outer radii
+        """
+        super(AnnulusROI, self).__init__()
+        if r_inner > r_outer:
+            raise ValueError("r_inner ({0}) must not be larger than r_outer "
+                             "({1})".format(r_inner, r_outer))
+        self.xc, self.yc = float(xc), float(yc)
+        self.r_inner, self.r_outer = float(r_inner), float(r_outer)
+
+    @property
+    def handles(self):
+        return np.array([(self.xc, self.yc),
+                         (self.xc + self.r_inner, self.yc),
+                         (self.xc, self.yc + self.r_outer)])
+
+    def move_handle(self, index, x, y):
+        if index == 0:
+            self.translate(x - self.xc, y - self.yc)
+            return
+        r = np.hypot(x - self.xc, y - self.yc)
+        if index == 1:
+            self.r_inner = min(r, self.r_outer)
+        else:
+            self.r_outer = max(r, self.r_inner)
+        self._changed()
+
+    def translate(self, dx, dy):
+        self.xc += dx
+        self.yc += dy
+        self._changed()
+
+    def bounds(self):
+        return (self.xc - self.r_outer, self.xc + self.r_outer,
+                self.yc - self.r_outer, self.yc + self.r_outer)
+
+    def outline(self):
+        t = np.linspace(0, 2 * np.pi, 65)
+        circle = np.transpose([np.cos(t), np.sin(t)])
+        return np.vstack([self.r_outer * circle + (self.xc, self.yc),
+                          [(np.nan, np.nan)],
+                          self.r_inner * circle + (self.xc, self.yc)])
+
+    def _inside(self, x, y):
+        r2 = (x - self.xc) ** 2 + (y - self.yc) ** 2
+        return (r2 >= self.r_inner ** 2) & (r2 <= self.r_outer ** 2)
+
+
+class PolygonROI(ROIShape):
+    """
+    A polygon with a handle at each vertex
+    """
+
+    def __init__(self, verts):
+        """
+        Parameters
+        ----------
+        verts : array
+            (N, 2) array of the (x, y) vertices
+        """
+        super(PolygonROI, self).__init__()
+        self._verts = np.array(verts, dtype=float)
+        if self._verts.ndim != 2 or self._verts.shape[1] != 2:
+            raise ValueError("verts must be a (N, 2) array, not "
+                             "{0}".format(self._verts.shape))
+
+    @property
+    def verts(self):
+        return self._verts.copy()
+
+    @property
+    def handles(self):
+        return self.verts
+
+    def move_handle(self, index, x, y):
+        self._verts[index] = (x, y)
+        self._changed()
+
+    def translate(self, dx, dy):
+        self._verts += (dx, dy)
+        self._changed()
+
+    def bounds(self):
+        (xmin, ymin), (xmax, ymax) = (self._verts.min(axis=0),
+                                      self._verts.max(axis=0))
+        return xmin, xmax, ymin, ymax
+
+    def outline(self):
+        return np.vstack([self._verts, self._verts[:1]])
+
+    def _inside(self, x, y):
+        x, y = np.broadcast_arrays(x, y)
+        inside = path.Path(self._verts).contains_points(
+            np.transpose((x.ravel(), y.ravel())))
+        return inside.reshape(x.shape)
+
+
+class ROIEditor(object):
+    @ensure_ax_meth
+    def __init__(self, ax, shape, color='r', pick_radius=5,
+                 manual_mask=None):
+        """
+        Draw geometric ROIs on an axes and edit them by dragging.
+
+        Dragging a handle reshapes an ROI and dragging its inside moves it.
+        Only the dragged ROI is rasterized again and only the part of the
+        label array it covered before or after the edit is updated.
+
+        Editing with the mouse is off until `connect` is called.  To edit
+        ROIs on top of a mask, use the same axes as a `ManualMask` and pass
+        it as `manual_mask`: `connect` then turns off its tools, and mouse
+        presses are left to the mask while one of its tools is on.
+
+        Parameters
+        ----------
+        ax : Axes, optional
+        shape : tuple
+            The (rows, columns) shape of the image
+        color : str, optional
+            The color of the outlines and handles.  'r' by default
+        pick_radius : float, optional
+            How close, in screen pixels, a click has to be to grab a handle.
+            Defaults to 5.
+        manual_mask : ManualMask, optional
+            The mask drawn on the same axes
+
+        Attributes
+        ----------
+        rois : OrderedDict
+            The ROIs, keyed by their label
+        label_array : integer array
+            each ROI is labeled with its label, where ROIs overlap the one
+            added last wins
+        mask : boolean array
+            True inside of any ROI
+
+        Example
+        -------
+        >>> m = ManualMask(ax, my_img)
+        >>> rois = ROIEditor(ax, my_img.shape, manual_mask=m)
+        >>> rois.add_roi(AnnulusROI(512, 512, 50, 80))
+        >>> rois.connect()  # drag the ROIs, m.enable_brush() to paint
+        >>> rois.label_array
+        """
+        self.ax = ax
+        self.canvas = ax.figure.canvas
+        self.img_shape = tuple(shape)
+        self.rois = OrderedDict()
+        self._artists = dict()
+        self._labels = np.zeros(self.img_shape, dtype=np.int32)
+        self._next_label = 1
+        self._color = color
+        self._pick_radius = pick_radius
+        self._manual_mask = manual_mask
+        # (label, handle index or None, last (x, y)) of the drag in progress
+        self._drag = None
+        self._cids = []
+
+    def add_roi(self, roi):
+        """
+        Add a shape
+
+        Parameters
+        ----------
+        roi : ROIShape
+
+        Returns
+        -------
+        label : int
+            The label of the ROI in `label_array`
+        """
+        label = self._next_label
+        self._next_label += 1
+        self.rois[label] = roi
+        outline, = self.ax.plot(*roi.outline().T, color=self._color,
+                                zorder=3)
+        handles, = self.ax.plot(*roi.handles.T, color=self._color,
+                                marker='s', linestyle='none', zorder=3)
+        self._artists[label] = (outline, handles)
+        self._update_labels(roi.rasterize(self.img_shape)[0])
+        self.canvas.draw_idle()
+        return label
+
+    def remove_roi(self, label):
+        """
+        Remove a shape
+
+        Parameters
+        ----------
+        label : int
+            The label returned by `add_roi`
+        """
+        roi = self.rois.pop(label)
+        for artist in self._artists.pop(label):
+            artist.remove()
+        self._update_labels(roi.rasterize(self.img_shape)[0])
+        self.canvas.draw_idle()
+
+    def move_handle(self, label, index, x, y):
+        """
+        Move a handle of one ROI, see `ROIShape.move_handle`
+        """
+        self._edit(label, lambda roi: roi.move_handle(index, x, y))
+
+    def translate(self, label, dx, dy):
+        """
+        Move one ROI, see `ROIShape.translate`
+        """
+        self._edit(label, lambda roi: roi.translate(dx, dy))
+
+    def _edit(self, label, func):
+        """
+        Apply `func` to the ROI `label` and update the label array and the
+        artists to match
+        """
+        roi = self.rois[label]
+        old_region = roi.rasterize(self.img_shape)[0]
+        func(roi)
+        new_region = roi.rasterize(self.img_shape)[0]
+        self._update_labels(_union(old_region, new_region))
+        outline, handles = self._artists[label]
+        outline.set_data(*roi.outline().T)
+        handles.set_data(*roi.handles.T)
+        self.canvas.draw_idle()
+
+    def _update_labels(self, region):
+        """
+        Recompute part of the label array from the cached rasterizations
+
+        Parameters
+        ----------
+        region : tuple of slices or None
+        """
+        if region is None:
+            return
+        sub = self._labels[region]
+        sub[...] = 0
+        r0, c0 = region[0].start, region[1].start
+        for label, roi in six.iteritems(self.rois):
+            roi_region, selected = roi.rasterize(self.img_shape)
+            overlap = _intersection(region, roi_region)
+            if overlap is None:
+                continue
+            rows, cols = overlap
+            sub[rows.start - r0:rows.stop - r0,
+                cols.start - c0:cols.stop - c0][
+                selected[rows.start - roi_region[0].start:
+                         rows.stop - roi_region[0].start,
+                         cols.start - roi_region[1].start:
+                         cols.stop - roi_region[1].start]] = label
+
+    @property
+    def label_array(self):
+        labels = self._labels.view()
+        labels.flags.writeable = False
+        return labels
+
+    @property
+    def mask(self):
+        return self._labels > 0
+
+    def _pick(self, event):
+        """
+        Find what is under the mouse
+
+        Returns
+        -------
+        label : int or None
+        index : int or None
+            The index of the handle, or None to drag the whole ROI
+        """
+        best = None
+        for label, roi in six.iteritems(self.rois):
+            xy = self.ax.transData.transform(roi.handles)
+            dist = np.hypot(xy[:, 0] - event.x, xy[:, 1] - event.y)
+            idx = int(np.argmin(dist))
+            if dist[idx] <= self._pick_radius and (best is None or
+                                                   dist[idx] < best[0]):
+                best = (dist[idx], label, idx)
+        if best is not None:
+            return best[1:]
+        # the ROI drawn on top wins
+        for label in reversed(list(self.rois)):
+            if self.rois[label].contains(event.xdata, event.ydata):
+                return label, None
+        return None, None
+
+    def _on_press(self, event):
+        if self.canvas.widgetlock.locked() or event.inaxes is not self.ax:
+            return
+        if (self._manual_mask is not None and
+                self._manual_mask.active_tool):
+            # the press is for the mask
+            return
+        label, index = self._pick(event)
+        if label is not None:
+            # keep other tools from acting on the drag
+            self.canvas.widgetlock(self)
+            self._drag = (label, index, (event.xdata, event.ydata))
+
+    def _on_motion(self, event):
+        if self._drag is None or event.inaxes is not self.ax:
+            return
+        label, index, (x, y) = self._drag
+        if index is None:
+            self.translate(label, event.xdata - x, event.ydata - y)
+        else:
+            self.move_handle(label, index, event.xdata, event.ydata)
+        self._drag = (label, index, (event.xdata, event.ydata))
+
+    def _on_release(self, event):
+        self._drag = None
+        if self.canvas.widgetlock.isowner(self):
+            self.canvas.widgetlock.release(self)
+
+    def connect(self):
+        """
+        Turn on editing with the mouse, and turn off the tools of the
+        `manual_mask`
+        """
+        if self._manual_mask is not None:
+            self._manual_mask.disable_tools()
+        if self._cids:
+            return
+        for name, func in (('button_press_event', self._on_press),
+                           ('motion_notify_event', self._on_motion),
+                           ('button_release_event', self._on_release)):
+            self._cids.append(self.canvas.mpl_connect(name, func))
+
+    def disconnect(self):
+        """
+        Turn off editing with the mouse
+        """
+        for cid in self._cids:
+            self.canvas.mpl_disconnect(cid)
+        self._cids = []
+        self._on_release(None)
+
+
+def _center_bbox(bounds, shape):
+    """
+    The pixels whose centers are inside of a bounding box
+
+    Parameters
+    ----------
+    bounds : tuple
+        (xmin, xmax, ymin, ymax) in pixel coordinates
+    shape : tuple
+        The (rows, columns) shape of the image
+
+    Returns
+    -------
+    region : tuple of slices or None
+        None if there are no such pixels
+    """
+    xmin, xmax, ymin, ymax = bounds
+    c0 = max(int(np.ceil(xmin)), 0)
+    c1 = min(int(np.floor(xmax)) + 1, shape[1])
+    r0 = max(int(np.ceil(ymin)), 0)
+    r1 = min(int(np.floor(ymax)) + 1, shape[0])
+    if c0 >= c1 or r0 >= r1:
+        return None
+    return (slice(r0, r1), slice(c0, c1))
+
+
+def _union(a, b):
+    """
+    The bounding box of two regions, either of which may be None
+    """
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return tuple(slice(min(sa.start, sb.start), max(sa.stop, sb.stop))
+                 for sa, sb in zip(a, b))
+
+
+def _intersection(a, b):
+    """
+    The overlap of two regions, None if either is None or they do not
+    overlap
+    """
+    if a is None or b is None:
+        return None
+    out = tuple(slice(max(sa.start, sb.start), min(sa.stop, sb.stop))
+                for sa, sb in zip(a, b))
+    if any(s.start >= s.stop for s in out):
+        return None
+    return out
@@ -0,0 +1,225 @@
+# ######################################################################
+# Copyright (c) 2014, Brookhaven Science Associates, Brookhaven        #
+# National Laboratory. All rights reserved.                            #
+#                                                                      #
+# Redistribution and use in source and binary forms, with or without   #
+# modification, are permitted provided that the following conditions   #
+# are met:                                                             #
+#                                                                      #
+# * Redistributions of source code must retain the above copyright     #
+#   notice, this list of conditions and the following disclaimer.      #
+#                                                                      #
+# * Redistributions in binary form must reproduce the above copyright  #
+#   notice this list of conditions and the following disclaimer in     #
+#   the documentation and/or other materials provided with the         #
+#   distribution.                                                      #
+#                                                                      #
+# * Neither the name of the Brookhaven Science Associates, Brookhaven  #
+#   National Laboratory nor the names of its contributors may be used  #
+#   to endorse or promote products derived from this software without  #
+#   specific prior written permission.                                 #
+#                                                                      #
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS  #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT    #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS    #
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE       #
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,           #
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES   #
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR   #
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)   #
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,  #
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OTHERWISE) ARISING   #
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE   #
+# POSSIBILITY OF SUCH DAMAGE.                                          #
+########################################################################
+"""Masks that change over a stack of frames, stored as one base mask plus
+sparse per-frame changes"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import six
+import logging
+import numpy as np
+from .packed_mask import PackedMask
+
+logger = logging.getLogger(__name__)
+
+
+class StackMask(object):
+    """
+    The masks of a stack of frames, stored as a base mask shared by all
+    frames plus, for the frames that differ from it, the pixels added to
+    and removed from the base.
+
+    Only the bounding box of the changed pixels of a frame is kept, bit
+    packed, so a beamstop that moves or a shadow that appears part way
+    through a run costs a few bytes per frame.  Getting the mask of a frame
+    copies the base and patches that bounding box.  Since the changes are
+    kept as additions and removals, editing the base applies to every
+    frame except where a frame overrides it.
+
+    Example
+    -------
+    >>> masks = StackMask(beamstop_mask, len(frames))
+    >>> masks.set_frame_mask(120, beamstop_mask | shadow)
+    >>> masks[120]
+    """
+
+    def __init__(self, base, num_frames):
+        """
+        Parameters
+        ----------
+        base : array or PackedMask
+            The boolean mask shared by all frames
+        num_frames : int
+            The number of frames in the stack
+        """
+        self._base = np.array(base, dtype=bool)
+        self.num_frames = int(num_frames)
+        # frame -> _FrameDelta, only for the frames that differ from base
+        self._deltas = dict()
+
+    @property
+    def shape(self):
+        return self._base.shape
+
+    @property
+    def base(self):
+        base = self._base.view()
+        base.flags.writeable = False
+        return base
+
+    @base.setter
+    def base(self, mask):
+        self._base = np.array(mask, dtype=bool)
+
+    def __len__(self):
+        return self.num_frames
+
+    def __getitem__(self, frame):
+        return self.frame_mask(frame)
+
+    def __iter__(self):
+        for frame in range(self.num_frames):
+            yield self.frame_mask(frame)
+
+    @property
+    def frames_with_deltas(self):
+        """
+        The sorted frame numbers whose masks differ from the base
+        """
+        return sorted(self._deltas)
+
+    @property
+    def nbytes(self):
+        return self._base.nbytes + sum(
+            d.nbytes for d in six.itervalues(self._deltas))
+
+    def frame_mask(self, frame):
+        """
+        The effective mask of one frame
+
+        Parameters
+        ----------
+        frame : int
+
+        Returns
+        -------
+        mask : array
+            A new boolean array
+        """
+        frame = self._check_frame(frame)
+        mask = self._base.copy()
+        delta = self._deltas.get(frame)
+        if delta is not None:
+            delta.apply(mask)
+        return mask
+
+    def set_frame_mask(self, frame, mask):
+        """
+        Set the effective mask of one frame, storing only how it differs
+        from the base
+
+        Parameters
+        ----------
+        frame : int
+        mask : array
+            Boolean array the shape of the base
+        """
+        frame = self._check_frame(frame)
+        mask = np.asarray(mask, dtype=bool)
+        if mask.shape != self.shape:
+            raise ValueError("mask of shape {0} does not match the shape "
+                             "{1}".format(mask.shape, self.shape))
+        delta = _FrameDelta.from_masks(self._base, mask)
+        if delta is None:
+            self._deltas.pop(frame, None)
+        else:
+            self._deltas[frame] = delta
+
+    def clear_frame(self, frame):
+        """
+        Make a frame use the base mask
+        """
+        self._deltas.pop(self._check_frame(frame), None)
+
+    def _check_frame(self, frame):
+        frame = int(frame)
+        if frame < 0:
+            frame += self.num_frames
+        if not 0 <= frame < self.num_frames:
+            raise IndexError("frame {0} is out of range for {1} "
+                             "frames".format(frame, self.num_frames))
+        return frame
+
+
+class _FrameDelta(object):
+    """
+    The pixels one frame adds to and removes from the base mask, inside of
+    their bounding box
+    """
+
+    def __init__(self, region, added, removed):
+        """
+        Parameters
+        ----------
+        region : tuple of slices
+        added, removed : PackedMask
+            The pixels of `region` that are set and cleared
+        """
+        self.region = region
+        self.added = added
+        self.removed = removed
+
+    @classmethod
+    def from_masks(cls, base, mask):
+        """
+        Compute the delta that turns `base` into `mask`
+
+        Returns
+        -------
+        delta : _FrameDelta or None
+            None if the masks are the same
+        """
+        changed = base ^ mask
+        rows = np.flatnonzero(changed.any(axis=1))
+        if len(rows) == 0:
+            return None
+        cols = np.flatnonzero(changed.any(axis=0))
+        region = (slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1))
+        new = mask[region]
+        return cls(region, PackedMask.from_array(changed[region] & new),
+                   PackedMask.from_array(changed[region] & ~new))
+
+    @property
+    def nbytes(self):
+        return self.added.nbytes + self.removed.nbytes
+
+    def apply(self, mask):
+        """
+        Patch `mask` in place
+        """
+        sub = mask[self.region]
+        sub |= self.added.to_array()
+        sub &= ~self.removed.to_array()
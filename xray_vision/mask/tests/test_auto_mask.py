@@ -0,0 +1,59 @@
+from xray_vision.mask.auto_mask import (PixelStatistics, pixel_statistics,
+                                        classify_pixels, auto_mask)
+import numpy as np
+from numpy.testing import (assert_array_almost_equal, assert_array_equal,
+                           assert_raises)
+
+
+def _make_stack(num_frames=57, shape=(20, 30)):
+    rs = np.random.RandomState(5)
+    frames = rs.poisson(100, size=(num_frames,) + shape).astype(float)
+    frames[:, 3, 4] = 0          # dead
+    frames[:, 10, 11] += 5000    # hot
+    frames[::2, 15, 20] += 1000  # noisy
+    return frames
+
+
+def test_pixel_statistics():
+    frames = _make_stack()
+    for chunk_size in (1, 10, 100):
+        stats = pixel_statistics(frames, chunk_size=chunk_size)
+        assert stats.count == len(frames)
+        assert_array_almost_equal(stats.mean, frames.mean(axis=0))
+        assert_array_almost_equal(stats.variance, frames.var(axis=0, ddof=1))
+
+    # iterables of frames work too
+    stats = pixel_statistics(iter(frames), chunk_size=7)
+    assert_array_almost_equal(stats.std, frames.std(axis=0, ddof=1))
+    # and so do sequences that are sliced without a shape
+    stats = pixel_statistics(list(frames), chunk_size=7)
+    assert stats.count == len(frames)
+    assert_array_almost_equal(stats.std, frames.std(axis=0, ddof=1))
+
+
+def test_pixel_statistics_update():
+    frames = _make_stack(num_frames=20)
+    stats = PixelStatistics(frames.shape[1:])
+    # single frames and chunks of any size can be mixed
+    stats.update(frames[0])
+    stats.update(frames[1:4])
+    stats.update(frames[4])
+    stats.update(frames[5:20])
+    assert stats.count == 20
+    assert_array_almost_equal(stats.mean, frames.mean(axis=0))
+    assert_array_almost_equal(stats.variance, frames.var(axis=0, ddof=1))
+
+    assert_raises(ValueError, stats.update, frames[0, 1:])
+    assert_raises(ValueError, stats.update, frames[:3, :, 1:])
+    assert stats.count == 20
+
+
+def test_auto_mask():
+    frames = _make_stack()
+    hot, dead, noisy = classify_pixels(pixel_statistics(frames))
+    assert_array_equal(np.argwhere(dead), [[3, 4]])
+    assert_array_equal(np.argwhere(hot), [[10, 11], [15, 20]])
+    assert_array_equal(np.argwhere(noisy), [[15, 20]])
+
+    mask = auto_mask(frames, chunk_size=5)
+    assert_array_equal(mask, hot | dead | noisy)
@@ -0,0 +1,57 @@
+from xray_vision.mask._labels import IncrementalLabeler
+import numpy as np
+from numpy.testing import assert_array_equal
+from scipy import ndimage
+
+
+def _assert_same_partition(labels, mask):
+    expected, num = ndimage.label(mask)
+    assert_array_equal(labels > 0, mask)
+    # every component maps to exactly one label and vice versa
+    pairs = np.unique(np.transpose([expected[mask], labels[mask]]), axis=0)
+    assert len(pairs) == num
+    assert len(np.unique(pairs[:, 1])) == num
+
+
+def test_incremental_labels():
+    rs = np.random.RandomState(0)
+    mask = rs.random_sample((60, 70)) > 0.6
+    labeler = IncrementalLabeler()
+    labels = labeler.labels(mask).copy()
+    _assert_same_partition(labels, mask)
+
+    for _ in range(50):
+        r0, c0 = rs.randint(0, 55), rs.randint(0, 65)
+        r1, c1 = r0 + rs.randint(1, 6), c0 + rs.randint(1, 6)
+        region = (slice(r0, r1), slice(c0, c1))
+        mask[region] = rs.random_sample(mask[region].shape) > 0.5
+        labeler.invalidate(region)
+        new_labels = labeler.labels(mask)
+        _assert_same_partition(new_labels, mask)
+        # components far away from the edit keep their labels
+        far = np.ones(mask.shape, dtype=bool)
+        far[max(r0 - 1, 0):r1 + 1, max(c0 - 1, 0):c1 + 1] = False
+        untouched = np.setdiff1d(labels[far], labels[~far])
+        keep = np.isin(labels, untouched)
+        assert_array_equal(new_labels[keep], labels[keep])
+        labels = new_labels.copy()
+
+
+def test_merge_and_split():
+    mask = np.zeros((5, 9), dtype=bool)
+    mask[1:4, 1:3] = True
+    mask[1:4, 6:8] = True
+    labeler = IncrementalLabeler()
+    labels = labeler.labels(mask).copy()
+
+    # join the two blocks
+    mask[2, 3:6] = True
+    labeler.invalidate((slice(2, 3), slice(3, 6)))
+    joined = labeler.labels(mask)
+    assert len(np.unique(joined[mask])) == 1
+    assert joined[1, 1] == labels[1, 1]
+
+    # and split them again
+    mask[2, 3:6] = False
+    labeler.invalidate((slice(2, 3), slice(3, 6)))
+    assert_array_equal(labeler.labels(mask), labels)
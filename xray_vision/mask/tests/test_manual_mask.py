@@ -0,0 +1,267 @@
+import matplotlib
+matplotlib.use('Agg')
+from xray_vision.mask.manual_mask import ManualMask
+import matplotlib.pyplot as plt
+from matplotlib import path
+from matplotlib.backend_bases import MouseEvent
+import numpy as np
+from numpy.testing import assert_array_equal
+
+
+def _make_mask(shape=(50, 60)):
+    fig, ax = plt.subplots()
+    return ManualMask(ax, np.random.random(shape))
+
+
+def _full_grid_lasso(verts, shape):
+    y, x = np.mgrid[:shape[0], :shape[1]]
+    points = np.transpose((x.ravel(), y.ravel()))
+    return path.Path(verts).contains_points(points).reshape(shape)
+
+
+def test_lasso():
+    m = _make_mask()
+    verts = [(10.3, 5.2), (30.7, 8.1), (25.2, 20.9), (12.5, 17.4)]
+    m._lasso_call_back(verts)
+    assert_array_equal(m.mask, _full_grid_lasso(verts, m.img_shape))
+
+    # the lasso may stick out of the image
+    verts = [(-10, -10), (15.5, -3), (8, 70)]
+    expected = m.mask | _full_grid_lasso(verts, m.img_shape)
+    m._lasso_call_back(verts)
+    assert_array_equal(m.mask, expected)
+
+    # alt removes the selection
+    m._remove = True
+    m._lasso_call_back(verts)
+    assert_array_equal(m.mask, expected & ~_full_grid_lasso(verts,
+                                                            m.img_shape))
+
+    # and missing the image entirely does nothing
+    before = m.mask.copy()
+    m._lasso_call_back([(100, 100), (120, 100), (120, 120)])
+    assert_array_equal(m.mask, before)
+
+
+def test_undo_redo():
+    m = _make_mask()
+    states = [m.mask.copy()]
+    m._lasso_call_back([(10, 5), (30, 8), (25, 20)])
+    states.append(m.mask.copy())
+    m._lasso_call_back([(0, 0), (5, 0), (5, 40), (0, 40)])
+    states.append(m.mask.copy())
+    m.reset()
+    states.append(m.mask.copy())
+
+    # only the bounding box of the changed pixels is stored, bit packed
+    assert m._undo_stack[0].nbytes <= (16 * 21) // 8 + 1
+
+    for expected in states[-2::-1]:
+        m.undo()
+        assert_array_equal(m.mask, expected)
+    # nothing left to undo
+    m.undo()
+    assert_array_equal(m.mask, states[0])
+
+    for expected in states[1:]:
+        m.redo()
+        assert_array_equal(m.mask, expected)
+
+    # a new edit clears the redo history
+    m.undo()
+    m.mask = ~m.mask
+    m.redo()
+    assert_array_equal(m.mask, ~states[-2])
+
+
+def test_brush():
+    m = _make_mask()
+    m.canvas.draw()
+    m.enable_brush()
+    m.set_brush_radius(2)
+    m._stroke = []
+    m._paint_segment((10, 10), (20, 10))
+    m._paint_segment((20, 10), (20, 15))
+    m._brush_on_release(None)
+
+    # the stroke covers every pixel within the radius of the path
+    y, x = np.mgrid[:m.img_shape[0], :m.img_shape[1]]
+    dist = np.minimum(
+        np.where((x >= 10) & (x <= 20), np.abs(y - 10),
+                 np.hypot(np.minimum(np.abs(x - 10), np.abs(x - 20)),
+                          y - 10)),
+        np.where((y >= 10) & (y <= 15), np.abs(x - 20),
+                 np.hypot(x - 20, np.minimum(np.abs(y - 10),
+                                             np.abs(y - 15)))))
+    assert m.mask[dist <= 1].all()
+    assert not m.mask[dist > 2.5].any()
+    # and is a single undo step
+    assert len(m._undo_stack) == 1
+
+    # the blitted canvas matches a full redraw
+    blitted = np.asarray(m.canvas.buffer_rgba()).copy()
+    m.canvas.draw()
+    assert_array_equal(blitted, np.asarray(m.canvas.buffer_rgba()))
+
+    # painting off the edge of the image is clipped
+    m._remove = True
+    m._stroke = []
+    m._paint_segment((-5, -5), (3, 3))
+    m._brush_on_release(None)
+    m.undo()
+    m.undo()
+    assert not m.mask.any()
+
+
+def test_partial_overlay_refresh():
+    m = _make_mask()
+    m.canvas.draw()
+
+    def check():
+        # the overlay and the blitted canvas match a full redraw
+        assert_array_equal(m._overlay_rgba[..., 3] > 0, m.mask)
+        blitted = np.asarray(m.canvas.buffer_rgba()).copy()
+        m.canvas.draw()
+        assert_array_equal(blitted, np.asarray(m.canvas.buffer_rgba()))
+
+    m._lasso_call_back([(10, 5), (30, 8), (25, 20)])
+    check()
+    x, y = m.ax.transData.transform((40.2, 3.7))
+    m._pixel_flip_on_press(MouseEvent('button_press_event', m.canvas, x, y))
+    assert m.mask[4, 40]
+    check()
+    m.undo()
+    check()
+    m.reset()
+    check()
+    m.undo()
+    check()
+
+
+def test_downsampled_display():
+    shape = (403, 598)
+    for origin in ('upper', 'lower'):
+        fig, ax = plt.subplots()
+        m = ManualMask(ax, np.random.random(shape), origin=origin,
+                       downsample=4)
+        assert m.base_image.get_array().shape == (101, 150)
+        assert m._overlay_rgba.shape == (101, 150, 4)
+        # the axes still span the full resolution image
+        assert sorted(ax.get_xlim()) == [-.5, 597.5]
+        assert sorted(ax.get_ylim()) == [-.5, 402.5]
+        m.canvas.draw()
+
+        # edits are made at full resolution
+        verts = [(100.3, 50.2), (300.7, 80.1), (250.2, 200.9)]
+        m._lasso_call_back(verts)
+        assert_array_equal(m.mask, _full_grid_lasso(verts, shape))
+        x, y = m.ax.transData.transform((597, 402))
+        m._pixel_flip_on_press(MouseEvent('button_press_event', m.canvas,
+                                          x, y))
+        assert m.mask[402, 597] and m.mask.sum() == \
+            _full_grid_lasso(verts, shape).sum() + 1
+
+        # and shown reduced over blocks
+        padded = np.zeros((404, 600), dtype=bool)
+        padded[:403, :598] = m.mask
+        expected = padded.reshape(101, 4, 150, 4).any(axis=(1, 3))
+        assert_array_equal(m._overlay_rgba[..., 3] > 0, expected)
+        blitted = np.asarray(m.canvas.buffer_rgba()).copy()
+        m.canvas.draw()
+        assert_array_equal(blitted, np.asarray(m.canvas.buffer_rgba()))
+
+        # zooming in shows the part in view at full resolution
+        ax.set_xlim(200, 260)
+        ax.set_ylim(sorted((100, 140), reverse=origin == 'upper'))
+        assert m._downsample == 1
+        assert m.base_image.get_array().shape == (41, 61)
+        x, y = m.ax.transData.transform((230, 120))
+        m._pixel_flip_on_press(MouseEvent('button_press_event', m.canvas,
+                                          x, y))
+        m.canvas.draw()
+        assert_array_equal(m._overlay_rgba[..., 3] > 0,
+                           m.mask[m._view[0], m._view[1]])
+        m._lasso_call_back([(220, 110), (240, 110), (240, 130)])
+        blitted = np.asarray(m.canvas.buffer_rgba()).copy()
+        m.canvas.draw()
+        assert_array_equal(blitted, np.asarray(m.canvas.buffer_rgba()))
+
+        # and zooming back out downsamples again
+        ax.set_xlim(-.5, 597.5)
+        ax.set_ylim(sorted((-.5, 402.5), reverse=origin == 'upper'))
+        assert m._downsample == 4
+        assert m._overlay_rgba.shape == (101, 150, 4)
+        padded[:403, :598] = m.mask
+        expected = padded.reshape(101, 4, 150, 4).any(axis=(1, 3))
+        assert_array_equal(m._overlay_rgba[..., 3] > 0, expected)
+
+    # ordinary detector frames are shown in full by default
+    fig, ax = plt.subplots()
+    m = ManualMask(ax, np.zeros((1024, 1024)))
+    assert m._downsample == 1
+    assert m.base_image.get_array().shape == (1024, 1024)
+
+    # very large images are downsampled to fit the axes by default
+    fig, ax = plt.subplots()
+    m = ManualMask(ax, np.zeros((4000, 3000)))
+    assert m._downsample == int(np.ceil(4000 / ax.bbox.height))
+
+
+def test_frame_stack():
+    fig, ax = plt.subplots()
+    stack = np.random.random((10, 50, 60))
+    base = np.zeros((50, 60), dtype=bool)
+    base[:5] = True
+    m = ManualMask(ax, stack, mask=base)
+    assert m.frame == 0
+    assert_array_equal(m.mask, base)
+
+    m._lasso_call_back([(10, 5), (30, 8), (25, 20)])
+    frame0 = m.mask.copy()
+    m.frame_slider.set_val(3)
+    assert m.frame == 3
+    assert_array_equal(m.base_image.get_array(), stack[3])
+    assert_array_equal(m.mask, base)
+    assert len(m._undo_stack) == 0
+
+    m.reset()
+    m.set_frame(0)
+    assert m.frame_slider.val == 0
+    assert_array_equal(m.mask, frame0)
+    assert_array_equal(m.stack_mask[3], np.zeros_like(base))
+    assert_array_equal(m.stack_mask[7], base)
+    assert m.stack_mask.frames_with_deltas == [0, 3]
+
+    m.apply_to_all_frames()
+    assert_array_equal(m.stack_mask[7], frame0)
+    assert m.stack_mask.frames_with_deltas == [3]
+
+
+def test_label_array():
+    m = _make_mask()
+    m._lasso_call_back([(0, 0), (5, 0), (5, 10), (0, 10)])
+    labels = m.label_array
+    assert_array_equal(labels > 0, m.mask)
+    assert len(np.unique(labels[labels > 0])) == 1
+
+    # the returned array does not change with later edits
+    before = labels.copy()
+    m._lasso_call_back([(30, 30), (40, 30), (40, 40), (30, 40)])
+    assert_array_equal(labels, before)
+    assert len(np.unique(m.label_array[m.label_array > 0])) == 2
+
+    # in place edits show up once the mask is assigned back
+    m.mask[:] = False
+    m.mask = m.mask
+    assert not m.label_array.any()
+
+
+def test_save_mask():
+    import os
+    import tempfile
+    from xray_vision.mask.packed_mask import PackedMask
+    m = _make_mask()
+    m._lasso_call_back([(10, 5), (30, 8), (25, 20)])
+    fname = os.path.join(tempfile.mkdtemp(), 'det1.mask')
+    m.save_mask(fname)
+    assert_array_equal(PackedMask.load(fname).to_array(), m.mask)
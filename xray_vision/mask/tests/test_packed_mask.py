@@ -0,0 +1,42 @@
+from xray_vision.mask.packed_mask import PackedMask
+import numpy as np
+from numpy.testing import assert_array_equal
+import os
+import tempfile
+
+
+def _roundtrip(mask, suffix='.npz'):
+    packed = PackedMask.from_array(mask)
+    assert_array_equal(packed.to_array(), mask)
+    assert packed.to_array().dtype == mask.dtype
+    fname = os.path.join(tempfile.mkdtemp(), 'det1' + suffix)
+    try:
+        packed.save(fname)
+        # the file is written under the name it was given
+        assert os.listdir(os.path.dirname(fname)) == ['det1' + suffix]
+        loaded = PackedMask.load(fname)
+    finally:
+        os.remove(fname)
+        os.rmdir(os.path.dirname(fname))
+    assert_array_equal(loaded.to_array(), mask)
+    assert loaded.shape == mask.shape
+    assert loaded.dtype == mask.dtype
+    return packed
+
+
+def test_packed_mask():
+    # a mostly empty mask gets run length encoded
+    mask = np.zeros((101, 203), dtype=bool)
+    mask[10:20, 30:150] = True
+    packed = _roundtrip(mask)
+    assert packed.nbytes == (mask.size + 7) // 8
+    assert_array_equal(np.asarray(packed), mask)
+
+    # a noisy one is stored as packed bits
+    _roundtrip(np.random.random((33, 17)) > 0.5)
+    # other dtypes are preserved
+    _roundtrip((np.random.random((8, 9)) > 0.5).astype(np.uint8))
+    _roundtrip(np.zeros((0, 5), dtype=bool))
+    # names without '.npz' round trip
+    _roundtrip(mask, suffix='.mask')
+    _roundtrip(mask, suffix='')
@@ -0,0 +1,131 @@
+import matplotlib
+matplotlib.use('Agg')
+from xray_vision.mask.manual_mask import ManualMask
+from xray_vision.mask.roi_tools import (ROIEditor, RectangleROI, EllipseROI,
+                                        AnnulusROI, PolygonROI)
+import matplotlib.pyplot as plt
+from matplotlib.backend_bases import MouseEvent
+import numpy as np
+from numpy.testing import assert_array_equal
+
+SHAPE = (50, 60)
+
+
+def _full_grid(roi, shape=SHAPE):
+    y, x = np.mgrid[:shape[0], :shape[1]]
+    return roi._inside(x.astype(float), y.astype(float))
+
+
+def _rasterized(roi, shape=SHAPE):
+    full = np.zeros(shape, dtype=bool)
+    region, selected = roi.rasterize(shape)
+    if region is not None:
+        full[region] = selected
+    return full
+
+
+def _expected_labels(editor):
+    labels = np.zeros(SHAPE, dtype=int)
+    for label, roi in editor.rois.items():
+        labels[_full_grid(roi)] = label
+    return labels
+
+
+def test_rasterize():
+    rois = [RectangleROI(30.5, 40.2, 10.7, 12),
+            EllipseROI(20.3, 25.1, 12.4, 7.6),
+            AnnulusROI(50, 10, 4.5, 15.2),
+            PolygonROI([(10.3, 5.2), (30.7, 8.1), (25.2, 20.9),
+                        (12.5, 17.4)])]
+    for roi in rois:
+        assert_array_equal(_rasterized(roi), _full_grid(roi))
+        # the rasterization is cached until the shape changes
+        assert roi.rasterize(SHAPE)[1] is roi.rasterize(SHAPE)[1]
+        roi.translate(-3.2, 1.4)
+        assert_array_equal(_rasterized(roi), _full_grid(roi))
+        for index in range(len(roi.handles)):
+            roi.move_handle(index, *(roi.handles[index] + (1.3, -2.1)))
+            assert_array_equal(_rasterized(roi), _full_grid(roi))
+
+    # shapes off of the image select nothing
+    assert RectangleROI(-10, -10, -1, -1).rasterize(SHAPE) == (None, None)
+
+
+def test_editor():
+    fig, ax = plt.subplots()
+    ax.imshow(np.zeros(SHAPE))
+    editor = ROIEditor(ax, SHAPE)
+    rect = editor.add_roi(RectangleROI(5, 5, 30, 20))
+    ring = editor.add_roi(AnnulusROI(25, 25, 5, 12))
+    assert_array_equal(editor.label_array, _expected_labels(editor))
+
+    # dragging a handle only rasterizes that ROI again
+    ring_cache = editor.rois[ring]._cache
+    editor.move_handle(rect, 2, 40.5, 35.2)
+    assert editor.rois[ring]._cache is ring_cache
+    assert_array_equal(editor.label_array, _expected_labels(editor))
+    editor.translate(ring, 20, 10)
+    assert_array_equal(editor.label_array, _expected_labels(editor))
+
+    # with the mouse
+    editor.connect()
+    fig.canvas.draw()
+
+    def mouse(name, xy):
+        x, y = ax.transData.transform(xy)
+        event = MouseEvent(name, fig.canvas, x, y)
+        getattr(editor, '_on_' + name)(event)
+
+    mouse('press', (5, 5))
+    mouse('motion', (2, 8))
+    mouse('release', (2, 8))
+    assert np.allclose((editor.rois[rect].x0, editor.rois[rect].y0), (2, 8))
+    mouse('press', (10, 15))
+    mouse('motion', (13, 16))
+    mouse('release', (13, 16))
+    assert np.isclose(editor.rois[rect].x0, 5)
+    assert_array_equal(editor.label_array, _expected_labels(editor))
+
+    editor.remove_roi(rect)
+    assert_array_equal(editor.label_array, _expected_labels(editor))
+    assert_array_equal(editor.mask, editor.label_array > 0)
+
+
+def test_editor_with_manual_mask():
+    fig, ax = plt.subplots()
+    m = ManualMask(ax, np.zeros(SHAPE))
+    editor = ROIEditor(ax, SHAPE, manual_mask=m)
+    rect = editor.add_roi(RectangleROI(20, 10, 40, 30))
+    fig.canvas.draw()
+
+    def drag(start, end):
+        for name, xy in (('button_press_event', start),
+                         ('motion_notify_event', end),
+                         ('button_release_event', end)):
+            x, y = ax.transData.transform(xy)
+            fig.canvas.callbacks.process(
+                name, MouseEvent(name, fig.canvas, x, y, button=1))
+
+    # the editor does not grab the mouse until it is connected
+    m.enable_brush()
+    drag((25, 15), (30, 20))
+    assert m.mask[15, 25] and m.mask[20, 30]
+    assert editor.rois[rect].x0 == 20
+
+    # connecting turns off the mask tools
+    editor.connect()
+    assert m.active_tool == ''
+    before = m.mask.copy()
+    drag((25, 15), (35, 20))
+    assert np.isclose(editor.rois[rect].x0, 30)
+    assert_array_equal(m.mask, before)
+    assert not fig.canvas.widgetlock.locked()
+
+    # while a mask tool is on, presses go to the mask only
+    m.enable_brush()
+    drag((35, 15), (36, 16))
+    assert m.mask[15, 35]
+    assert np.isclose(editor.rois[rect].x0, 30)
+    m.enable_lasso()
+    drag((35, 15), (45, 25))
+    assert np.isclose(editor.rois[rect].x0, 30)
@@ -0,0 +1,41 @@
+from xray_vision.mask.stack_mask import StackMask
+from xray_vision.mask.packed_mask import PackedMask
+import numpy as np
+from numpy.testing import assert_array_equal, assert_raises
+
+
+def test_stack_mask():
+    shape = (300, 400)
+    base = np.zeros(shape, dtype=bool)
+    base[100:120, 200:230] = True
+    masks = StackMask(PackedMask.from_array(base), 1000)
+    assert len(masks) == 1000
+    assert_array_equal(masks[500], base)
+
+    # a moving beamstop, only the changed pixels are stored
+    expected = dict()
+    for frame in range(0, 1000, 100):
+        mask = np.zeros(shape, dtype=bool)
+        mask[100:120, 200 + frame // 100:230 + frame // 100] = True
+        masks.set_frame_mask(frame, mask)
+        expected[frame] = mask
+    assert masks.frames_with_deltas == list(range(100, 1000, 100))
+    assert masks.nbytes < base.nbytes + 9 * 200
+    for frame, mask in expected.items():
+        assert_array_equal(masks[frame], mask)
+    assert_array_equal(masks[-900], expected[100])
+    assert_array_equal(masks[1], base)
+
+    # editing the base applies to all frames, except where they override it
+    base[0, 0] = True
+    base[110, 205] = False
+    base[110, 201] = True
+    masks.base = base
+    assert masks[300][0, 0] and masks[300][110, 232]
+    assert not masks[300][110, 201]
+    assert masks[1][0, 0] and not masks[1][110, 205]
+
+    masks.clear_frame(300)
+    assert_array_equal(masks[300], base)
+    assert_raises(IndexError, masks.frame_mask, 1000)
+    assert_raises(ValueError, masks.set_frame_mask, 0, base[1:])
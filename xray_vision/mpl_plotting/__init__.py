@@ -1,3 +1,5 @@
 from .misc import split_plot
+from .misc import SplitLine
 from .misc import mark_region
+from .misc import binary_state_lines
 from .roi import show_label_array
@@ -3,10 +3,14 @@ from __future__ import absolute_import, division, print_function
 import six
 import numpy as np
 import copy
+import matplotlib
 from matplotlib.collections import LineCollection
-from matplotlib.colors import ListedColormap, BoundaryNorm
+from matplotlib.colors import ListedColormap, BoundaryNorm, to_rgba_array
 from matplotlib.ticker import NullLocator
 
+import logging
+logger = logging.getLogger(__name__)
+
 
 def mark_region(ax, low, high, vline_style, span_style):
     """
@@ -61,31 +65,166 @@ def split_plot(ax, x, y, low, high, inner_style, outer_style):
         Data, must be same length
 
     low, high : float
-        The low and high threshold values, points for `low < x < high` are
-        styled using `inner_style` and points for `x < low or x > high` are
-        styled using `outer_style`
+        The low and high threshold values, segments for `low <= x < high`
+        are styled using `inner_style` and the others using `outer_style`
 
     inner_style, outer_style : dict
-        Dictionary of styles that can be passed to `ax.plot`
+        Styles, see `SplitLine` for the keys that are supported
 
     Returns
     -------
-    lower, mid, upper : Line2D
-        The artists for the lower, midddle, and upper ranges
+    line : SplitLine
+        The drawn line, use `line.collection` for the artist and
+        `line.update` to change the data or thresholds
+
+    Notes
+    -----
+    This used to return the three lines ``lower, mid, upper``.  It now
+    draws a single `SplitLine`, so callers that unpack the result or use
+    `Line2D` methods on it have to use ``line.collection`` instead.  Use
+    `SplitLine` directly for any number of thresholds.
     """
+    return SplitLine(ax, x, y, [low, high],
+                     [outer_style, inner_style, outer_style])
 
-    low_mask = x < low
-    high_mask = x > high
-    mid_mask = ~np.logical_or(low_mask, high_mask)
-
-    low_mask[1:] |= low_mask[:-1]
-    high_mask[:-1] |= high_mask[1:]
 
-    lower, = ax.plot(x[low_mask], y[low_mask], **outer_style)
-    mid, = ax.plot(x[mid_mask], y[mid_mask], **inner_style)
-    upper, = ax.plot(x[high_mask], y[high_mask], **outer_style)
-
-    return lower, mid, upper
+class SplitLine(object):
+    """
+    A line whose style changes at x thresholds, drawn as one
+    `LineCollection` with the properties of every segment computed in one
+    vectorized pass.
+    """
+    _aliases = {'c': 'color', 'lw': 'linewidth', 'ls': 'linestyle',
+                'aa': 'antialiased', 'ms': 'markersize',
+                'mec': 'markeredgecolor', 'mew': 'markeredgewidth',
+                'mfc': 'markerfacecolor', 'mfcalt': 'markerfacecoloralt',
+                'ds': 'drawstyle'}
+    # style keys that may differ between the ranges
+    segment_keys = frozenset(['color', 'linewidth', 'linestyle', 'alpha'])
+    # style keys that are set on the whole collection
+    shared_keys = frozenset(['label', 'zorder', 'antialiased', 'capstyle',
+                             'joinstyle', 'rasterized', 'visible', 'clip_on',
+                             'gid', 'url', 'picker', 'path_effects'])
+    # Line2D style keys that a LineCollection has no equivalent for
+    dropped_keys = frozenset(['marker', 'markersize', 'markeredgecolor',
+                              'markeredgewidth', 'markerfacecolor',
+                              'markerfacecoloralt', 'markevery', 'fillstyle',
+                              'drawstyle'])
+
+    def __init__(self, ax, x, y, thresholds, styles, color=None):
+        """
+        Parameters
+        ----------
+        ax : Axes
+            The `Axes` object to add the artist too
+
+        x, y : ndarray
+            Data, must be same length
+
+        thresholds : sequence
+            The N increasing x values to split the line at
+
+        styles : list of dict
+            The N + 1 styles of the ranges ``x < thresholds[0]``,
+            ``thresholds[0] <= x < thresholds[1]``, ... and
+            ``x >= thresholds[-1]``.  A segment is styled by the range of
+            its middle.  The keys 'color' (or 'c'), 'linewidth' (or 'lw'),
+            'linestyle' (or 'ls') and 'alpha' can differ between ranges.
+            The keys in `shared_keys`, such as 'label' and 'zorder', apply
+            to the whole line and must not differ between the styles that
+            set them.  Marker and draw style keys (`dropped_keys`) have no
+            equivalent on a `LineCollection` and are ignored with a
+            warning.  Any other key raises a ValueError.
+
+        color : color, optional
+            The color of the ranges whose style has none.  Defaults to the
+            first color of the 'axes.prop_cycle' rcParam
+        """
+        self.ax = ax
+        if color is None:
+            color = matplotlib.rcParams['axes.prop_cycle'].by_key().get(
+                'color', ['k'])[0]
+        self._styles = [dict((self._aliases.get(k, k), v)
+                             for k, v in six.iteritems(style))
+                        for style in styles]
+        keys = set().union(*self._styles)
+        unsupported = keys - self.segment_keys - self.shared_keys - \
+            self.dropped_keys
+        if unsupported:
+            raise ValueError("unsupported style keys: {0}".format(
+                sorted(unsupported)))
+        dropped = keys & self.dropped_keys
+        if dropped:
+            logger.warning("SplitLine draws no markers, ignoring the style "
+                           "keys %s", sorted(dropped))
+        shared = dict()
+        for style in self._styles:
+            for key in keys & self.shared_keys:
+                if key not in style:
+                    continue
+                if key in shared and shared[key] != style[key]:
+                    raise ValueError("the style key {0!r} applies to the "
+                                     "whole line and must be the same in "
+                                     "every style".format(key))
+                shared[key] = style[key]
+        # the per-range properties, to be indexed by the range of each
+        # segment
+        colors = to_rgba_array([style.get('color', color)
+                                for style in self._styles])
+        colors[:, 3] *= [style.get('alpha', 1) for style in self._styles]
+        self._colors = colors
+        self._linewidths = np.array(
+            [style.get('linewidth', matplotlib.rcParams['lines.linewidth'])
+             for style in self._styles], dtype=float)
+        self._linestyles = [style.get('linestyle', 'solid')
+                            for style in self._styles]
+        self.x = self.y = self.thresholds = None
+        self.collection = LineCollection([])
+        self.collection.set(**shared)
+        ax.add_collection(self.collection)
+        self.update(x, y, thresholds)
+
+    def update(self, x=None, y=None, thresholds=None):
+        """
+        Change the data and/or the thresholds, keeping the artist
+
+        Parameters
+        ----------
+        x, y : ndarray, optional
+            New data, must be the same length as each other
+        thresholds : sequence, optional
+            New thresholds, must be as many as before
+        """
+        x = self.x if x is None else np.asarray(x, dtype=float)
+        y = self.y if y is None else np.asarray(y, dtype=float)
+        if len(x) != len(y):
+            raise ValueError("x and y must be the same length")
+        if thresholds is None:
+            thresholds = self.thresholds
+        else:
+            thresholds = np.asarray(thresholds, dtype=float)
+            if len(thresholds) + 1 != len(self._styles):
+                raise ValueError("{0} thresholds need {1} styles, not "
+                                 "{2}".format(len(thresholds),
+                                              len(thresholds) + 1,
+                                              len(self._styles)))
+        self.x, self.y, self.thresholds = x, y, thresholds
+
+        points = np.column_stack([self.x, self.y])
+        segments = np.stack([points[:-1], points[1:]], axis=1)
+        ranges = np.searchsorted(self.thresholds,
+                                 (self.x[:-1] + self.x[1:]) / 2,
+                                 side='right')
+        self.collection.set_segments(segments)
+        self.collection.set_color(self._colors[ranges])
+        self.collection.set_linewidth(self._linewidths[ranges])
+        if len(set(self._linestyles)) > 1:
+            self.collection.set_linestyle([self._linestyles[r]
+                                           for r in ranges])
+        else:
+            self.collection.set_linestyle(self._linestyles[0])
+        self.ax.update_datalim(points[np.isfinite(points).all(axis=1)])
+        self.ax.autoscale_view()
 
 
 def show_label_array(ax, label_array, cmap=None, **kwargs):
@@ -137,6 +276,9 @@ def binary_state_lines(ax, data, xmin, xmax,
     """
     Draw series of lines indicating the state of (many) indicators.
 
+    All of the lines are drawn as a single `LineCollection` that is built in
+    one vectorized pass, so thousands of indicators stay responsive.
+
     Parameters
     ----------
     ax : Axes
@@ -166,94 +308,189 @@ def binary_state_lines(ax, data, xmin, xmax,
 
     Returns
     -------
-    ret : dict
-        dictionary of the collections added keyed on the label
+    lines : BinaryStateLines
+        The drawn lines.  Use `lines.collection` for the LineCollection and
+        `lines.append_edges` to add edges as they happen
 
     """
-    if lc_kwargs is None:
-        lc_kwargs = dict()
-    if 'lw' not in lc_kwargs:
-        lc_kwargs['lw'] = 10
-
-    if off_color is None:
-        off_color = "#1C2F4D"
-    if on_color is None:
-        on_color = "#FA9B00"
-
-    # base offset
-    y_val = 0
-    # make the color map and norm
-    cmap = ListedColormap([off_color, on_color])
-    norm = BoundaryNorm([0, 0.5, 1], cmap.N)
-    # dictionary to hold the returned artists
-    ret = dict()
-    # loop over the input data draw each collection
-    for label, d in data.items():
-        # increment the y offset
-        y_val += delta_y
-        # turn the high windows on to alternating
-        # high/low regions
-        x = np.asarray(d).ravel()
-        # assign the high/low state to each one
-        state = np.mod(1 + np.arange(len(x)), 2)
-        # deal with boundary conditions to be off
-        # at start/end
-        if x[0] > xmin:
-            x = np.r_[xmin, x]
-            state = np.r_[0, state]
-        if x[-1] < xmax:
-            x = np.r_[x, xmax]
-            state = np.r_[state, 0]
-        # make the matching y values
-        y = np.ones(len(x)) * y_val
-        # call helper function to create the collection
-        coll = _draw_segments(ax, x, y, state,
-                              cmap, norm, lc_kwargs)
-        ret[label] = coll
-
-    # set up the axes limits
-    ax.set_xlim(xmin, xmax)
-    ax.set_ylim(0, y_val + delta_y)
-    # turn off x-ticks
-    ax.xaxis.set_major_locator(NullLocator())
-    # make the y-ticks be labeled as per the input
-    ax.yaxis.set_ticks((1 + np.arange(len(data))) * delta_y)
-    ax.yaxis.set_ticklabels(list(data.keys()))
-    # invert so that the first data is at the top
-    ax.invert_yaxis()
-    # turn off the frame and patch
-    ax.set_frame_on(False)
-    # return the added artists
-    return ret
-
-
-def _draw_segments(ax, x, y, state, cmap, norm, lc_kwargs):
-    """
-    helper function to turn boundary edges into the input LineCollection
-    expects.
+    return BinaryStateLines(ax, data, xmin, xmax, delta_y=delta_y,
+                            off_color=off_color, on_color=on_color,
+                            lc_kwargs=lc_kwargs)
 
-    Parameters
-    ----------
-    ax : Axes
-       The axes to draw to
-
-    x, y, state : array
-       The x edges, the y values and the state of each region
-
-    cmap : matplotlib.colors.Colormap
-       The color map to use
 
-    norm : matplotlib.ticker.Norm
-       The norm to use with the color map
-
-    lc_kwargs : dict
-       kwargs to pass through to LineCollection
+class BinaryStateLines(object):
     """
-
-    points = np.array([x, y]).T.reshape(-1, 1, 2)
-    segments = np.concatenate([points[:-1], points[1:]], axis=1)
-    lc = LineCollection(segments, cmap=cmap, norm=norm, **lc_kwargs)
-    lc.set_array(state)
-
-    ax.add_collection(lc)
-    return lc
+    The lines of `binary_state_lines`, as one `LineCollection`
+
+    Every line is split into segments between its edges.  The segments of
+    all of the lines are kept in flat arrays, ordered line by line, which
+    are turned into the segments and states of the collection in one go.
+    Edges can be appended to any line, including new ones, for live
+    monitoring; the odd edges of a line switch it on and the even ones off,
+    so a line with an odd number of edges is on up to `xmax`.
+    """
+    def __init__(self, ax, data, xmin, xmax, delta_y=3, off_color=None,
+                 on_color=None, lc_kwargs=None):
+        """
+        See `binary_state_lines` for the parameters
+        """
+        if lc_kwargs is None:
+            lc_kwargs = dict()
+        if 'lw' not in lc_kwargs:
+            lc_kwargs['lw'] = 10
+
+        if off_color is None:
+            off_color = "#1C2F4D"
+        if on_color is None:
+            on_color = "#FA9B00"
+
+        self.ax = ax
+        self.xmin, self.xmax = xmin, xmax
+        self.delta_y = delta_y
+        self.labels = list(data.keys())
+        self._label_index = dict((label, idx) for idx, label in
+                                 enumerate(self.labels))
+
+        # each line is xmin -> edge 0 -> edge 1 ... -> xmax
+        edges = [np.asarray(d, dtype=float).ravel() for d in data.values()]
+        num_edges = np.array([len(e) for e in edges], dtype=int)
+        edges = np.concatenate(edges) if edges else np.zeros(0)
+        num_segs = num_edges + 1
+        # the index of the last segment of each line
+        self._last = np.cumsum(num_segs) - 1
+        first_edge = np.cumsum(num_edges) - num_edges
+        self._starts = np.insert(edges, first_edge, xmin)
+        self._stops = np.insert(edges, first_edge + num_edges, xmax)
+        # the segment after an odd number of edges is on
+        first_seg = self._last + 1 - num_segs
+        self._states = (np.arange(len(self._starts)) -
+                        np.repeat(first_seg, num_segs)) % 2
+        self._ys = np.repeat((1 + np.arange(len(self.labels))) * delta_y,
+                             num_segs).astype(float)
+
+        # make the color map and norm
+        cmap = ListedColormap([off_color, on_color])
+        norm = BoundaryNorm([0, 0.5, 1], cmap.N)
+        self.collection = LineCollection(self._segments(), cmap=cmap,
+                                         norm=norm, **lc_kwargs)
+        self.collection.set_array(self._states)
+        ax.add_collection(self.collection)
+
+        # set up the axes limits
+        ax.set_xlim(xmin, xmax)
+        # turn off x-ticks
+        ax.xaxis.set_major_locator(NullLocator())
+        self._update_labels()
+        # turn off the frame and patch
+        ax.set_frame_on(False)
+
+    def _segments(self):
+        segments = np.empty((len(self._starts), 2, 2))
+        segments[:, 0, 0] = self._starts
+        segments[:, 1, 0] = self._stops
+        segments[:, :, 1] = self._ys[:, np.newaxis]
+        return segments
+
+    def _update_collection(self):
+        self.collection.set_segments(self._segments())
+        self.collection.set_array(self._states)
+
+    def _update_labels(self):
+        # make the y-ticks be labeled as per the input, with the first data
+        # at the top
+        self.ax.set_ylim(len(self.labels) * self.delta_y + self.delta_y, 0)
+        self.ax.yaxis.set_ticks((1 + np.arange(len(self.labels))) *
+                                self.delta_y)
+        self.ax.yaxis.set_ticklabels(self.labels)
+
+    def append_edges(self, new_edges):
+        """
+        Add edges to the ends of some lines
+
+        Parameters
+        ----------
+        new_edges : dict
+            The new edges, keyed on the label.  Unknown labels are added as
+            new lines at the bottom
+        """
+        new_edges = [(label, np.asarray(edges, dtype=float).ravel())
+                     for label, edges in six.iteritems(new_edges)]
+        new_labels = [label for label, _ in new_edges
+                      if label not in self._label_index]
+        if new_labels:
+            self._add_lines(new_labels)
+        new_edges = [(self._label_index[label], edges)
+                     for label, edges in new_edges if len(edges)]
+        if new_edges:
+            self._insert_edges([idx for idx, _ in new_edges],
+                               [edges for _, edges in new_edges])
+        self._update_collection()
+        if new_labels:
+            self._update_labels()
+
+    def _insert_edges(self, lines, edges):
+        """
+        Append edges to the ends of some lines, with one `np.insert` per
+        array
+
+        Parameters
+        ----------
+        lines : list
+            The (unique) indices of the lines
+        edges : list of array
+            The new edges of each line
+        """
+        lines = np.asarray(lines, dtype=int)
+        counts = np.array([len(e) for e in edges], dtype=int)
+        edges = np.concatenate(edges)
+        last = self._last[lines]
+        first = np.r_[0, self._last[:-1] + 1][lines]
+        # the position of every new edge in the edges of its line
+        group_start = np.cumsum(counts) - counts
+        within = np.arange(len(edges)) - np.repeat(group_start, counts)
+        # the line is on after its odd edges
+        states = (np.repeat(last - first + 1, counts) + within) % 2
+        stops = np.empty(len(edges))
+        stops[:-1] = edges[1:]
+        stops[group_start + counts - 1] = self.xmax
+        # the old last segments now stop at the first new edge
+        self._stops[last] = edges[group_start]
+        where = np.repeat(last + 1, counts)
+        self._starts = np.insert(self._starts, where, edges)
+        self._stops = np.insert(self._stops, where, stops)
+        self._states = np.insert(self._states, where, states)
+        self._ys = np.insert(self._ys, where, np.repeat(self._ys[last],
+                                                        counts))
+        added = np.zeros(len(self._last), dtype=int)
+        added[lines] = counts
+        self._last += np.cumsum(added)
+
+    def _add_lines(self, labels):
+        """
+        Add empty (off) lines at the bottom
+        """
+        num_lines = len(self.labels)
+        for label in labels:
+            self._label_index[label] = len(self.labels)
+            self.labels.append(label)
+        num_new = len(labels)
+        self._starts = np.r_[self._starts, np.full(num_new, self.xmin)]
+        self._stops = np.r_[self._stops, np.full(num_new, self.xmax)]
+        self._states = np.r_[self._states, np.zeros(num_new, dtype=int)]
+        self._ys = np.r_[self._ys, (num_lines + 1 +
+                                    np.arange(num_new)) * self.delta_y]
+        self._last = np.r_[self._last,
+                           len(self._starts) - num_new + np.arange(num_new)]
+
+    def set_xmax(self, xmax):
+        """
+        Extend (or shorten) all of the lines to `xmax`
+
+        Parameters
+        ----------
+        xmax : float
+        """
+        self.xmax = xmax
+        self._stops[self._last] = xmax
+        self._update_collection()
+        self.ax.set_xlim(self.xmin, xmax)
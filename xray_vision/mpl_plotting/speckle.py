@@ -39,7 +39,13 @@ import six
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mticks
+from matplotlib.transforms import Bbox
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
+from functools import partial
 from .utils import multiline
+from ..utils.frame_stack import map_chunks, gather_pixels
+from ..utils.binning import LabelBinner
 import pandas as pd
 import logging
 logger = logging.getLogger(__name__)
@@ -52,11 +58,14 @@ Corresponding analysis tools can be found in the `skxray.core.speckle` module
 
 def mean_intensity_plotter(ax, dataframe,
                            title="Mean intensities", xlabel="Frames",
-                           ylabel="Mean Intensity", cmap=None):
+                           ylabel="Mean Intensity", cmap=None, legend=True):
     """
     This will plot mean intensities for ROIS' of the labeled array
     for different image sets.
 
+    Each axes gets a single `LineCollection` with one path per dataset, the
+    datasets placed one after the other along x.
+
     Parameters
     ----------
     ax : list of Axes
@@ -70,18 +79,23 @@ def mean_intensity_plotter(ax, dataframe,
         x axis label
     y_label : str, optional
         y axis label
-    color_cycle : str
+    cmap : str
         Matplotlib string name of colormap (see matplotlib.pyplot.colormaps()
         for a list of valid colormaps on your machine)
+    legend : bool, optional
+        Add a legend of the datasets to each axes.  Defaults to True
     
     Returns
     -------
-    artists : pd.DataFrame
-        Pandas DataFrame whose column/row names match the input `dataframe`
+    plot : MeanIntensityPlot
+        `plot.collections` is a pd.Series of the collections indexed by
+        the row names of `dataframe`; `plot.update` shows new data with
+        the same artists
     
     Examples
     --------
-    
+    >>> plot = mean_intensity_plotter(axes, df)
+    >>> plot.update(new_df)
     """
     if cmap is None:
         # TODO don't use viridis in production, yet...
@@ -90,37 +104,116 @@ def mean_intensity_plotter(ax, dataframe,
         else:
             cmap = 'rainbow'
     cmap = plt.get_cmap(cmap)
+    return MeanIntensityPlot(ax, dataframe, title=title, xlabel=xlabel,
+                             ylabel=ylabel, cmap=cmap, legend=legend)
 
-    ax[-1].set_xlabel(xlabel)
-    # capture the artists in a nested dictionary
-    artists = {col_name: {} for col_name in dataframe}
-    # compute the offset for each column
-    offsets = []
-    cur = 0
-    prev = 0
-    # determine how far to offset each data set
-    for data in dataframe.ix[0]:
-        cur = prev + len(data)
-        offsets.append((prev, cur))
-        prev = cur
-    # loop over the rows of the dataframe
-    for idx, row_label in enumerate(dataframe.index):
-        # do some axes housekeeping
-        ax[idx].set_ylabel(ylabel)
-        ax[idx].set_title(title + ' for %s' % row_label)
-        row = dataframe.ix[row_label]
-        # loop over the columns of the dataframe, creating each line plot
-        # one at a time
-        for idx2, (column_name, color_idx) in enumerate(zip(
-            dataframe, np.arange(0, 1, 1/len(row)))):
-            x = range(*offsets[idx2])
-            y = row.ix[column_name]
-            art, = ax[idx].plot(x, y, label=column_name, color=cmap(color_idx))
-            # store the artists in a nested dictionary
-            artists[column_name][row_label] = art
-        # enable the legend for each plot after all data has been added
-        ax[idx].legend()
-    return pd.DataFrame(artists)
+
+class MeanIntensityPlot(object):
+    """The artists of `mean_intensity_plotter`, one collection per ROI"""
+    def __init__(self, ax, dataframe, title, xlabel, ylabel, cmap, legend):
+        """
+        See `mean_intensity_plotter` for the parameters
+        """
+        self.ax = ax
+        self.columns = list(dataframe.columns)
+        num_datasets = len(self.columns)
+        colors = cmap(np.arange(num_datasets) / max(num_datasets, 1))
+        ax[-1].set_xlabel(xlabel)
+        collections = []
+        for idx, row_label in enumerate(dataframe.index):
+            # do some axes housekeeping
+            ax[idx].set_ylabel(ylabel)
+            ax[idx].set_title(title + ' for %s' % row_label)
+            coll = LineCollection([], colors=colors)
+            ax[idx].add_collection(coll)
+            collections.append(coll)
+            if legend:
+                # a legend entry per dataset, without drawing extra lines
+                ax[idx].legend([Line2D([], [], color=c) for c in colors],
+                               self.columns)
+        self.collections = pd.Series(collections, index=dataframe.index)
+        self.update(dataframe)
+
+    def update(self, dataframe):
+        """
+        Show new data, keeping the artists
+
+        Parameters
+        ----------
+        dataframe : pd.DataFrame
+            The same rows and columns as the plotted dataframe, the datasets
+            may have changed length
+        """
+        dataframe = dataframe.loc[self.collections.index, self.columns]
+        # determine how far to offset each data set, from the first row
+        lengths = np.array([len(d) for d in dataframe.iloc[0]], dtype=int)
+        bounds = np.r_[0, np.cumsum(lengths)]
+        x = np.arange(bounds[-1])
+        for idx, row_label in enumerate(dataframe.index):
+            y = np.concatenate([np.ravel(d) for d in
+                                dataframe.loc[row_label]]).astype(float)
+            points = np.column_stack([x, y])
+            coll = self.collections[row_label]
+            coll.set_segments(np.split(points, bounds[1:-1]))
+            axes = self.ax[idx]
+            axes.ignore_existing_data_limits = True
+            axes.update_datalim(points[np.isfinite(y)])
+            axes.autoscale_view()
+
+
+def roi_mean_intensities(stacks, label_array, mask=None, chunk_size=100,
+                         num_workers=4, executor=None):
+    """Compute the per-ROI mean intensity of every frame of some stacks
+
+    The pixel to ROI mapping is computed once and every chunk of frames is
+    reduced with one `np.bincount`, see
+    `xray_vision.utils.binning.LabelBinner`.
+
+    Parameters
+    ----------
+    stacks : dict or list
+        The stacks of frames of each dataset, keyed by dataset name.
+        A list is keyed by position.  Arrays, memmaps and lazily loaded
+        sequences of frames all work
+    label_array : array
+        Integer array the shape of a frame, 0 is background
+    mask : array, optional
+        Boolean array, True for pixels to leave out
+    chunk_size : int, optional
+        The number of frames reduced at once
+    num_workers : int, optional
+        The number of chunks reduced concurrently
+    executor : concurrent.futures.Executor or 'process', optional
+        The pool to reduce in, defaults to a thread pool.  'process'
+        reduces in a pool of `num_workers` processes that each get the
+        pixel to ROI mapping once, see `LabelBinner.process_pool`
+
+    Returns
+    -------
+    dataframe : pd.DataFrame
+        Rows are the ROI labels, columns the datasets and every cell is the
+        1D array of the mean intensity per frame.  Pass it to
+        `mean_intensity_plotter`, or a column of it (as a list) to
+        `combine_intensity_plotter`
+    """
+    if not isinstance(stacks, dict):
+        stacks = dict(enumerate(stacks))
+    binner = LabelBinner(label_array, mask=mask)
+    own_executor = executor == 'process'
+    if own_executor:
+        executor = binner.process_pool(num_workers)
+    columns = dict()
+    try:
+        for name, stack in six.iteritems(stacks):
+            means = binner.means_stack(stack, chunk_size=chunk_size,
+                                       num_workers=num_workers,
+                                       executor=executor)
+            columns[name] = list(means.T)
+    finally:
+        if own_executor:
+            executor.shutdown()
+    return pd.DataFrame(columns, index=binner.labels,
+                        columns=list(stacks))
 
 
 def combine_intensity_plotter(ax, combine_intensity,
@@ -148,6 +241,12 @@ def combine_intensity_plotter(ax, combine_intensity,
         same length as the `combine_intensity` list. If a list is not provided,
         the default will be 'ROI #' where # is the index of the dataset in
         `combine_intensity`+1
+
+    Returns
+    -------
+    arts : MultiLine
+        List of matplotlib.lines.Line2D objects, one per ROI.  Use
+        `arts.update` to show new intensities on the same lines
     """
     num_rois = len(combine_intensity)
     if labels is None:
@@ -160,15 +259,14 @@ def combine_intensity_plotter(ax, combine_intensity,
     ax.set_ylabel(ylabel)
     ax.set_xlabel(xlabel)
     ax.set_title(title)
-    ax.legend()
     # return the artists
     return arts
 
 
-def circular_average(ax, image_data, ring_averages, bin_centers,
+def circular_average(ax, image_data, ring_averages=None, bin_centers=None,
                      im_title="Image Data", line_title="Circular Average",
                      line_xlabel="Bin Centers", line_ylabel="Ring Average",
-                     im_kw=None, line_kw=None):
+                     im_kw=None, line_kw=None, binner=None):
     """This will plot image data and circular average of the that image data
     
     Specific plot that was asked for by 11id at NSLS2.
@@ -179,8 +277,10 @@ def circular_average(ax, image_data, ring_averages, bin_centers,
         Two axes. First is for displaying the image with imshow. Second is
         for plotting the circular average with semilogy
     image_data : array
-    ring_averages : array
-    bin_centers: array
+    ring_averages : array, optional
+        Computed from `image_data` with `binner` if not given
+    bin_centers: array, optional
+        Taken from `binner` if not given
     im_title : str, optional
         title for the image data
     line_title : str, optional
@@ -193,6 +293,9 @@ def circular_average(ax, image_data, ring_averages, bin_centers,
         kwargs for the imshow axes
     line_kw : dict, optional
         kwargs for the semilogy axes
+    binner : xray_vision.utils.binning.RadialBinner, optional
+        The cached pixel to ring mapping to compute the averages with.
+        Required unless both `ring_averages` and `bin_centers` are given
     
     Returns
     -------
@@ -207,6 +310,13 @@ def circular_average(ax, image_data, ring_averages, bin_centers,
         im_kw = {}
     if line_kw is None:
         line_kw = {}
+    if binner is None and (ring_averages is None or bin_centers is None):
+        raise ValueError("Pass either both ring_averages and bin_centers, "
+                         "or a binner to compute them with")
+    if ring_averages is None:
+        ring_averages = binner(image_data)
+    if bin_centers is None:
+        bin_centers = binner.bin_centers
 
     im = ax[0].imshow(image_data, **im_kw)
     ax[0].set_title(im_title)
@@ -220,6 +330,132 @@ def circular_average(ax, image_data, ring_averages, bin_centers,
     return (im, line)
 
 
+def line_roi(start, end):
+    """The pixels along a straight line, one per row or column
+
+    Parameters
+    ----------
+    start, end : tuple
+        The (row, column) positions of the ends of the line
+
+    Returns
+    -------
+    rows, cols : array
+        The integer pixel positions along the line, from `start` to `end`
+    """
+    (r0, c0), (r1, c1) = start, end
+    num = int(np.ceil(max(abs(r1 - r0), abs(c1 - c0)))) + 1
+    rows = np.rint(np.linspace(r0, r1, num)).astype(int)
+    cols = np.rint(np.linspace(c0, c1, num)).astype(int)
+    return rows, cols
+
+
+def kymograph_from_stack(stack, roi, label=1, chunk_size=100,
+                         num_workers=4, executor=None):
+    """Build the pixels versus frame array of an ROI for `kymograph`
+
+    The pixels of the ROI are turned into one array of flat indices, which
+    is used to gather the pixels of each chunk of frames.  Chunks are
+    gathered concurrently and only a few are in memory at once, so
+    memmapped and lazily loaded stacks stream through.
+
+    Parameters
+    ----------
+    stack : array or sequence
+        The (N, rows, columns) frames.  Arrays, memmaps and lazily loaded
+        sequences of frames that support `len` and slicing all work
+    roi : array or tuple
+        Either a label array the shape of a frame, or the (rows, cols)
+        pixel positions of a line, e.g. from `line_roi`
+    label : int, optional
+        The label of the ROI, if `roi` is a label array.  Defaults to 1.
+        The pixels are in row-major order
+    chunk_size : int, optional
+        The number of frames gathered at once
+    num_workers : int, optional
+        The number of chunks gathered concurrently
+    executor : concurrent.futures.Executor, optional
+        The pool to gather in, see `xray_vision.utils.frame_stack.map_chunks`
+
+    Returns
+    -------
+    data : array
+        (N, number of pixels) array, the `data` of `kymograph`
+    """
+    if isinstance(roi, np.ndarray) and roi.ndim == 2:
+        frame_shape = roi.shape
+        flat = np.flatnonzero(roi == label)
+    else:
+        if hasattr(stack, 'shape'):
+            frame_shape = stack.shape[1:]
+        else:
+            frame_shape = np.shape(stack[0])
+        flat = np.ravel_multi_index(tuple(roi), frame_shape)
+    data = None
+    gather = partial(gather_pixels, flat=flat)
+    for start, pixels in map_chunks(gather, stack, chunk_size=chunk_size,
+                                    num_workers=num_workers,
+                                    executor=executor):
+        if data is None:
+            data = np.empty((len(stack), len(flat)), dtype=pixels.dtype)
+        data[start:start + len(pixels)] = pixels
+    if data is None:
+        data = np.empty((0, len(flat)))
+    return data
+
+
+class LiveCircularAverage(object):
+    """`circular_average` of live data
+
+    The averages of each new frame are one `np.bincount` with the cached
+    ring mapping of a `RadialBinner`, and are shown by updating the
+    artists of `circular_average` in place.
+
+    Example
+    -------
+    >>> binner = RadialBinner(frame.shape, center=(512, 498))
+    >>> live = LiveCircularAverage(ax, binner, frame)
+    >>> for frame in frames:
+    ...     live.update(frame)
+    """
+    def __init__(self, ax, binner, image_data, **kwargs):
+        """
+        Parameters
+        ----------
+        ax : tuple, list, etc.
+            Two axes, see `circular_average`
+        binner : xray_vision.utils.binning.RadialBinner
+        image_data : array
+            The first frame
+        kwargs : dict
+            Passed on to `circular_average`
+        """
+        self.ax = ax
+        self.binner = binner
+        self.im, self.line = circular_average(ax, image_data, binner=binner,
+                                              **kwargs)
+
+    def update(self, image_data):
+        """
+        Show a new frame and its circular average
+
+        Parameters
+        ----------
+        image_data : array
+
+        Returns
+        -------
+        ring_averages : array
+        """
+        ring_averages = self.binner(image_data)
+        self.im.set_data(image_data)
+        self.line.set_ydata(ring_averages)
+        self.ax[1].relim()
+        self.ax[1].autoscale_view()
+        self.ax[1].figure.canvas.draw_idle()
+        return ring_averages
+
+
 def kymograph(ax, data, title="Kymograph", xlabel="Pixel",
               ylabel="Frame", fps=None, frame_offset=0, **im_kw):
     """Plot the array of pixels (x, col) versus frame (y, row[kymograph_datay])
@@ -277,6 +513,190 @@ def kymograph(ax, data, title="Kymograph", xlabel="Pixel",
     return im, cb
 
 
+class LiveKymograph(object):
+    """A kymograph of live data that scrolls as new frames arrive
+
+    The rows are written into a preallocated circular buffer of the last
+    `num_frames` frames.  The buffer holds two copies of every row so that
+    the rows in time order are always a contiguous view of it.  Each update
+    calls `set_data` on the one image, rolls its extent and the time axis
+    and, when the canvas supports it, blits only the image and the y axis.
+    No artists or colorbars are created after `__init__`.
+
+    The color scale is set by the first rows appended (or by `vmin` /
+    `vmax` / `norm`); call `autoscale` to rescale it to the buffer.
+
+    Example
+    -------
+    >>> kymo = LiveKymograph(ax, num_pixels=200, num_frames=500, fps=100)
+    >>> for frame in frames:
+    ...     kymo.append(frame[line_roi])
+    """
+    def __init__(self, ax, num_pixels, num_frames, title="Kymograph",
+                 xlabel="Pixel", ylabel="Frame", fps=None, frame_offset=0,
+                 colorbar=True, **im_kw):
+        """
+        Parameters
+        ----------
+        ax : Axes
+            The matplotlib `Axes` object that the kymograph is added to
+        num_pixels : int
+            The length of a row
+        num_frames : int
+            The number of frames to show
+        title : str, optional
+            title of the plot
+        xlabel : str, optional
+            x axis label of the plot
+        ylabel : str, optional
+            y axis label, replaced by 'Time (s)' if `fps` is given
+        fps : float, optional
+            Convert frame number to seconds and display time on the y-axis
+        frame_offset : int, optional
+            This is the frame number to start counting from
+        colorbar : bool, optional
+            Add a colorbar.  Defaults to True
+        im_kw : dict
+            kwargs to be passed to matplotlib's imshow function
+        """
+        self.ax = ax
+        self.canvas = ax.figure.canvas
+        self.num_frames = int(num_frames)
+        self.fps = fps
+        self.frame_offset = frame_offset
+        # the number of frames appended so far
+        self.frame_count = 0
+        # every row is stored at i and i + num_frames, unfilled rows are
+        # NaN so that they are not drawn
+        self._buffer = np.full((2 * self.num_frames, num_pixels), np.nan)
+        self._origin = im_kw.pop('origin', None) or \
+            plt.rcParams['image.origin']
+        # the buffer starts out all NaN, so without explicit limits the
+        # colors are scaled to the first rows appended
+        self._autoscale_pending = not any(
+            im_kw.get(key) is not None for key in ('vmin', 'vmax', 'norm'))
+
+        self.im = ax.imshow(self.data, origin=self._origin,
+                            extent=self._extent(), **im_kw)
+        if fps is not None:
+            ylabel = 'Time (s)'
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.set_title(title)
+        ax.set_aspect('auto')
+        self.cb = None
+        if colorbar:
+            self.cb = ax.figure.colorbar(self.im, ax=ax)
+
+        # the image and the time axis are redrawn on every update, on top
+        # of a cached background
+        self.im.set_animated(True)
+        ax.yaxis.set_animated(True)
+        self._background = None
+        self._blit_bbox = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    @property
+    def data(self):
+        """
+        The rows shown, oldest first, as a view of the buffer
+        """
+        start = 0
+        if self.frame_count > self.num_frames:
+            start = self.frame_count % self.num_frames
+        return self._buffer[start:start + self.num_frames]
+
+    @property
+    def first_frame(self):
+        """
+        The frame number of the first row shown
+        """
+        return max(self.frame_count - self.num_frames, 0)
+
+    def _extent(self):
+        first = self.first_frame + self.frame_offset
+        y0, y1 = first, first + self.num_frames
+        if self.fps is not None:
+            y0, y1 = y0 / self.fps, y1 / self.fps
+        if self._origin == 'upper':
+            # the oldest row is at the top
+            y0, y1 = y1, y0
+        return (0, self._buffer.shape[1], y0, y1)
+
+    def append(self, rows):
+        """
+        Add the rows of one or more new frames
+
+        Parameters
+        ----------
+        rows : array
+            A row of `num_pixels` values, or a (N, num_pixels) array of
+            rows
+        """
+        rows = np.atleast_2d(rows)
+        count = len(rows)
+        if count == 0:
+            return
+        # only the newest rows fit, but all of them count as frames
+        kept = rows[-self.num_frames:]
+        first = self.frame_count + count - len(kept)
+        idx = (first + np.arange(len(kept))) % self.num_frames
+        self._buffer[idx] = kept
+        self._buffer[idx + self.num_frames] = kept
+        self.frame_count += count
+
+        self.im.set_data(self.data)
+        extent = self._extent()
+        self.im.set_extent(extent)
+        self.ax.set_ylim(extent[2:])
+        if self._autoscale_pending:
+            self._autoscale_pending = False
+            # the colorbar changes too, so redraw everything
+            self.autoscale()
+            return
+        self._blit()
+
+    def autoscale(self):
+        """
+        Rescale the colors to the rows in the buffer and redraw
+        """
+        self.im.autoscale()
+        self.canvas.draw_idle()
+
+    def _on_draw(self, event):
+        """
+        Grab the background without the image and the y axis for blitting
+        and then draw them on top of it
+        """
+        if event.canvas.is_saving():
+            # animated artists are drawn when saving
+            return
+        renderer = event.renderer
+        if event.canvas is self.canvas and self.canvas.supports_blit:
+            # leave room for tick labels that get a little wider
+            pad = 10
+            bbox = Bbox.union([self.ax.bbox,
+                               self.ax.yaxis.get_tightbbox(renderer)])
+            self._blit_bbox = Bbox.intersection(
+                Bbox.from_extents(np.floor(bbox.x0 - pad),
+                                  np.floor(bbox.y0 - pad),
+                                  np.ceil(bbox.x1 + pad),
+                                  np.ceil(bbox.y1 + pad)),
+                self.ax.figure.bbox)
+            self._background = self.canvas.copy_from_bbox(self._blit_bbox)
+        self.im.draw(renderer)
+        self.ax.yaxis.draw(renderer)
+
+    def _blit(self):
+        if self._background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        self.ax.draw_artist(self.im)
+        self.ax.draw_artist(self.ax.yaxis)
+        self.canvas.blit(self._blit_bbox)
+
+
 def rois_as_lines(ax, data, title='Intensities - ROI ', xlabel='pixels',
                   ylabel='Intensity', labels=None):
     """Plot each entry in 'data' in its own matplotlib line plot
@@ -300,9 +720,9 @@ def rois_as_lines(ax, data, title='Intensities - ROI ', xlabel='pixels',
     
     Returns
     -------
-    arts : list
+    arts : MultiLine
         List of matplotlib.lines.Line2D objects that can be used for further manipulation
-        of the plots
+        of the plots.  Use `arts.update` to show new data on the same lines
     """
     num_rois = len(data)
     # set the title on the first axes
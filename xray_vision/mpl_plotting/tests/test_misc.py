@@ -0,0 +1,133 @@
+import matplotlib
+matplotlib.use('Agg')
+from xray_vision.mpl_plotting import misc
+from nose.tools import raises
+import matplotlib.pyplot as plt
+import numpy as np
+from collections import OrderedDict
+
+
+def _expected_segments(data, xmin, xmax, delta_y=3):
+    """one (x0, x1, y, state) row per segment, line by line"""
+    rows = []
+    for j, edges in enumerate(data.values()):
+        x = np.r_[xmin, np.ravel(edges), xmax]
+        for k in range(len(x) - 1):
+            rows.append((x[k], x[k + 1], (j + 1) * delta_y, k % 2))
+    return np.array(rows)
+
+
+def _segments(lines):
+    segs = np.array(lines.collection.get_segments())
+    return np.column_stack([segs[:, 0, 0], segs[:, 1, 0], segs[:, 0, 1],
+                            lines.collection.get_array()])
+
+
+def test_binary_state_lines():
+    data = OrderedDict()
+    for j in range(50):
+        data['data {:02d}'.format(j)] = np.cumsum(
+            np.random.randint(1, 10, 2 * (j % 5))).reshape(-1, 2)
+    fig, ax = plt.subplots()
+    lines = misc.binary_state_lines(ax, data, xmin=0, xmax=120)
+    # one collection for all of the lines
+    assert len(ax.collections) == 1
+    np.testing.assert_array_equal(_segments(lines),
+                                  _expected_segments(data, 0, 120))
+    assert [t.get_text() for t in ax.get_yticklabels()] == list(data)
+
+    # live updates
+    lines.append_edges({'data 03': [70], 'data 00': [80, 90, 100],
+                        'new': [5, 6]})
+    data['data 03'] = np.r_[np.ravel(data['data 03']), 70]
+    data['data 00'] = [80, 90, 100]
+    data['new'] = [5, 6]
+    np.testing.assert_array_equal(_segments(lines),
+                                  _expected_segments(data, 0, 120))
+    lines.set_xmax(200)
+    np.testing.assert_array_equal(_segments(lines),
+                                  _expected_segments(data, 0, 200))
+    assert ax.get_ylim() == (156, 0)
+    assert len(ax.collections) == 1
+    fig.canvas.draw()
+
+    # edges for every line at once, in any order, including empty ones
+    update = OrderedDict()
+    for j, label in enumerate(reversed(list(data))):
+        update[label] = 200 + np.arange(j % 3)
+    update['newer'] = []
+    lines.append_edges(update)
+    for label, edges in update.items():
+        data[label] = np.r_[np.ravel(data.get(label, [])), edges]
+    np.testing.assert_array_equal(_segments(lines),
+                                  _expected_segments(data, 0, 200))
+
+
+def test_split_plot():
+    fig, ax = plt.subplots()
+    x = np.linspace(0, 10, 101)
+    y = np.sin(x)
+    styles = [{'color': 'r'}, {'c': 'g', 'lw': 3}, {'color': 'b'},
+              {'color': 'k', 'ls': '--'}]
+    line = misc.SplitLine(ax, x, y, [2, 5, 7], styles)
+    assert len(ax.collections) == 1
+    segs = line.collection.get_segments()
+    assert len(segs) == 100
+    mid = (x[:-1] + x[1:]) / 2
+    expected = np.select([mid < 2, mid < 5, mid < 7], [0, 1, 2], 3)
+    colors = matplotlib.colors.to_rgba_array(['r', 'g', 'b', 'k'])
+    np.testing.assert_array_equal(line.collection.get_colors(),
+                                  colors[expected])
+    np.testing.assert_array_equal(line.collection.get_linewidths()[:30],
+                                  np.where(expected[:30] == 1, 3, 1.5))
+
+    # new data and thresholds reuse the artist
+    line.update(y=2 * y, thresholds=[1, 2, 3])
+    assert len(ax.collections) == 1
+    expected = np.select([mid < 1, mid < 2, mid < 3], [0, 1, 2], 3)
+    np.testing.assert_array_equal(line.collection.get_colors(),
+                                  colors[expected])
+    assert ax.get_ylim()[1] >= 2 * y.max()
+
+    # a bad update leaves the line as it was
+    try:
+        line.update(x=x[:-1])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("x and y of different lengths")
+    assert len(line.x) == len(line.y) == len(x)
+
+    # the low/high form, positional or by keyword
+    line = misc.split_plot(ax, x, y, 2, 5, {'color': 'g'}, {'color': 'r'})
+    np.testing.assert_array_equal(line.thresholds, [2, 5])
+    line = misc.split_plot(ax, x, y, low=2, high=5, inner_style={'c': 'g'},
+                           outer_style={})
+    colors = matplotlib.colors.to_rgba_array(
+        ['g', matplotlib.rcParams['axes.prop_cycle'].by_key()['color'][0]])
+    expected = ((mid >= 2) & (mid < 5)).astype(int)
+    np.testing.assert_array_equal(line.collection.get_colors(),
+                                  colors[1 - expected])
+    fig.canvas.draw()
+
+    # whole line keys are applied, marker keys are dropped
+    line = misc.split_plot(ax, x, y, 2, 5,
+                           {'color': 'g', 'marker': 'o', 'label': 'roi'},
+                           {'color': 'r', 'ms': 3, 'zorder': 5})
+    assert line.collection.get_label() == 'roi'
+    assert line.collection.get_zorder() == 5
+    ax.legend()
+    fig.canvas.draw()
+
+
+@raises(ValueError)
+def test_split_plot_shared_conflict():
+    fig, ax = plt.subplots()
+    misc.SplitLine(ax, [0, 1, 2], [0, 1, 0], [1],
+                   [{'label': 'a'}, {'label': 'b'}])
+
+
+@raises(ValueError)
+def test_split_plot_unknown_key():
+    fig, ax = plt.subplots()
+    misc.SplitLine(ax, [0, 1, 2], [0, 1, 0], [1], [{}, {'spam': 1}])
@@ -32,3 +32,220 @@ def test_kymograph_plotter():
     assert extent[1] == data.shape[1]
     assert extent[2] == frame_offset / fps
     assert extent[3] == (frame_offset + data.shape[0]) / fps
+
+
+def test_live_kymograph():
+    fig, ax = plt.subplots()
+    kymo = speckle.LiveKymograph(ax, num_pixels=30, num_frames=20, fps=10,
+                                 frame_offset=5, vmin=0, vmax=1)
+    fig.canvas.draw()
+    num_artists = len(ax.get_children()) + len(fig.axes)
+
+    rows = np.random.random((55, 30))
+    kymo.append(rows[0])
+    # unfilled rows are not drawn
+    assert kymo.im.get_array().mask[1:].all()
+    kymo.append(rows[1:7])
+    for i in range(7, 55):
+        kymo.append(rows[i])
+        # the oldest row is at the top and the time axis rolls
+        expected = np.full((20, 30), np.nan)
+        shown = rows[max(i - 19, 0):i + 1]
+        expected[:len(shown)] = shown
+        np.testing.assert_array_equal(
+            np.ma.filled(kymo.im.get_array(), np.nan), expected)
+    np.testing.assert_array_equal(kymo.data, rows[-20:])
+    assert kymo.frame_count == 55
+    assert kymo.im.get_extent() == [0, 30, (5 + 55) / 10, (5 + 35) / 10]
+    assert ax.get_ylim() == ((5 + 55) / 10, (5 + 35) / 10)
+    assert len(ax.get_children()) + len(fig.axes) == num_artists
+
+    # the blitted canvas matches a full redraw
+    blitted = np.asarray(fig.canvas.buffer_rgba()).copy()
+    fig.canvas.draw()
+    np.testing.assert_array_equal(blitted,
+                                  np.asarray(fig.canvas.buffer_rgba()))
+
+    # more rows than fit in the buffer
+    kymo.append(rows)
+    np.testing.assert_array_equal(kymo.data, rows[-20:])
+    assert kymo.frame_count == 110
+
+
+def test_live_kymograph_overflow():
+    fig, ax = plt.subplots()
+    kymo = speckle.LiveKymograph(ax, num_pixels=4, num_frames=10)
+    rows = np.arange(28 * 4, dtype=float).reshape(28, 4)
+    kymo.append(rows[:3])
+    # the colors are scaled to the first rows, not the empty buffer
+    assert kymo.im.get_clim() == (rows[:3].min(), rows[:3].max())
+    # only the last 10 rows fit, but every row counts
+    kymo.append(rows[3:])
+    assert kymo.frame_count == 28
+    assert kymo.first_frame == 18
+    np.testing.assert_array_equal(kymo.data, rows[-10:])
+    assert kymo.im.get_extent() == [0, 4, 28, 18]
+    kymo.append(rows[0])
+    np.testing.assert_array_equal(kymo.data[-1], rows[0])
+    np.testing.assert_array_equal(kymo.data[:-1], rows[-9:])
+    # the color scale is only set once
+    assert kymo.im.get_clim() == (rows[:3].min(), rows[:3].max())
+
+
+def test_kymograph_from_stack():
+    import os
+    import tempfile
+    stack = np.random.randint(0, 1000, size=(53, 20, 30)).astype(np.uint16)
+    rows, cols = speckle.line_roi((2, 3), (15, 27))
+    assert len(rows) == 25
+    expected = stack[:, rows, cols]
+    data = speckle.kymograph_from_stack(stack, (rows, cols), chunk_size=10)
+    np.testing.assert_array_equal(data, expected)
+    assert data.dtype == stack.dtype
+
+    labels = np.zeros((20, 30), dtype=int)
+    labels[5:8, 10:20] = 2
+    expected = stack[:, labels == 2]
+    # memmapped stacks
+    fname = os.path.join(tempfile.mkdtemp(), 'stack.npy')
+    np.save(fname, stack)
+    data = speckle.kymograph_from_stack(np.load(fname, mmap_mode='r'),
+                                        labels, label=2, chunk_size=7)
+    np.testing.assert_array_equal(data, expected)
+    # lazily loaded sequences of frames, in the calling thread
+    data = speckle.kymograph_from_stack(list(stack), labels, label=2,
+                                        num_workers=1)
+    np.testing.assert_array_equal(data, expected)
+
+
+def test_circular_average_binner():
+    from xray_vision.utils.binning import RadialBinner
+    shape = (40, 50)
+    center = (18.5, 22)
+    mask = np.zeros(shape, dtype=bool)
+    mask[:3] = True
+    binner = RadialBinner(shape, center, num_bins=10, mask=mask)
+
+    stack = np.random.random((23,) + shape)
+    rows, cols = np.mgrid[:shape[0], :shape[1]]
+    radius = np.hypot(rows - center[0], cols - center[1])
+    ring = np.minimum((radius / radius.max() * 10).astype(int), 9)
+    expected = np.array([[frame[(ring == i) & ~mask].mean()
+                          for i in range(10)] for frame in stack])
+    np.testing.assert_allclose(binner(stack[0]), expected[0])
+    np.testing.assert_allclose(binner.means_stack(stack, chunk_size=5),
+                               expected)
+    np.testing.assert_allclose(binner.sums_stack(list(stack), num_workers=1),
+                               expected * binner.counts)
+
+    fig, ax = plt.subplots(ncols=2)
+    im, line = speckle.circular_average(ax, stack[0], binner=binner)
+    np.testing.assert_allclose(line.get_ydata(), expected[0])
+    np.testing.assert_allclose(line.get_xdata(), binner.bin_centers)
+
+    live = speckle.LiveCircularAverage(ax, binner, stack[0])
+    live.update(stack[1])
+    np.testing.assert_allclose(live.line.get_ydata(), expected[1])
+
+
+@raises(ValueError)
+def test_circular_average_no_binner():
+    fig, ax = plt.subplots(ncols=2)
+    speckle.circular_average(ax, np.random.random((10, 10)))
+
+
+def test_binner_process_pool():
+    from xray_vision.utils import binning
+    labels = np.zeros((20, 30), dtype=int)
+    labels[2:5, 3:10] = 1
+    labels[10:18, 20:25] = 2
+    stack = np.random.random((23, 20, 30))
+    binner = binning.LabelBinner(labels)
+    expected = binner.sums_stack(stack, chunk_size=5)
+    with binner.process_pool(2) as executor:
+        # only the key of the binner is sent along with each chunk
+        submitted = []
+        submit = executor.submit
+
+        def spy(func, *args):
+            submitted.append(func)
+            return submit(func, *args)
+        executor.submit = spy
+        sums = binner.sums_stack(stack, chunk_size=5, executor=executor)
+    np.testing.assert_allclose(sums, expected)
+    assert len(submitted) == 5
+    assert all(func.func is binning._installed_chunk_sums and
+               func.args == (binner._key,) for func in submitted)
+
+
+def test_mean_intensity_plotter():
+    import pandas as pd
+    lengths = [10, 20, 15]
+    rois = ['roi %d' % i for i in range(4)]
+    datasets = ['set %d' % i for i in range(3)]
+
+    def make_df():
+        return pd.DataFrame(
+            dict((d, [np.random.random(n) for _ in rois])
+                 for d, n in zip(datasets, lengths)), index=rois)
+    df = make_df()
+    fig, ax = plt.subplots(nrows=len(rois))
+    plot = speckle.mean_intensity_plotter(ax, df)
+    assert list(plot.collections.index) == rois
+
+    def check(df):
+        for axes, roi in zip(ax, rois):
+            # one collection per axes, one path per dataset
+            assert len(axes.collections) == 1
+            assert len(axes.lines) == 0
+            segs = plot.collections[roi].get_segments()
+            start = 0
+            for seg, d, n in zip(segs, datasets, lengths):
+                np.testing.assert_array_equal(seg[:, 0],
+                                              np.arange(start, start + n))
+                np.testing.assert_array_equal(seg[:, 1], df.loc[roi, d])
+                start += n
+    check(df)
+    assert [t.get_text() for t in ax[0].get_legend().get_texts()] == \
+        datasets
+
+    df = make_df() * 10
+    plot.update(df)
+    check(df)
+    assert ax[0].get_ylim()[1] > 5
+    fig.canvas.draw()
+
+
+def test_roi_mean_intensities():
+    from concurrent.futures import ProcessPoolExecutor
+    labels = np.zeros((20, 30), dtype=int)
+    labels[2:5, 3:10] = 1
+    labels[10:18, 20:25] = 7
+    labels[0, :] = 3
+    stacks = {'a': np.random.random((31, 20, 30)),
+              'b': np.random.random((12, 20, 30))}
+    df = speckle.roi_mean_intensities(stacks, labels, chunk_size=5)
+    assert list(df.index) == [1, 3, 7]
+    assert list(df.columns) == ['a', 'b']
+    for name, stack in stacks.items():
+        for label in df.index:
+            np.testing.assert_allclose(df.loc[label, name],
+                                       stack[:, labels == label].mean(axis=1))
+
+    with ProcessPoolExecutor(2) as executor:
+        df2 = speckle.roi_mean_intensities([stacks['b']], labels,
+                                           chunk_size=5, executor=executor)
+    for label in df.index:
+        np.testing.assert_allclose(df2.loc[label, 0], df.loc[label, 'b'])
+    df3 = speckle.roi_mean_intensities(stacks, labels, chunk_size=5,
+                                       num_workers=2, executor='process')
+    for label in df.index:
+        for name in stacks:
+            np.testing.assert_allclose(df3.loc[label, name],
+                                       df.loc[label, name])
+
+    # the results plug into the plotters
+    fig, ax = plt.subplots(nrows=3)
+    speckle.mean_intensity_plotter(ax, df)
+    fig, ax = plt.subplots()
+    speckle.combine_intensity_plotter(ax, list(df['a']))
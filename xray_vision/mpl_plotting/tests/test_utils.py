@@ -26,4 +26,30 @@ def test_multiline():
     ]
     
     for f in fails:
-        yield _multiline_fail, [ax], [f['data']], [f['labels']]
+        _multiline_fail([ax], [f['data']], [f['labels']])
+
+
+def test_multiline_update():
+    fig, axes = plt.subplots(nrows=2)
+    data = [np.random.random(50), np.random.random((2, 30)),
+            np.random.random((40, 2))]
+    arts = utils.multiline([axes[0], axes[0], axes[1]], data,
+                           ['a', 'b', 'c'], xlabels='x', ylabels=['y'] * 3)
+    assert arts.axes == list(axes)
+    assert axes[0].get_xlabel() == 'x'
+    legend = axes[0].get_legend()
+    assert [t.get_text() for t in legend.get_texts()] == ['a', 'b']
+
+    # update some of the lines in place
+    arts.update({0: 10 * np.random.random(60), 2: np.random.random((2, 5))})
+    assert len(axes[0].lines) == 2 and len(axes[1].lines) == 1
+    assert axes[0].get_legend() is legend
+    np.testing.assert_array_equal(arts[0].get_xdata(), np.arange(60))
+    assert axes[0].get_ylim()[1] >= arts[0].get_ydata().max()
+    assert axes[0].get_xlim()[1] >= 59
+    np.testing.assert_array_equal(arts[1].get_ydata(), data[1][1])
+
+    # limits only shrink when asked to
+    arts.update([np.zeros(5), np.zeros((2, 5)), np.zeros((2, 5))],
+                shrink=True)
+    assert axes[0].get_xlim()[1] < 10
@@ -23,48 +23,103 @@ def multiline(ax, data, labels, line_kw=None, xlabels=None, ylabels=None):
         Same as `xlabels`.
     Returns
     -------
-    arts : list
-        Dictionary of matplotlib.lines.Line2D objects. These objects can be
-        used for further manipulation of the plot
+    arts : MultiLine
+        List of matplotlib.lines.Line2D objects. These objects can be
+        used for further manipulation of the plot.  Use `arts.update` to
+        show new data on the same lines
     """
     if line_kw is None:
         line_kw = {}
-    arts = []
     # handle the xlabels
     if xlabels is None:
         xlabels = [''] * len(data)
     if ylabels is None:
         ylabels = [''] * len(data)
     if isinstance(xlabels, str):
-        xlabels = [xlabel] * len(data)
+        xlabels = [xlabels] * len(data)
     if isinstance(ylabels, str):
-        ylabels = [ylabel] * len(data)
-        
-    def to_xy(d, label):
-        shape = d.shape
-        if len(shape) == 1:
-            return range(len(d)), d
-        elif len(shape) == 2:
-            if shape[0] == 1:
-                return range(len(d)), d[:, 1]
-            elif shape[1] == 1:
-                return range(len(d)), d[0]
-            elif shape[0] == 2:
-                return d[0], d[1]
-            elif shape[1] == 2:
-                return d[:, 0], d[:, 1]
-                
-        raise ValueError('data set "%s" has a shape I do not '
-                         'understand. Expecting shape (N), (Nx1), '
-                         '(1xN), (Nx2) or (2xN). I got %s' % (label, shape))
-                
+        ylabels = [ylabels] * len(data)
+
+    arts = MultiLine()
     for ax, d, label, xlabel, ylabel in zip(ax, data, labels, xlabels, ylabels):
-        d = np.asarray(d)
-        x, y = to_xy(d, label)
+        x, y = _to_xy(d, label)
         
         art, = ax.plot(x, y, label=label, **line_kw)
         arts.append(art)
         ax.set_xlabel(xlabel)
         ax.set_ylabel(ylabel)
+    # one legend per axes, once all of its lines are there
+    for ax in arts.axes:
         ax.legend()
     return arts
+
+
+class MultiLine(list):
+    """The lines drawn by `multiline`
+
+    A list of the Line2D artists that can show new data for some or all of
+    the lines without creating artists or legends.
+    """
+    @property
+    def axes(self):
+        """The distinct axes of the lines, in order"""
+        axes = []
+        for art in self:
+            if art.axes not in axes:
+                axes.append(art.axes)
+        return axes
+
+    def update(self, data, shrink=False):
+        """
+        Show new data
+
+        Parameters
+        ----------
+        data : list or dict
+            New data for every line, or a dict of new data keyed by the
+            index of the line.  Same shapes as the data of `multiline`
+        shrink : bool, optional
+            Let the axes limits shrink to the new data, which rescans all
+            of the lines of the updated axes.  By default the limits only
+            grow to fit the new data, which only looks at the new data
+        """
+        if not isinstance(data, dict):
+            data = dict(enumerate(data))
+        touched = []
+        for idx, d in data.items():
+            art = self[idx]
+            x, y = _to_xy(d, art.get_label())
+            art.set_data(x, y)
+            ax = art.axes
+            if ax not in touched:
+                touched.append(ax)
+            if not shrink:
+                xy = np.column_stack([x, y]).astype(float)
+                ax.update_datalim(xy[np.isfinite(xy).all(axis=1)])
+        for ax in touched:
+            if shrink:
+                ax.relim()
+            ax.autoscale_view()
+        if touched:
+            touched[0].figure.canvas.draw_idle()
+
+
+def _to_xy(d, label):
+    """Split the data of one line of `multiline` into x and y"""
+    d = np.asarray(d)
+    shape = d.shape
+    if len(shape) == 1:
+        return np.arange(len(d)), d
+    elif len(shape) == 2:
+        if shape[0] == 1:
+            return np.arange(shape[1]), d[0]
+        elif shape[1] == 1:
+            return np.arange(shape[0]), d[:, 0]
+        elif shape[0] == 2:
+            return d[0], d[1]
+        elif shape[1] == 2:
+            return d[:, 0], d[:, 1]
+
+    raise ValueError('data set "%s" has a shape I do not '
+                     'understand. Expecting shape (N), (Nx1), '
+                     '(1xN), (Nx2) or (2xN). I got %s' % (label, shape))
@@ -35,6 +35,7 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 import six
+import threading
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -45,8 +46,38 @@ logger = logging.getLogger(__name__)
 class CDIPlotter(object):
     """
     This class plots results from CDI reconstruction.
+
+    By default `plot` draws before it returns.  After `start_async`, `plot`
+    only hands the newest state to a worker thread that computes the
+    amplitude and phase, and a canvas timer shows the newest result at most
+    `max_fps` times a second on the GUI thread.  States that arrive in
+    between are dropped, so plotting does not slow the reconstruction down.
+    The timer only fires while the GUI event loop runs, so run the
+    reconstruction in its own thread.
+
+    Example
+    -------
+    >>> plotter = CDIPlotter.create_figure()
+    >>> plotter.start_async(max_fps=5)
+    >>> def reconstruct():
+    ...     for obj, obj_err, diff_err, sup_err in reconstruction:
+    ...         plotter.plot(obj, obj_err, diff_err, sup_err)
+    >>> threading.Thread(target=reconstruct).start()
+    >>> plt.show()
     """
 
+    def __init__(self):
+        self.im0 = None
+        self.im1 = None
+        self.line1 = None
+        self.line2 = None
+        self.line3 = None
+        self._worker = None
+        self._timer = None
+        # the number of states drawn and dropped in asynchronous mode
+        self.rendered = 0
+        self.dropped = 0
+
     @classmethod
     def from_axes(cls, ax0, ax1, ax2, ax3):
         """
@@ -115,6 +146,11 @@ class CDIPlotter(object):
         """
         Update plotting results.
 
+        In asynchronous mode (see `start_async`) the arguments are copied
+        and handed to the worker thread, replacing any state it has not
+        started on yet, and this returns right away.  It may then be
+        called from any thread.
+
         Parameters
         ----------
         sample_obj : array
@@ -127,24 +163,148 @@ class CDIPlotter(object):
         sup_error : array
             stores the size of the sample support.
         """
-        try:
-            self.im0.set_data(np.abs(sample_obj))
-            self.im0.set_data(np.abs(sample_obj))
-            self.im1.set_data(np.angle(sample_obj))
-            self.line1.set_ydata(obj_error)
-            self.line2.set_ydata(diff_error)
-            self.line3.set_ydata(sup_error)
-        except AttributeError:
-            # will only be raised the first time
-            self.im0 = self.ax0.imshow(np.abs(sample_obj))
-            self.im1 = self.ax1.imshow(np.angle(sample_obj))
+        if self._worker is None:
+            self._apply(*self._compute(sample_obj, obj_error, diff_error,
+                                       sup_error))
+            for fig in self.figures:
+                fig.canvas.draw()
+            return
+        # copy, the reconstruction may keep working on these in place
+        state = tuple(np.array(arg, copy=True) for arg in
+                      (sample_obj, obj_error, diff_error, sup_error))
+        with self._cond:
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = state
+            self._cond.notify_all()
+
+    def start_async(self, max_fps=10):
+        """
+        Make `plot` asynchronous, see the class docstring
+
+        A worker thread computes the amplitude and phase of the newest
+        state handed to `plot`, and a timer of the canvas shows the newest
+        computed state at most `max_fps` times a second.  All matplotlib
+        calls happen in the timer callback, on the GUI thread, so the GUI
+        event loop has to be running: run the reconstruction in another
+        thread, or call `flush` from the loop that owns the GUI.
+
+        Parameters
+        ----------
+        max_fps : float, optional
+            The maximum number of redraws per second.  Defaults to 10
+        """
+        if self._worker is not None:
+            return
+        self._pending = None
+        self._ready = None
+        self._busy = False
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._worker = threading.Thread(target=self._compute_loop,
+                                        name='CDIPlotter compute')
+        self._worker.daemon = True
+        self._worker.start()
+        canvas = next(iter(self.figures)).canvas
+        self._timer = canvas.new_timer(interval=int(1000 / max_fps))
+        self._timer.add_callback(self._on_timer)
+        self._timer.start()
+
+    def flush(self):
+        """
+        Wait for the worker to finish the newest state and show it.  Call
+        from the GUI thread
+        """
+        if self._worker is None:
+            return
+        with self._cond:
+            while self._pending is not None or self._busy:
+                self._cond.wait()
+        self._on_timer()
+
+    def stop_async(self):
+        """
+        Show the last state handed to `plot`, stop the worker and the timer
+        and go back to drawing in `plot`.  Call from the GUI thread
+        """
+        if self._worker is None:
+            return
+        self.flush()
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._worker.join()
+        self._worker = None
+        self._timer.stop()
+        self._timer = None
+
+    def _compute_loop(self):
+        """
+        Turn the newest state from `plot` into what is shown, in the worker
+        thread.  No matplotlib calls are made here
+        """
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopping:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                state, self._pending = self._pending, None
+                self._busy = True
+            try:
+                computed = self._compute(*state)
+            except Exception:
+                logger.exception("CDIPlotter failed to process a state")
+                computed = None
+            with self._cond:
+                if computed is not None:
+                    if self._ready is not None:
+                        self.dropped += 1
+                    self._ready = computed
+                self._busy = False
+                self._cond.notify_all()
+
+    def _on_timer(self):
+        """
+        Show the newest computed state, on the GUI thread
+        """
+        with self._cond:
+            computed, self._ready = self._ready, None
+        if computed is None:
+            return
+        self._apply(*computed)
+        self.rendered += 1
+        for fig in self.figures:
+            fig.canvas.draw_idle()
+
+    @staticmethod
+    def _compute(sample_obj, obj_error, diff_error, sup_error):
+        """
+        The arrays to show, see `_apply`
+        """
+        return (np.abs(sample_obj), np.angle(sample_obj), obj_error,
+                diff_error, sup_error)
+
+    def _apply(self, amplitude, phase, obj_error, diff_error, sup_error):
+        """
+        Update the artists, creating them the first time
+        """
+        if self.im0 is None:
+            self.im0 = self.ax0.imshow(amplitude)
+            self.im1 = self.ax1.imshow(phase)
             self.line1, = self.ax2.plot(obj_error, 'r-', label='Object error')
             self.line2, = self.ax2.plot(diff_error, 'g-', label='Diffraction error')
-            self.ax3.set_ylim([0, np.size(sample_obj)])
-            self.line3, = self.ax3.plot(sup_error)
             self.ax2.legend()
-            self.ax3.set_ylim([0, np.size(sample_obj)])
+            self.ax3.set_ylim([0, np.size(amplitude)])
             self.line3, = self.ax3.plot(sup_error)
-        finally:
-            for fig in self.figures:
-                fig.canvas.draw()
+            return
+        self.im0.set_data(amplitude)
+        self.im1.set_data(phase)
+        # the errors grow by one every iteration
+        for line, err in ((self.line1, obj_error),
+                          (self.line2, diff_error),
+                          (self.line3, sup_error)):
+            line.set_data(np.arange(len(err)), err)
+        for ax in (self.ax2, self.ax3):
+            ax.relim()
+            ax.autoscale_view(scaley=False)
@@ -0,0 +1,51 @@
+import matplotlib
+matplotlib.use('Agg')
+from xray_vision.plotter import CDIPlotter
+import numpy as np
+
+
+def _state(i, shape=(64, 64)):
+    obj = np.exp(1j * i * np.ones(shape)) * (i + 1)
+    errors = np.linspace(1, .1, i + 1)
+    return obj, errors, errors / 2, np.full(i + 1, 100.)
+
+
+def test_cdi_plotter():
+    plotter = CDIPlotter.create_figure()
+    for i in range(3):
+        plotter.plot(*_state(i))
+    np.testing.assert_allclose(plotter.im0.get_array(), 3)
+    assert len(plotter.line1.get_xdata()) == 3
+
+
+def test_cdi_plotter_async():
+    plotter = CDIPlotter.create_figure()
+    plotter.start_async(max_fps=20)
+    assert plotter._timer.interval == 50
+
+    # the worker only computes, the artists are made when the timer fires
+    plotter.plot(*_state(0))
+    with plotter._cond:
+        while plotter._ready is None:
+            plotter._cond.wait()
+    assert plotter.im0 is None
+    plotter._on_timer()
+    np.testing.assert_allclose(plotter.im0.get_array(), 1)
+    assert plotter.rendered == 1
+
+    num = 200
+    for i in range(1, num):
+        obj, obj_err, diff_err, sup_err = _state(i)
+        plotter.plot(obj, obj_err, diff_err, sup_err)
+        # the plotter keeps a copy
+        obj[...] = 0
+    plotter.stop_async()
+    # the Agg timer never fires, so only the last state was shown
+    assert plotter.rendered == 2
+    assert plotter.rendered + plotter.dropped == num
+    np.testing.assert_allclose(plotter.im0.get_array(), num)
+    np.testing.assert_allclose(plotter.line1.get_ydata(), _state(num - 1)[1])
+
+    # back to drawing synchronously
+    plotter.plot(*_state(1))
+    np.testing.assert_allclose(plotter.im0.get_array(), 2)
@@ -0,0 +1,310 @@
+# ######################################################################
+# Copyright (c) 2014, Brookhaven Science Associates, Brookhaven        #
+# National Laboratory. All rights reserved.                            #
+#                                                                      #
+# Redistribution and use in source and binary forms, with or without   #
+# modification, are permitted provided that the following conditions   #
+# are met:                                                             #
+#                                                                      #
+# * Redistributions of source code must retain the above copyright     #
+#   notice, this list of conditions and the following disclaimer.      #
+#                                                                      #
+# * Redistributions in binary form must reproduce the above copyright  #
+#   notice this list of conditions and the following disclaimer in     #
+#   the documentation and/or other materials provided with the         #
+#   distribution.                                                      #
+#                                                                      #
+# * Neither the name of the Brookhaven Science Associates, Brookhaven  #
+#   National Laboratory nor the names of its contributors may be used  #
+#   to endorse or promote products derived from this software without  #
+#   specific prior written permission.                                 #
+#                                                                      #
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS  #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT    #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS    #
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE       #
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,           #
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES   #
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR   #
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)   #
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,  #
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OTHERWISE) ARISING   #
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE   #
+# POSSIBILITY OF SUCH DAMAGE.                                          #
+########################################################################
+"""Reduce frames over fixed groups of pixels (rings, ROIs) with
+`np.bincount`, computing the pixel to bin mapping only once"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import itertools
+import logging
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+from .frame_stack import map_chunks, gather_pixels
+
+logger = logging.getLogger(__name__)
+
+# the binners that `_Binner.process_pool` installed in this worker process,
+# keyed by `_Binner._key`
+_installed_binners = dict()
+# the key of the binner installed in the workers of each such pool
+_pool_binner_keys = weakref.WeakKeyDictionary()
+_binner_count = itertools.count()
+
+
+class _Binner(object):
+    """
+    Sum and average frames over a fixed assignment of pixels to bins.
+
+    The flat indices of the binned pixels, their bins and the number of
+    pixels per bin are computed once, after that reducing a frame is one
+    fancy index and one `np.bincount`.  Concrete classes compute the bin of
+    every pixel and call `_set_bins`.
+    """
+
+    def _set_bins(self, bins, num_bins, mask=None):
+        """
+        Parameters
+        ----------
+        bins : array
+            The bin of every pixel of a frame, pixels outside of
+            [0, num_bins) are not binned
+        num_bins : int
+        mask : array, optional
+            Boolean array, True for pixels to leave out
+        """
+        bins = np.asarray(bins)
+        self.frame_shape = bins.shape
+        self.num_bins = int(num_bins)
+        valid = (bins >= 0) & (bins < self.num_bins)
+        if mask is not None:
+            valid &= ~np.asarray(mask, dtype=bool)
+        self._flat = np.flatnonzero(valid)
+        self._bins = bins.ravel()[self._flat].astype(np.intp)
+        self.counts = np.bincount(self._bins, minlength=self.num_bins)
+        # unlike id(self), never reused for another binner
+        self._key = (os.getpid(), next(_binner_count))
+
+    def sums(self, image):
+        """
+        The sum of the pixels of each bin
+
+        Parameters
+        ----------
+        image : array
+            A frame
+
+        Returns
+        -------
+        sums : array
+            (num_bins,) array
+        """
+        values = np.ravel(image)[self._flat]
+        return np.bincount(self._bins, weights=values,
+                           minlength=self.num_bins)
+
+    def means(self, image):
+        """
+        The mean of the pixels of each bin, NaN for empty bins
+
+        Parameters
+        ----------
+        image : array
+            A frame
+
+        Returns
+        -------
+        means : array
+            (num_bins,) array
+        """
+        return self._normalize(self.sums(image))
+
+    __call__ = means
+
+    def sums_stack(self, stack, chunk_size=100, num_workers=4,
+                   executor=None):
+        """
+        The per-bin sums of every frame of a stack
+
+        Each chunk of frames is reduced with a single `np.bincount` and
+        chunks are reduced concurrently, see
+        `xray_vision.utils.frame_stack.map_chunks`.  To reduce in processes
+        use `process_pool`, whose workers get the pixel to bin mapping once.
+        With any other process pool it is pickled along with every chunk
+
+        Parameters
+        ----------
+        stack : array or sequence or iterable
+            The frames, including memmaps and lazily loaded sequences
+        chunk_size : int, optional
+        num_workers : int, optional
+        executor : concurrent.futures.Executor, optional
+
+        Returns
+        -------
+        sums : array
+            (N, num_bins) array
+        """
+        if (executor is not None and
+                _pool_binner_keys.get(executor) == self._key):
+            # the workers already have the mapping, only send the frames
+            reduce_chunk = partial(_installed_chunk_sums, self._key)
+        else:
+            reduce_chunk = partial(_chunk_sums, flat=self._flat,
+                                   bins=self._bins, num_bins=self.num_bins)
+        results = []
+        for _, sums in map_chunks(reduce_chunk, stack, chunk_size=chunk_size,
+                                  num_workers=num_workers, executor=executor):
+            results.append(sums)
+        if not results:
+            return np.zeros((0, self.num_bins))
+        return np.concatenate(results)
+
+    def means_stack(self, stack, chunk_size=100, num_workers=4,
+                    executor=None):
+        """
+        The per-bin means of every frame of a stack, see `sums_stack`
+
+        Returns
+        -------
+        means : array
+            (N, num_bins) array, NaN for empty bins
+        """
+        return self._normalize(self.sums_stack(
+            stack, chunk_size=chunk_size, num_workers=num_workers,
+            executor=executor))
+
+    def process_pool(self, num_workers=4):
+        """
+        A process pool for `sums_stack` and `means_stack` that copies this
+        binner to each worker once, when the worker starts
+
+        Parameters
+        ----------
+        num_workers : int, optional
+            The number of worker processes
+
+        Returns
+        -------
+        executor : concurrent.futures.ProcessPoolExecutor
+            Shut it down (or use it as a context manager) when done
+        """
+        executor = ProcessPoolExecutor(num_workers,
+                                       initializer=_install_binner,
+                                       initargs=(self,))
+        _pool_binner_keys[executor] = self._key
+        return executor
+
+    def _normalize(self, sums):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.counts > 0, sums / self.counts, np.nan)
+
+
+class RadialBinner(_Binner):
+    """
+    Circular (azimuthal) averaging for a fixed detector geometry
+
+    Example
+    -------
+    >>> binner = RadialBinner(img.shape, center=(512, 498), num_bins=200,
+    ...                       mask=bad_pixels)
+    >>> circular_average(ax, img, binner=binner)
+    >>> averages = binner.means_stack(frames)
+    """
+
+    def __init__(self, shape, center, num_bins=100, bin_edges=None,
+                 pixel_size=(1, 1), mask=None):
+        """
+        Parameters
+        ----------
+        shape : tuple
+            The (rows, columns) shape of a frame
+        center : tuple
+            The (row, column) position of the beam center, in pixels
+        num_bins : int, optional
+            The number of equal width rings between the center and the
+            farthest pixel, ignored if `bin_edges` is given.  Defaults
+            to 100
+        bin_edges : array, optional
+            The edges of the rings, in the units of `pixel_size`
+        pixel_size : tuple, optional
+            The (row, column) size of a pixel.  Defaults to (1, 1)
+        mask : array, optional
+            Boolean array, True for pixels to leave out
+        """
+        rows, cols = np.ogrid[:shape[0], :shape[1]]
+        radius = np.hypot((rows - center[0]) * pixel_size[0],
+                          (cols - center[1]) * pixel_size[1])
+        if bin_edges is None:
+            bin_edges = np.linspace(0, radius.max(), num_bins + 1)
+            # include the farthest pixel in the last ring
+            bin_edges[-1] = np.nextafter(bin_edges[-1], np.inf)
+        self.bin_edges = np.asarray(bin_edges, dtype=float)
+        self.bin_centers = (self.bin_edges[1:] + self.bin_edges[:-1]) / 2
+        bins = np.searchsorted(self.bin_edges, radius, side='right') - 1
+        self._set_bins(bins, len(self.bin_edges) - 1, mask=mask)
+
+
+class LabelBinner(_Binner):
+    """
+    Per-ROI sums and means of frames, for the ROIs of a label array (such as
+    `ManualMask.label_array` or `ROIEditor.label_array`)
+
+    The labels do not need to be consecutive, bin ``i`` is the ROI
+    ``labels[i]``.
+
+    Example
+    -------
+    >>> binner = LabelBinner(mask.label_array)
+    >>> with binner.process_pool() as executor:
+    ...     means = binner.means_stack(frames, executor=executor)
+    >>> combine_intensity_plotter(ax, list(means.T))
+    """
+
+    def __init__(self, label_array, mask=None):
+        """
+        Parameters
+        ----------
+        label_array : array
+            Integer array the shape of a frame, 0 (or less) is background
+        mask : array, optional
+            Boolean array, True for pixels to leave out
+        """
+        label_array = np.asarray(label_array)
+        self.labels = np.unique(label_array[label_array > 0])
+        bins = np.searchsorted(self.labels, label_array)
+        bins[label_array <= 0] = -1
+        self._set_bins(bins, len(self.labels), mask=mask)
+
+
+def _chunk_sums(frames, flat, bins, num_bins):
+    """
+    Sum the bins of every frame of a chunk with one `np.bincount`
+    """
+    values = gather_pixels(frames, flat)
+    num_frames = len(values)
+    # give every frame its own range of bins
+    idx = bins + num_bins * np.arange(num_frames)[:, np.newaxis]
+    return np.bincount(idx.ravel(), weights=values.ravel(),
+                       minlength=num_frames * num_bins).reshape(num_frames,
+                                                                num_bins)
+
+
+def _install_binner(binner):
+    """
+    Keep `binner` in a worker process of `_Binner.process_pool`
+    """
+    _installed_binners[binner._key] = binner
+
+
+def _installed_chunk_sums(key, frames):
+    """
+    `_chunk_sums` with the binner installed under `key` in this process
+    """
+    binner = _installed_binners[key]
+    return _chunk_sums(frames, binner._flat, binner._bins, binner.num_bins)
@@ -0,0 +1,160 @@
+# ######################################################################
+# Copyright (c) 2014, Brookhaven Science Associates, Brookhaven        #
+# National Laboratory. All rights reserved.                            #
+#                                                                      #
+# Redistribution and use in source and binary forms, with or without   #
+# modification, are permitted provided that the following conditions   #
+# are met:                                                             #
+#                                                                      #
+# * Redistributions of source code must retain the above copyright     #
+#   notice, this list of conditions and the following disclaimer.      #
+#                                                                      #
+# * Redistributions in binary form must reproduce the above copyright  #
+#   notice this list of conditions and the following disclaimer in     #
+#   the documentation and/or other materials provided with the         #
+#   distribution.                                                      #
+#                                                                      #
+# * Neither the name of the Brookhaven Science Associates, Brookhaven  #
+#   National Laboratory nor the names of its contributors may be used  #
+#   to endorse or promote products derived from this software without  #
+#   specific prior written permission.                                 #
+#                                                                      #
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS  #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT    #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS    #
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE       #
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,           #
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES   #
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR   #
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)   #
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,  #
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OTHERWISE) ARISING   #
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE   #
+# POSSIBILITY OF SUCH DAMAGE.                                          #
+########################################################################
+"""Helpers to stream a stack of frames through a reduction, chunk by chunk
+and concurrently, with bounded memory"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def iter_chunks(stack, chunk_size=100):
+    """
+    Split a stack of frames into chunks
+
+    Parameters
+    ----------
+    stack : array or sequence or iterable
+        A (N, ...) array, a memmap, a lazily loaded sequence of frames that
+        supports `len` and slicing, or any iterable of frames
+    chunk_size : int, optional
+        The number of frames per chunk
+
+    Yields
+    ------
+    start : int
+        The index of the first frame of the chunk
+    frames : array or sequence
+        The frames of the chunk.  Slices of sliceable stacks are not
+        loaded, so that reading them can happen in the worker that reduces
+        the chunk
+    """
+    if hasattr(stack, '__getitem__') and hasattr(stack, '__len__'):
+        for start in range(0, len(stack), chunk_size):
+            yield start, stack[start:start + chunk_size]
+        return
+    chunk = []
+    start = 0
+    for frame in stack:
+        chunk.append(frame)
+        if len(chunk) == chunk_size:
+            yield start, chunk
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield start, chunk
+
+
+def map_chunks(func, stack, chunk_size=100, num_workers=4, executor=None):
+    """
+    Apply a function to the chunks of a stack concurrently, keeping only a
+    few chunks in flight
+
+    Parameters
+    ----------
+    func : callable
+        Called with the frames of one chunk, see `iter_chunks`
+    stack : array or sequence or iterable
+        See `iter_chunks`
+    chunk_size : int, optional
+        The number of frames per chunk
+    num_workers : int, optional
+        The number of chunks to work on at once.  At most twice this many
+        chunks are submitted but not yet consumed.  With 1 (and no
+        `executor`) everything runs in the calling thread
+    executor : concurrent.futures.Executor, optional
+        The pool to run `func` in.  Defaults to a thread pool of
+        `num_workers` threads.  With a process pool, `func` and the chunks
+        must be picklable
+
+    Yields
+    ------
+    start : int
+        The index of the first frame of the chunk
+    result
+        The return value of `func`, in the order of the chunks
+    """
+    chunks = iter_chunks(stack, chunk_size)
+    if executor is None and num_workers <= 1:
+        for start, frames in chunks:
+            yield start, func(frames)
+        return
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(num_workers)
+    pending = deque()
+    try:
+        for start, frames in chunks:
+            pending.append((start, executor.submit(func, frames)))
+            if len(pending) >= 2 * num_workers:
+                start, future = pending.popleft()
+                yield start, future.result()
+        while pending:
+            start, future = pending.popleft()
+            yield start, future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown()
+
+
+def gather_pixels(frames, flat):
+    """
+    The pixels at the flat indices `flat` of each frame of a chunk
+
+    Parameters
+    ----------
+    frames : array or sequence
+        A chunk of frames, see `iter_chunks`
+    flat : array
+        Indices into a flattened frame
+
+    Returns
+    -------
+    pixels : array
+        (len(frames), len(flat)) array
+    """
+    if isinstance(frames, np.ndarray):
+        # a view for contiguous (and memmapped) stacks, so only the
+        # gathered pixels are read
+        return frames.reshape(len(frames), -1)[:, flat]
+    return np.array([np.ravel(frame)[flat] for frame in frames])